@@ -1,53 +1,13 @@
 # benchmark.py
 
-from kaggle_secrets import UserSecretsClient
-from openai import OpenAI
-from pydantic import BaseModel
-import pandas as pd
+# Known archaeological sites in Acre from o3 (nhamini/benchmark.py).
 
-# Load OpenAI API key from Kaggle secrets or environment
-try:
-    user_secrets = UserSecretsClient()
-    openai_key = user_secrets.get_secret("openai")
-except Exception:
-    import os
-    openai_key = os.environ.get("OPENAI_API_KEY")
-client = OpenAI(api_key=openai_key) if openai_key else OpenAI()
-
-# Define Pydantic models for structured output
-class BenchmarkSite(BaseModel):
-    name: str
-    lat: float
-    lon: float
-
-class BenchmarkSites(BaseModel):
-    sites: list[BenchmarkSite]
+from nhamini.benchmark import make_gmaps_link, propose_benchmark_sites
+from nhamini.llm import MODEL, print_usage
 
-# Prompt for OpenAI Structured Output (expects a JSON object with a 'sites' key)
-prompt = (
-    "You are an archaeologist specialized in the Amazon region.\n"
-    "List at least 10 known archaeological sites located in the state of Acre, Brazil, "
-    "including their approximate latitude and longitude.\n"
-    "Return ONLY a JSON object with a 'sites' key, which is a list of objects with fields: name (string), lat (number), lon (number).\n"
-    "Example: {\"sites\": [{\"name\": \"Site Name\", \"lat\": -X.XXXX, \"lon\": -Y.YYYY}]}\n"
-    "Focus on geoglyphs and earthworks documented in academic literature or official records.\n"
-)
-
-# Call OpenAI API and parse with Pydantic Structured Output
-response = client.responses.parse(
-    model="o3",
-    input=[{"role": "user", "content": prompt}],
-    text_format=BenchmarkSites,
-)
-
-sites = response.output_parsed.sites
-df_benchmark = pd.DataFrame([s.model_dump() for s in sites])
+df_benchmark, response = propose_benchmark_sites()
 
 # Add Google Maps column before display
-def make_gmaps_link(lat, lon):
-    url = f'https://www.google.com/maps/search/?api=1&query={lat},{lon}'
-    return f'<a href="{url}" target="_blank">View on Google Maps</a>'
-
 df_benchmark['Google Maps'] = df_benchmark.apply(lambda row: make_gmaps_link(row['lat'], row['lon']), axis=1)
 
 # Display DataFrame in notebook/Kaggle environment, fallback to print
@@ -58,11 +18,7 @@ except Exception:
     print(df_benchmark)
 
 # Print model version used
-print(f"\n[INFO] OpenAI model used: o3")
+print(f"\n[INFO] OpenAI model used: {MODEL}")
 
 # Print token usage if available
-usage = getattr(response, "usage", None)
-if usage:
-    print(f"\nPrompt tokens: {getattr(usage, 'prompt_tokens', getattr(usage, 'input_tokens', None))}")
-    print(f"Completion tokens: {getattr(usage, 'completion_tokens', getattr(usage, 'output_tokens', None))}")
-    print(f"Total tokens: {getattr(usage, 'total_tokens', None)}")
\ No newline at end of file
+print_usage(response)
@@ -1,7 +1,19 @@
-import numpy as np
-import matplotlib.pyplot as plt
+# compare.py
 
-sensor_cols = [col for col in df_benchmark.columns if df_benchmark[col].dtype != object]
+# Benchmark profile and candidate z-scores (nhamini/compare.py): benchmark
+# statistics are accumulated once and candidates are scored in batches.
+
+from nhamini.compare import (
+    BenchmarkProfile, ZScoreDensity, iter_chunks, mean_zscores, plot_zscore_density, plot_zscore_profile,
+)
+from nhamini.schema import SENSOR_COLUMNS
+
+# Sensor columns come from the result schema (nhamini.schema); the categorical
+# MapBiomas class and the dictionary-encoded scene IDs are not z-scored
+sensor_cols = [
+    col for col in SENSOR_COLUMNS
+    if col in df_benchmark.columns and col in df_candidates.columns
+]
 
 # Select only sensors with valid values in at least one group
 valid_cols = [
@@ -18,27 +30,27 @@ print("\n[INFO] The following plot and statistics provide a direct comparison be
       "The Z-score profile plot visualizes how similar or different the candidates are from the benchmarks for each sensor.\n"
       "Use this to identify which candidates most closely resemble known sites, or which parameters stand out as anomalous.")
 
-z_bench = (df_benchmark[valid_cols] - df_benchmark[valid_cols].mean()) \
-          / df_benchmark[valid_cols].std()
-
-z_cand  = (df_candidates[valid_cols] - df_benchmark[valid_cols].mean()) \
-          / df_benchmark[valid_cols].std()
-
-means_bench = z_bench.mean().values
-means_cand  = z_cand.mean().values
-
-x = np.arange(len(valid_cols))
-
-fig, ax = plt.subplots(figsize=(10, 5))
-ax.plot(x, means_bench, marker='o', label='Benchmark (z)', linewidth=2)
-ax.plot(x, means_cand, marker='s', label='Candidates (z)', linewidth=2)
-
-ax.set_ylabel("Z-score (σ)")
-ax.set_title('Sensor Parameter Means Profile: Benchmarks vs. Nhamini-wi Candidates')
-ax.set_xticks(x)
-ax.set_xticklabels(valid_cols, rotation=45, ha='right')
-ax.axhline(0, color="gray", linestyle="--", linewidth=0.8)
-ax.legend()
-plt.grid(True, axis='y', linestyle='--', alpha=0.4)
-plt.tight_layout()
-plt.show()
\ No newline at end of file
+# Benchmark statistics are accumulated once; candidates are scored in batches
+benchmark_profile = BenchmarkProfile.from_frame(df_benchmark, valid_cols)
+# benchmark_profile.save("benchmark_profile.json")  # reuse with BenchmarkProfile.load(...)
+# benchmark_profile.update_site(new_site)           # add one enriched benchmark site
+# For very large candidate sets: mean_zscores(nhamini.compare.iter_parquet_chunks("candidates.parquet"), benchmark_profile)
+
+means_bench = mean_zscores(iter_chunks(df_benchmark), benchmark_profile)
+means_cand  = mean_zscores(iter_chunks(df_candidates), benchmark_profile)
+
+plot_zscore_profile(valid_cols, means_bench, means_cand)
+
+# With many candidates (e.g. grid scans), one line per candidate hides everything:
+# z-scores are binned per sensor batch by batch and drawn as a density heatmap
+# (or kind='violin') with the 10 candidates closest to the benchmarks overlaid
+zscore_density = ZScoreDensity(valid_cols, top_n=10)
+for chunk in iter_chunks(df_candidates):
+    zscore_density.update(benchmark_profile.zscores(chunk), chunk['name'])
+plot_zscore_density(zscore_density, "zscore_density.png", kind='heatmap', means_bench=means_bench)
+print(zscore_density.top().round(3))
+try:
+    from IPython.display import Image, display
+    display(Image(filename="zscore_density.png"))
+except Exception:
+    pass
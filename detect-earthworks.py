@@ -0,0 +1,20 @@
+# detect-earthworks.py
+
+# Local screening of candidate chips for ring/square enclosures, local contrast
+# and terrain curvature (nhamini/earthworks.py), scored in a process pool.
+# synthetic_chip(shape='ring' | 'square' | None) builds chips with known shapes.
+
+# --- Authenticate with Earth Engine before fetching chips ---
+
+import pandas as pd
+from nhamini.earthworks import fetch_chip, score_chip, score_chips, synthetic_chip
+from nhamini.scenes import catalog_for
+
+# --- Usage example ---
+
+if 'df_candidates' in globals():
+    s2_catalog = catalog_for(globals().get('candidate_catalogs'), 'S2', 2023)
+    chips = [fetch_chip(row['lat'], row['lon'], catalog=s2_catalog) for _, row in df_candidates.iterrows()]
+    scores = pd.DataFrame(score_chips(chips), index=df_candidates.index)
+    df_candidates['ShapeScore'] = scores['shape_score'].astype('float32')
+    print(scores[['ring_score', 'square_score', 'contrast', 'curvature', 'shape_score']].round(3))
@@ -0,0 +1,18 @@
+# nhamini/__init__.py
+
+# Tracing Nhamini-wi pipeline as an importable package (python -m nhamini
+# runs the stages, see nhamini/cli.py). Submodules are imported on first
+# access, so `import nhamini` is cheap; Earth Engine, OpenAI and matplotlib
+# are only imported by the stages that use them.
+
+import importlib
+
+__all__ = [
+    'agent', 'analyze', 'auth', 'benchmark', 'candidates', 'cli', 'compare', 'earthworks',
+    'geometry', 'imagery', 'llm', 'scenes', 'schema', 'sensors',
+]
+
+def __getattr__(name):
+    if name in __all__:
+        return importlib.import_module(f'.{name}', __name__)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
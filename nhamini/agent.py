@@ -0,0 +1,436 @@
+# nhamini/agent.py
+
+# Function-calling agent runtime. When o3 returns several function calls in one
+# turn, they run concurrently in a thread pool against the search, enrichment
+# and comparison code:
+#   - identical calls share one result (in flight or already computed)
+#   - enriched sites are cached and reused across calls
+#   - Earth Engine requests go through one global token-bucket rate limiter,
+#     taken per request inside the enrichment and imagery loops
+# Tool outputs are reported as each call completes and sent back to the model
+# with previous_response_id. The OpenAI client (or base_url) can be injected,
+# so the loop also runs against a local stub model server.
+
+import json
+import os
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor, as_completed
+
+from .llm import MODEL, openai_client
+
+class RateLimiter:
+    """Thread-safe token bucket: `rate` tokens per second, bursts of up to `capacity`."""
+
+    def __init__(self, rate, capacity=None):
+        self.rate = rate
+        self.capacity = capacity or rate
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self, tokens=1):
+        """Blocks until `tokens` are available (more than `capacity` are taken in bursts)."""
+        while tokens > self.capacity:
+            self.acquire(self.capacity)
+            tokens -= self.capacity
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= tokens:
+                    self._tokens -= tokens
+                    return
+                wait = (tokens - self._tokens) / self.rate
+            time.sleep(wait)
+
+# Earth Engine requests per second sent by all agents in this process (one
+# token per getInfo/thumbnail request or per tile request); replaces the
+# per-point `delay` pauses
+EE_RATE_LIMITER = RateLimiter(rate=20, capacity=40)
+
+# --- Tools ---
+
+TOOL_HANDLERS = {}
+
+def tool(name):
+    """Registers a tool handler handler(runtime, **arguments)."""
+    def register(func):
+        TOOL_HANDLERS[name] = func
+        return func
+    return register
+
+# Sensor names used by the tools -> result columns
+SENSOR_GROUPS = {
+    'NDVI': ['NDVI', 'Sentinel2_ID'],
+    'NDWI': ['NDWI'],
+    'NDBI': ['NDBI'],
+    'SRTM': ['Elevation', 'Slope'],
+    'Sentinel1': ['Sentinel1_VV', 'Sentinel1_VH', 'Sentinel1_ID'],
+    'MapBiomas': ['MapBiomas_Class'],
+    'GEDI': ['CanopyHeight'],
+}
+
+def _frame(data):
+    """DataFrame from a list of records, a dict of columns or a dict of {name: record}."""
+    import pandas as pd
+    if isinstance(data, dict) and data and all(isinstance(v, dict) for v in data.values()):
+        return pd.DataFrame.from_dict(data, orient='index').rename_axis('name').reset_index()
+    return pd.DataFrame(data)
+
+def _records(df):
+    """JSON-ready records (missing values as null)."""
+    return json.loads(df.to_json(orient='records'))
+
+def enrich_sites(runtime, sites, sensors=None):
+    """
+    Enriches a list of site dicts (lat/lon) with the requested sensors, reusing
+    the sites already enriched by earlier calls of this runtime.
+    """
+    import pandas as pd
+    from .schema import RESULT_COLUMNS, apply_result_schema
+    from .sensors import assign_sensor_columns, compute_sensor_columns
+
+    wanted = [col for group in (sensors or SENSOR_GROUPS) for col in SENSOR_GROUPS.get(group, [group])]
+    columns = [col for col in RESULT_COLUMNS if col in wanted]
+    df = _frame(sites)
+    keys = [(round(float(lat), 6), round(float(lon), 6)) for lat, lon in zip(df['lat'], df['lon'])]
+    with runtime.lock:
+        missing = [i for i, key in enumerate(keys)
+                   if any(col not in runtime.site_cache.get(key, {}) for col in columns)]
+    if missing:
+        runtime.initialize_ee()
+        subset = df.iloc[missing].reset_index(drop=True)
+        results, failed = compute_sensor_columns(subset, runtime.enrichment_params, delay=0, columns=columns,
+                                                 rate_limiter=runtime.rate_limiter)
+        values = _records(assign_sensor_columns(pd.DataFrame(index=subset.index), results))
+        with runtime.lock:
+            # Failed sites are returned empty but not cached, so a later call retries them
+            for i, record, ok in zip(missing, values, ~subset.index.isin(failed)):
+                runtime.site_cache.setdefault(keys[i], {}).update(record if ok else {})
+    with runtime.lock:
+        cached = [runtime.site_cache[key] for key in keys]
+    for col in columns:
+        df[col] = [record.get(col) for record in cached]
+    return apply_result_schema(df)
+
+@tool('search_roi_candidates')
+def search_roi_candidates(runtime, region, search_criteria=None, max_sites=5):
+    from .candidates import candidate_frame, propose_candidate_areas, region_prompt
+    areas, _ = propose_candidate_areas(runtime.client, runtime.model,
+                                       prompt=region_prompt(region, max_sites, search_criteria))
+    df, _ = candidate_frame(areas, wkt=True)
+    return _records(df[['name', 'lat', 'lon', 'radius_m', 'rationale', 'circle_wkt', 'duplicate_group']])
+
+@tool('get_roi_candidates')
+def get_roi_candidates(runtime, latitude, longitude, radius_m=500):
+    from .candidates import candidate_frame
+    df, _ = candidate_frame([{'name': 'ROI', 'lat': latitude, 'lon': longitude,
+                              'rationale': '', 'radius_m': int(radius_m)}], wkt=True)
+    enriched = enrich_sites(runtime, df[['name', 'lat', 'lon']].to_dict('records'))
+    enriched['bbox_wkt'] = df['bbox_wkt']
+    return _records(enriched)
+
+@tool('enrich_with_remote_sensing')
+def enrich_with_remote_sensing(runtime, sites, sensors=None):
+    return _records(enrich_sites(runtime, sites, sensors))
+
+@tool('get_benchmark_sites')
+def get_benchmark_sites(runtime, region="the state of Acre, Brazil", site_types=None):
+    from .benchmark import benchmark_prompt, propose_benchmark_sites
+    df, _ = propose_benchmark_sites(runtime.client, runtime.model, prompt=benchmark_prompt(region, site_types))
+    return _records(df)
+
+@tool('analyze_archaeological_potential')
+def analyze_archaeological_potential(runtime, candidates, benchmarks, region_context=None):
+    from .analyze import find_closest_matches
+    from .schema import apply_result_schema
+    matches, _ = find_closest_matches(apply_result_schema(_frame(benchmarks)), apply_result_schema(_frame(candidates)),
+                                      runtime.client, runtime.model, context=region_context)
+    return [m.model_dump() for m in matches]
+
+@tool('compare_environmental_profiles')
+def compare_environmental_profiles(runtime, candidates_data, benchmark_data, sensors=None):
+    from .compare import BenchmarkProfile, comparable_sensors
+    from .schema import apply_result_schema
+    df_candidates = apply_result_schema(_frame(candidates_data))
+    df_benchmark = apply_result_schema(_frame(benchmark_data))
+    sensors = [col for col in comparable_sensors(df_benchmark, df_candidates) if not sensors or col in sensors]
+    profile = BenchmarkProfile.from_frame(df_benchmark, sensors)
+    zscores = profile.zscores(df_candidates).astype('float64').round(3)
+    if 'name' in df_candidates.columns:
+        zscores.insert(0, 'name', df_candidates['name'])
+    return {
+        'sensors': sensors,
+        'benchmark_mean': dict(zip(sensors, profile.mean.round(4).tolist())),
+        'benchmark_std': dict(zip(sensors, profile.std.round(4).tolist())),
+        'z_scores': _records(zscores),
+    }
+
+@tool('generate_satellite_imagery')
+def generate_satellite_imagery(runtime, matches, buffer_m=1000, year=2023):
+    from .imagery import MatchImagery
+    runtime.initialize_ee()
+    with MatchImagery(os.path.join(runtime.workdir, 'images'), buffer_m=buffer_m, year=int(year),
+                      rate_limiter=runtime.rate_limiter) as imagery:
+        for m in matches:
+            imagery.submit(m)
+        paths = imagery.results()
+    return [{'name': name, 'image': path} for name, path in paths.items()]
+
+# Function definitions sent to the model (one per registered tool)
+TOOLS = [
+    {
+        "type": "function",
+        "name": "search_roi_candidates",
+        "description": "Searches for potential archaeological sites based on legends, historical records, and geographical features in any specified region",
+        "parameters": {
+            "type": "object",
+            "properties": {
+                "region": {"type": "string", "description": "Region name or description (e.g., 'Upper Rio Negro', 'Acre, Brazil', 'Central Amazon')"},
+                "search_criteria": {"type": "array", "items": {"type": "string"}, "description": "Search criteria to use (default: legends, historical_records, topographical_features)"},
+                "max_sites": {"type": "number", "description": "Maximum number of sites to return (default 5)"}
+            },
+            "required": ["region"],
+            "additionalProperties": False
+        }
+    },
+    {
+        "type": "function",
+        "name": "get_roi_candidates",
+        "description": "Returns the footprint of a ROI with remote sensing data enrichment",
+        "parameters": {
+            "type": "object",
+            "properties": {
+                "latitude": {"type": "number"},
+                "longitude": {"type": "number"},
+                "radius_m": {"type": "number", "description": "Radius in meters (default 500)"}
+            },
+            "required": ["latitude", "longitude"],
+            "additionalProperties": False
+        }
+    },
+    {
+        "type": "function",
+        "name": "enrich_with_remote_sensing",
+        "description": "Enriches locations with multi-sensor remote sensing data (NDVI, NDWI, NDBI, SRTM, Sentinel1, MapBiomas, GEDI)",
+        "parameters": {
+            "type": "object",
+            "properties": {
+                "sites": {"type": "array", "items": {"type": "object"}, "description": "Sites with name, lat and lon"},
+                "sensors": {"type": "array", "items": {"type": "string", "enum": list(SENSOR_GROUPS)}}
+            },
+            "required": ["sites"],
+            "additionalProperties": False
+        }
+    },
+    {
+        "type": "function",
+        "name": "get_benchmark_sites",
+        "description": "Gets known archaeological benchmark sites from any specified region for comparison",
+        "parameters": {
+            "type": "object",
+            "properties": {
+                "region": {"type": "string", "description": "Region to get benchmarks from (default: the state of Acre, Brazil)"},
+                "site_types": {"type": "array", "items": {"type": "string"}, "description": "Types of archaeological sites (default: geoglyphs, earthworks)"}
+            },
+            "required": [],
+            "additionalProperties": False
+        }
+    },
+    {
+        "type": "function",
+        "name": "analyze_archaeological_potential",
+        "description": "Analyzes enriched candidates against enriched benchmarks using AI expertise in regional archaeology",
+        "parameters": {
+            "type": "object",
+            "properties": {
+                "candidates": {"type": "array", "items": {"type": "object"}},
+                "benchmarks": {"type": "array", "items": {"type": "object"}},
+                "region_context": {"type": "string", "description": "Geographical and cultural context of the region"}
+            },
+            "required": ["candidates", "benchmarks"],
+            "additionalProperties": False
+        }
+    },
+    {
+        "type": "function",
+        "name": "compare_environmental_profiles",
+        "description": "Performs statistical comparison using z-scores between enriched candidate and benchmark sites",
+        "parameters": {
+            "type": "object",
+            "properties": {
+                "candidates_data": {"type": "array", "items": {"type": "object"}},
+                "benchmark_data": {"type": "array", "items": {"type": "object"}},
+                "sensors": {"type": "array", "items": {"type": "string"}}
+            },
+            "required": ["candidates_data", "benchmark_data"],
+            "additionalProperties": False
+        }
+    },
+    {
+        "type": "function",
+        "name": "generate_satellite_imagery",
+        "description": "Generates multi-spectral satellite views (RGB, NIR, NDVI, NDWI, Sentinel-1) for archaeological sites",
+        "parameters": {
+            "type": "object",
+            "properties": {
+                "matches": {"type": "array", "items": {"type": "object"}, "description": "Sites with name, lat and lon"},
+                "buffer_m": {"type": "number", "description": "Buffer in meters (default 1000)"},
+                "year": {"type": "number", "description": "Imagery year (default 2023)"}
+            },
+            "required": ["matches"],
+            "additionalProperties": False
+        }
+    },
+]
+
+# --- Runtime ---
+
+def _field(item, name, default=None):
+    """Reads a field of an API object or of its plain JSON (dict) form."""
+    if isinstance(item, dict):
+        return item.get(name, default)
+    return getattr(item, name, default)
+
+class AgentRuntime:
+    """
+    Runs the function calls of each model turn concurrently. Results are cached
+    per (tool, arguments), so repeated calls are not recomputed, and enriched
+    sites are shared by all calls of the runtime.
+    """
+
+    def __init__(self, client=None, model=MODEL, handlers=None, tools=None, max_workers=8,
+                 rate_limiter=EE_RATE_LIMITER, workdir='nhamini-output', enrichment_params=None):
+        self.client = client
+        self.model = model
+        self.handlers = TOOL_HANDLERS if handlers is None else handlers
+        self.tools = TOOLS if tools is None else tools
+        self.rate_limiter = rate_limiter
+        self.workdir = workdir
+        self.enrichment_params = enrichment_params or dict(
+            ndvi_year=2023, ndwi_year=2023, ndbi_year=2023, s1_year=2023, mapbiomas_year=2020, buffer_m=50)
+        self.site_cache = {}
+        self.lock = threading.Lock()
+        self._results = {}
+        self._ee_ready = False
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='nhamini-tool')
+
+    def close(self):
+        self._pool.shutdown(wait=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def initialize_ee(self):
+        with self.lock:
+            if not self._ee_ready:
+                from .auth import initialize
+                initialize()
+                self._ee_ready = True
+
+    def call_tool(self, name, arguments):
+        """
+        Runs one tool call. Returns (output JSON string, failed); failures are
+        reported to the model as {"error": ...}.
+        """
+        if name not in self.handlers:
+            return json.dumps({'error': f"Unknown tool: {name}"}), True
+        try:
+            return json.dumps(self.handlers[name](self, **arguments), default=str), False
+        except Exception as e:
+            print(f"[ERROR] Tool {name} failed: {e}")
+            return json.dumps({'error': str(e)}), True
+
+    def submit(self, name, arguments):
+        """Future of call_tool; identical calls share one future unless it failed."""
+        key = (name, json.dumps(arguments, sort_keys=True, default=str))
+        with self.lock:
+            future = self._results.get(key)
+            if future is None or (future.done() and future.result()[1]):
+                future = self._pool.submit(self.call_tool, name, arguments)
+                self._results[key] = future
+        return future
+
+    def dispatch(self, calls):
+        """
+        Runs the function calls of one turn concurrently and yields
+        (call, function_call_output item) in completion order, one per call_id
+        (identical calls share the result but each gets its own output).
+        """
+        waiting = {}  # future -> calls answered by it
+        for call in calls:
+            try:
+                arguments = json.loads(_field(call, 'arguments') or '{}')
+                future = self.submit(_field(call, 'name'), arguments)
+            except ValueError as e:
+                future = Future()
+                future.set_result((json.dumps({'error': f"Invalid arguments: {e}"}), True))
+            waiting.setdefault(future, []).append(call)
+        for future in as_completed(waiting):
+            output, _ = future.result()
+            for call in waiting[future]:
+                yield call, {'type': 'function_call_output', 'call_id': _field(call, 'call_id'), 'output': output}
+
+    def run(self, user_input, max_turns=10, on_tool_output=None, **request_options):
+        """
+        Agent loop: sends the user input with the tools, runs every turn's
+        function calls concurrently and continues with previous_response_id
+        until the model answers without calls (or max_turns). on_tool_output
+        (call, output_item) is called as each tool finishes. Returns the last response.
+        """
+        client = self.client = self.client or openai_client()
+        response = client.responses.create(
+            model=self.model,
+            input=[{"role": "user", "content": user_input}],
+            tools=self.tools,
+            parallel_tool_calls=True,
+            **request_options,
+        )
+        for turn in range(max_turns):
+            calls = [item for item in (_field(response, 'output') or []) if _field(item, 'type') == 'function_call']
+            if not calls:
+                break
+            print(f"[INFO] Turn {turn + 1}: {len(calls)} tool call(s): {', '.join(_field(c, 'name') for c in calls)}")
+            start = time.perf_counter()
+            outputs = []
+            for call, output in self.dispatch(calls):
+                outputs.append(output)
+                if on_tool_output is not None:
+                    on_tool_output(call, output)
+            print(f"[INFO] Turn {turn + 1}: tools finished in {time.perf_counter() - start:.1f}s")
+            response = client.responses.create(
+                model=self.model,
+                previous_response_id=_field(response, 'id'),
+                input=outputs,
+                tools=self.tools,
+                parallel_tool_calls=True,
+                **request_options,
+            )
+        usage = _field(response, 'usage')
+        if usage:
+            print(f"[INFO] Tokens used - Input: {_field(usage, 'input_tokens', 'N/A')}, "
+                  f"Output: {_field(usage, 'output_tokens', 'N/A')}")
+        return response
+
+def run_archaeological_agent(user_input, client=None, base_url=None, model=MODEL, max_workers=8, **options):
+    """Runs the agent on one user request; returns the final response (see AgentRuntime.run)."""
+    client = client or openai_client(base_url=base_url)
+    with AgentRuntime(client, model, max_workers=max_workers) as runtime:
+        return runtime.run(user_input, **options)
+
+if __name__ == '__main__':
+    import argparse
+    parser = argparse.ArgumentParser(prog='python -m nhamini.agent')
+    parser.add_argument('prompt')
+    parser.add_argument('--base-url', default=None, help='OpenAI-compatible endpoint (e.g. a local stub server)')
+    parser.add_argument('--model', default=MODEL)
+    args = parser.parse_args()
+    final = run_archaeological_agent(
+        args.prompt, base_url=args.base_url, model=args.model,
+        on_tool_output=lambda call, output: print(f"[INFO] {_field(call, 'name')} -> {output['output'][:200]}"))
+    print(_field(final, 'output_text'))
@@ -0,0 +1,199 @@
+# nhamini/analyze.py
+
+# o3 assessment of the candidates against the benchmark sites: sensor
+# summaries for the prompt and the closest matches as Structured Outputs,
+# either parsed at the end or streamed match by match.
+
+import contextlib
+import json
+
+import pandas as pd
+from pydantic import BaseModel
+
+from .llm import MODEL, openai_client
+from .schema import ENRICHED_COORDINATE_COLUMNS
+
+# Numeric columns of the result schema (nhamini.schema); categorical
+# columns such as MapBiomas_Class and the scene IDs are reported as labels
+def is_numeric_column(series):
+    return pd.api.types.is_numeric_dtype(series.dtype) and not pd.api.types.is_bool_dtype(series.dtype)
+
+# Generates the mean summary for all benchmark sensors
+def generate_sensor_summary(df, label):
+    lines = [f"{label} stats (mean):"]
+    for col in df.columns:
+        if is_numeric_column(df[col]):
+            val = df[col].mean()
+            lines.append(f"{col}: {'nan' if pd.isna(val) else f'{val:.3f}'}")
+        elif isinstance(df[col].dtype, pd.CategoricalDtype):
+            mode = df[col].mode()
+            lines.append(f"{col} (mode): {mode.iloc[0] if len(mode) else 'nan'}")
+    return "\n".join(lines)
+
+# Generates a detailed summary for all candidates
+def generate_candidates_detail(df):
+    lines = ["Candidates:"]
+    for idx, row in df.iterrows():
+        vals = []
+        for col in df.columns:
+            if pd.isna(row[col]):
+                vals.append(f"{col}: nan")
+            elif is_numeric_column(df[col]):
+                vals.append(f"{col}: {row[col]:.3f}")
+            else:
+                vals.append(f"{col}: {row[col]}")
+        lines.append("- " + ", ".join(vals))
+    return "\n".join(lines)
+
+def analysis_prompt(df_benchmark, df_candidates, context=None):
+    # Enrichment bookkeeping (nhamini.schema) is not part of the site data
+    df_benchmark = df_benchmark.drop(columns=ENRICHED_COORDINATE_COLUMNS, errors='ignore')
+    df_candidates = df_candidates.drop(columns=ENRICHED_COORDINATE_COLUMNS, errors='ignore')
+    summary_bench = generate_sensor_summary(df_benchmark, "Benchmark")
+    summary_cand = generate_candidates_detail(df_candidates)
+    summary = f"{summary_bench}\n\n{summary_cand}"
+    if context:
+        summary = f"Regional context: {context}\n\n{summary}"
+    return (
+        "You are an expert in Amazonian remote sensing and archaeology.\n"
+        "Below are summarized environmental parameters for known archaeological sites (benchmarks) and for new candidate locations along the Nhamini-wi trail.\n"
+        "Based on this data, compare the candidates to the benchmarks and assess:\n"
+        "- Which, if any, of the candidates most closely match the benchmarks?\n"
+        "- Are there anomalies or promising signals in the candidate data that warrant field investigation?\n"
+        "- Briefly explain the key differences and what they might mean archaeologically.\n"
+        "Be concise and analytical, referencing the key parameters (NDVI, NDWI, NDBI, SRTM, slope, Sentinel-1 radar, land cover, canopy height, etc.).\n"
+        "Return ONLY a JSON object with a 'matches' key, which is a list of the closest candidate(s) to the benchmarks. Each match must have: name, lat, lon, reason. If none, return an empty list.\n"
+        f"\n{summary}\n"
+    )
+
+# Defines the schema for Structured Outputs
+MATCHES_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "matches": {
+            "type": "array",
+            "items": {
+                "type": "object",
+                "properties": {
+                    "name":   {"type": "string"},
+                    "lat":    {"type": "number"},
+                    "lon":    {"type": "number"},
+                    "reason": {"type": "string"}
+                },
+                "required": ["name", "lat", "lon", "reason"],
+                "additionalProperties": False
+            }
+        }
+    },
+    "required": ["matches"],
+    "additionalProperties": False
+}
+
+# --- Structured Output with Pydantic ---
+class ClosestMatch(BaseModel):
+    name: str
+    lat: float
+    lon: float
+    reason: str
+
+class ClosestMatches(BaseModel):
+    matches: list[ClosestMatch]
+
+def find_closest_matches(df_benchmark, df_candidates, client=None, model=MODEL, context=None):
+    """Returns (list of ClosestMatch, response)."""
+    client = client or openai_client()
+    response = client.responses.parse(
+        model=model,
+        input=[{"role": "user", "content": analysis_prompt(df_benchmark, df_candidates, context)}],
+        text_format=ClosestMatches,
+    )
+    return response.output_parsed.matches, response
+
+class MatchStreamParser:
+    """
+    Incremental scanner over the structured-output text ({"matches": [...]}):
+    feed() takes the next text delta and returns the match objects completed
+    by it, so each match is available as soon as its closing brace arrives.
+    """
+
+    def __init__(self):
+        self.depth = 0
+        self.in_string = False
+        self.escape = False
+        self.key = None          # last string seen at depth 1 (the current key)
+        self.in_matches = False  # inside the "matches" array
+        self._string = []
+        self._item = None        # text of the match object being read
+
+    def feed(self, text):
+        completed = []
+        for ch in text:
+            if self._item is not None:
+                self._item.append(ch)
+            if self.in_string:
+                if self.escape:
+                    self.escape = False
+                elif ch == '\\':
+                    self.escape = True
+                elif ch == '"':
+                    self.in_string = False
+                    if self.depth == 1 and self._item is None:
+                        self.key = ''.join(self._string)
+                elif self.depth == 1:
+                    self._string.append(ch)
+                continue
+            if ch == '"':
+                self.in_string = True
+                self._string = []
+            elif ch in '{[':
+                self.depth += 1
+                if ch == '[' and self.depth == 2 and self.key == 'matches':
+                    self.in_matches = True
+                elif ch == '{' and self.depth == 3 and self.in_matches:
+                    self._item = [ch]
+            elif ch in '}]':
+                self.depth -= 1
+                if self._item is not None and self.depth == 2:
+                    completed.append(json.loads(''.join(self._item)))
+                    self._item = None
+                elif ch == ']' and self.depth == 1:
+                    self.in_matches = False
+        return completed
+
+def stream_closest_matches(df_benchmark, df_candidates, client=None, model=MODEL, context=None, on_match=None):
+    """
+    Streams the structured output and calls on_match(ClosestMatch) as each match
+    is completed, e.g. to start its imagery while o3 is still writing the rest.
+    Returns (list of ClosestMatch, final response). If the stream breaks, the
+    matches received so far are returned with response None; errors raised by
+    on_match are not stream errors and propagate to the caller.
+    """
+    client = client or openai_client()
+    parser = MatchStreamParser()
+    matches = []
+    final = {}
+
+    def received():
+        try:
+            with client.responses.stream(
+                model=model,
+                input=[{"role": "user", "content": analysis_prompt(df_benchmark, df_candidates, context)}],
+                text_format=ClosestMatches,
+            ) as stream:
+                for event in stream:
+                    if event.type != 'response.output_text.delta':
+                        continue
+                    for item in parser.feed(event.delta):
+                        yield ClosestMatch.model_validate(item)
+                final['response'] = stream.get_final_response()
+        except Exception as e:
+            print(f"[WARNING] Match stream interrupted after {len(matches)} match(es): {e}")
+
+    # on_match runs outside the stream's error handling; closing the generator
+    # also closes the stream when on_match raises
+    with contextlib.closing(received()) as events:
+        for match in events:
+            matches.append(match)
+            if on_match is not None:
+                on_match(match)
+    return matches, final.get('response')
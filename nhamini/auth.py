@@ -0,0 +1,119 @@
+# nhamini/auth.py
+
+# Earth Engine initialization with cached credentials. The service account key
+# file is only rewritten when the key changes, Earth Engine is initialized once
+# per process, and the OAuth access token is cached on disk so that other
+# processes (CLI stages, pool workers) reuse it instead of requesting a new one.
+
+import calendar
+import datetime
+import hashlib
+import json
+import os
+import time
+
+KEY_PATH = 'gcloud_key.json'
+TOKEN_CACHE_PATH = os.path.join(os.path.expanduser('~'), '.cache', 'nhamini', 'ee_token.json')
+# A cached token is only reused while it has at least this many seconds left
+MIN_TOKEN_LIFETIME_S = 300
+
+_initialized = False
+
+def load_service_account_key(key_path=KEY_PATH):
+    """Service account key JSON from Kaggle secrets, EE_SERVICE_ACCOUNT_KEY or an existing key file."""
+    try:
+        from kaggle_secrets import UserSecretsClient
+        return UserSecretsClient().get_secret("service_account")  # or the secret name you used
+    except Exception:
+        pass
+    if os.environ.get('EE_SERVICE_ACCOUNT_KEY'):
+        return os.environ['EE_SERVICE_ACCOUNT_KEY']
+    if os.path.exists(key_path):
+        with open(key_path) as f:
+            return f.read()
+    raise RuntimeError("No Earth Engine service account key: add the 'service_account' Kaggle secret, "
+                       f"set EE_SERVICE_ACCOUNT_KEY or provide {key_path}")
+
+def write_key_file(key, key_path=KEY_PATH):
+    """Saves the key to a file (Earth Engine expects a file) unless it is already there."""
+    if os.path.exists(key_path):
+        with open(key_path) as f:
+            if f.read() == key:
+                return False
+    with open(key_path, 'w') as f:
+        f.write(key)
+    os.chmod(key_path, 0o600)
+    return True
+
+def _key_digest(key_path):
+    with open(key_path, 'rb') as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+def _read_token_cache(token_cache, key_path, min_lifetime_s):
+    """Cached token for the current key file, or None if missing, stale or for another key."""
+    try:
+        with open(token_cache) as f:
+            cached = json.load(f)
+        if cached['key_sha256'] != _key_digest(key_path):
+            return None
+    except (OSError, ValueError, KeyError):
+        return None
+    if cached.get('expiry', 0) - time.time() < min_lifetime_s:
+        return None
+    return cached
+
+def _write_token_cache(token_cache, credentials, key_path, project):
+    if not credentials.token or credentials.expiry is None:
+        return
+    os.makedirs(os.path.dirname(token_cache), exist_ok=True)
+    tmp = f'{token_cache}.{os.getpid()}.tmp'
+    with os.fdopen(os.open(tmp, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600), 'w') as f:
+        json.dump({
+            'account': credentials.service_account_email,
+            'project': project,
+            'key_sha256': _key_digest(key_path),
+            'token': credentials.token,
+            'expiry': calendar.timegm(credentials.expiry.utctimetuple()),
+        }, f)
+    os.replace(tmp, token_cache)
+
+def initialize(key=None, key_path=KEY_PATH, project=None, token_cache=TOKEN_CACHE_PATH,
+               min_lifetime_s=MIN_TOKEN_LIFETIME_S):
+    """
+    Initializes Earth Engine with the service account, once per process.
+
+    While the token cached by any process is valid for the current key file,
+    it is reused as is (the credentials still refresh themselves from the key
+    file when it expires). Otherwise the key is loaded (Kaggle secret
+    'service_account', EE_SERVICE_ACCOUNT_KEY or key_path), written to key_path
+    if it changed, and the new token is cached. token_cache=None disables the
+    cross-process cache.
+    """
+    global _initialized
+    if _initialized:
+        return
+    import ee
+
+    if key is not None:
+        write_key_file(key, key_path)
+    cached = (_read_token_cache(token_cache, key_path, min_lifetime_s)
+              if token_cache and os.path.exists(key_path) else None)
+    if cached:
+        credentials = ee.ServiceAccountCredentials(cached['account'], key_path)
+        credentials.token = cached['token']
+        # google-auth keeps expiry as naive UTC
+        credentials.expiry = datetime.datetime.fromtimestamp(
+            cached['expiry'], datetime.timezone.utc).replace(tzinfo=None)
+        project = project or cached['project']
+    else:
+        key = key or load_service_account_key(key_path)
+        write_key_file(key, key_path)
+        service_account_info = json.loads(key)
+        project = project or service_account_info.get('project_id')
+        credentials = ee.ServiceAccountCredentials(service_account_info['client_email'], key_path)
+        if token_cache:
+            from google.auth.transport.requests import Request
+            credentials.refresh(Request())
+            _write_token_cache(token_cache, credentials, key_path, project)
+    ee.Initialize(credentials, project=project)
+    _initialized = True
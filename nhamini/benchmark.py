@@ -0,0 +1,54 @@
+# nhamini/benchmark.py
+
+# Known archaeological sites in Acre, suggested by o3 with Structured Outputs,
+# used as the reference profile for the candidates.
+
+import pandas as pd
+from pydantic import BaseModel
+
+from .llm import MODEL, openai_client
+
+# Define Pydantic models for structured output
+class BenchmarkSite(BaseModel):
+    name: str
+    lat: float
+    lon: float
+
+class BenchmarkSites(BaseModel):
+    sites: list[BenchmarkSite]
+
+# Prompt for OpenAI Structured Output (expects a JSON object with a 'sites' key)
+BENCHMARK_PROMPT = (
+    "You are an archaeologist specialized in the Amazon region.\n"
+    "List at least 10 known archaeological sites located in the state of Acre, Brazil, "
+    "including their approximate latitude and longitude.\n"
+    "Return ONLY a JSON object with a 'sites' key, which is a list of objects with fields: name (string), lat (number), lon (number).\n"
+    "Example: {\"sites\": [{\"name\": \"Site Name\", \"lat\": -X.XXXX, \"lon\": -Y.YYYY}]}\n"
+    "Focus on geoglyphs and earthworks documented in academic literature or official records.\n"
+)
+
+def benchmark_prompt(region="the state of Acre, Brazil", site_types=None):
+    """BENCHMARK_PROMPT for any region and site types."""
+    site_types = ", ".join(site_types or ["geoglyphs", "earthworks"])
+    return (
+        "You are an archaeologist specialized in the Amazon region.\n"
+        f"List at least 10 known archaeological sites located in {region}, "
+        "including their approximate latitude and longitude.\n"
+        "Return ONLY a JSON object with a 'sites' key, which is a list of objects with fields: name (string), lat (number), lon (number).\n"
+        f"Focus on {site_types} documented in academic literature or official records.\n"
+    )
+
+def propose_benchmark_sites(client=None, model=MODEL, prompt=BENCHMARK_PROMPT):
+    """Returns (df_benchmark with name/lat/lon, response)."""
+    client = client or openai_client()
+    response = client.responses.parse(
+        model=model,
+        input=[{"role": "user", "content": prompt}],
+        text_format=BenchmarkSites,
+    )
+    sites = response.output_parsed.sites
+    return pd.DataFrame([s.model_dump() for s in sites]), response
+
+def make_gmaps_link(lat, lon):
+    url = f'https://www.google.com/maps/search/?api=1&query={lat},{lon}'
+    return f'<a href="{url}" target="_blank">View on Google Maps</a>'
@@ -0,0 +1,87 @@
+# nhamini/candidates.py
+
+# Candidate areas in the Nhamini-wi region suggested by o3, with their
+# footprints (bbox and circle as WKB/WKT), overlaps, near-duplicates and the
+# nearest benchmark site.
+
+import pandas as pd
+from pydantic import BaseModel
+from typing import List
+
+from .geometry import (
+    bbox_rings, candidate_bboxes, circle_rings, duplicate_groups, nearest_benchmark,
+    overlapping_pairs, polygons_to_wkb, polygons_to_wkt,
+)
+from .llm import MODEL, openai_client
+
+# Prompt: ask o3 for promising but underexplored locations in Nhamini-wi territories (≤200 chars rationale)
+CANDIDATE_PROMPT = (
+    "You are an Amazon explorer and researcher.\n"
+    "Based on historical legends, indigenous oral history, and published expedition records, "
+    "suggest up to 5 possible locations (latitude and longitude) within the Nhamini-wi region (Upper Rio Negro, near the Brazil/Colombia/Venezuela border) "
+    "that could correspond to the legendary trail or its unexplored sites. "
+    "Focus on areas that remain little explored archaeologically, according to the scientific literature. "
+    "For each, briefly justify your choice referencing myths, remoteness, or lack of fieldwork. "
+    "Return your answer as a JSON list with the fields: name, lat, lon, rationale (≤200 characters), and radius_m (fixed value, e.g., 500). "
+    "Example: [{\"name\": \"Suggested Area\", \"lat\": 1.2345, \"lon\": -67.8901, \"rationale\": \"...\", \"radius_m\": 500}, ...]"
+)
+
+# Define schema with Pydantic (now includes radius_m)
+class Area(BaseModel):
+    name: str
+    lat: float
+    lon: float
+    rationale: str
+    radius_m: int = 500  # default radius in meters
+
+class SuggestedAreas(BaseModel):
+    areas: List[Area]
+
+def region_prompt(region, max_sites=5, search_criteria=None):
+    """CANDIDATE_PROMPT for any region and search criteria."""
+    criteria = ", ".join(search_criteria or ["legends", "historical_records", "topographical_features"])
+    return (
+        "You are an Amazon explorer and researcher.\n"
+        f"Based on {criteria.replace('_', ' ')}, suggest up to {int(max_sites)} possible locations (latitude and longitude) "
+        f"within {region} that could correspond to unexplored archaeological sites. "
+        "Focus on areas that remain little explored archaeologically, according to the scientific literature. "
+        "For each, briefly justify your choice referencing myths, remoteness, or lack of fieldwork. "
+        "Return your answer as a JSON list with the fields: name, lat, lon, rationale (≤200 characters), and radius_m (fixed value, e.g., 500)."
+    )
+
+def propose_candidate_areas(client=None, model=MODEL, prompt=CANDIDATE_PROMPT):
+    """Returns (list of Area, response)."""
+    client = client or openai_client()
+    response = client.responses.parse(
+        model=model,
+        input=[{"role": "user", "content": prompt}],
+        text_format=SuggestedAreas,
+    )
+    return response.output_parsed.areas, response
+
+def candidate_frame(areas, df_benchmark=None, tolerance_m=50, wkt=False):
+    """
+    Candidate table with footprints for all areas at once: NumPy bboxes and
+    circle polygons stored as WKB, duplicate groups and, when benchmark sites
+    are given, the nearest one. wkt=True also adds bbox_wkt/circle_wkt for
+    display (formatted row by row, so only for small tables). Returns (df, circle rings).
+    """
+    df = pd.DataFrame([a.model_dump() if hasattr(a, 'model_dump') else dict(a) for a in areas])
+    bboxes = candidate_bboxes(df['lat'], df['lon'], df['radius_m'])
+    circles = circle_rings(df['lat'], df['lon'], df['radius_m'])
+    df['bbox'] = bboxes.tolist()
+    df['bbox_wkb'] = polygons_to_wkb(bbox_rings(bboxes))
+    df['circle_wkb'] = polygons_to_wkb(circles)
+    if wkt:
+        df['bbox_wkt'] = polygons_to_wkt(bbox_rings(bboxes))
+        df['circle_wkt'] = polygons_to_wkt(circles)
+
+    # Overlapping footprints and near-duplicate suggestions (STR tree over the circles)
+    for i, j in overlapping_pairs(df['lat'], df['lon'], df['radius_m']):
+        print(f"[WARNING] Footprints overlap: {df['name'][i]} / {df['name'][j]}")
+    df['duplicate_group'] = duplicate_groups(df['lat'], df['lon'], tolerance_m=tolerance_m)
+    if df_benchmark is not None and len(df_benchmark):
+        nearest, distance = nearest_benchmark(df['lat'], df['lon'], df_benchmark['lat'], df_benchmark['lon'])
+        df['nearest_benchmark'] = df_benchmark['name'].to_numpy()[nearest]
+        df['nearest_benchmark_km'] = (distance / 1000).round(1)
+    return df, circles
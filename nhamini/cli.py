@@ -0,0 +1,288 @@
+# nhamini/cli.py
+
+# Single entry point for the pipeline: python -m nhamini <stage> [options]
+#
+# Every stage reads its inputs from the work directory and writes its outputs
+# there, so stages run in separate processes, can be re-run on their own, and
+# only import what they use (e.g. 'compare' never imports Earth Engine/OpenAI):
+#
+#   benchmark          -> benchmark.parquet
+#   enrich-benchmark   benchmark.parquet -> benchmark_enriched.parquet
+#   candidates         benchmark.parquet -> candidates.parquet (GeoParquet)
+#   enrich-candidates  candidates.parquet -> candidates_enriched.parquet, candidate_catalogs.json
+#   earthworks         candidates_enriched.parquet -> earthworks.parquet
+#   sweep              benchmark.parquet, candidates.parquet -> *_sweep.parquet (site x sensor
+#                      x buffer radius)
+#   compare            *_enriched.parquet -> benchmark_profile.json, candidate_zscores.parquet,
+#                      top_candidates.parquet, zscore_profile.png, zscore_heatmap.png /
+#                      zscore_violin.png
+#   analyze            *_enriched.parquet -> matches.json (--stream: also images/<match>.png,
+#                      rendered while o3 is still writing the other matches)
+#   imagery            matches.json -> images/<match>.png (the missing ones)
+#   all                every stage above, in order
+
+import argparse
+import json
+import os
+import time
+
+STAGES = {}
+
+def stage(name):
+    def register(func):
+        STAGES[name] = func
+        return func
+    return register
+
+def workfile(args, name):
+    return os.path.join(args.workdir, name)
+
+def enrichment_params(args):
+    return dict(ndvi_year=args.year, ndwi_year=args.year, ndbi_year=args.year, s1_year=args.year,
+                mapbiomas_year=args.mapbiomas_year, buffer_m=args.buffer_m)
+
+def load_catalogs(args):
+    from .scenes import load_scene_catalogs
+    catalogs_file = workfile(args, 'candidate_catalogs.json')
+    return load_scene_catalogs(catalogs_file) if os.path.exists(catalogs_file) else None
+
+def enrich_file(args, source, target, catalogs_file=None):
+    """
+    Enriches the sites in source into target. When target already exists, only
+    the rows/columns that changed are recomputed (reenrich_with_all_sensors).
+    """
+    import pandas as pd
+    from .auth import initialize
+    from .scenes import build_scene_catalogs, save_scene_catalogs
+    from .schema import ENRICHED_COORDINATE_COLUMNS, RESULT_COLUMNS, read_results_parquet, write_results_parquet
+    from .sensors import enrich_benchmarks_with_all_sensors, reenrich_with_all_sensors
+
+    initialize()
+    df = pd.read_parquet(source)
+    df = df.drop(columns=[col for col in ('geometry', 'Google Maps') if col in df.columns])
+    catalogs = build_scene_catalogs(df, s2_year=args.year, s1_year=args.year)
+    if catalogs_file:
+        save_scene_catalogs(catalogs, catalogs_file)
+    options = dict(enrichment_params(args), delay=args.delay, catalogs=catalogs,
+                   tile_deg=args.tile_deg, geohash_precision=args.geohash_precision)
+    if os.path.exists(target) and not args.force:
+        previous = read_results_parquet(target)
+        for col in RESULT_COLUMNS + ENRICHED_COORDINATE_COLUMNS:
+            if col in previous.columns:
+                df[col] = previous[col].reindex(df.index)
+        df.attrs = previous.attrs
+        df = reenrich_with_all_sensors(df, **options)
+    else:
+        df = enrich_benchmarks_with_all_sensors(df, **options)
+    write_results_parquet(df, target)
+    print(f"[INFO] Wrote {target} ({len(df)} sites)")
+
+@stage('benchmark')
+def run_benchmark(args):
+    from .benchmark import propose_benchmark_sites
+    from .llm import print_usage
+    df_benchmark, response = propose_benchmark_sites()
+    df_benchmark.to_parquet(workfile(args, 'benchmark.parquet'), index=False)
+    print(df_benchmark)
+    print_usage(response)
+
+@stage('enrich-benchmark')
+def run_enrich_benchmark(args):
+    enrich_file(args, workfile(args, 'benchmark.parquet'), workfile(args, 'benchmark_enriched.parquet'))
+
+@stage('candidates')
+def run_candidates(args):
+    import pandas as pd
+    from .candidates import candidate_frame, propose_candidate_areas
+    from .geometry import write_geoparquet
+    from .llm import print_usage
+    benchmark_file = workfile(args, 'benchmark.parquet')
+    df_benchmark = pd.read_parquet(benchmark_file) if os.path.exists(benchmark_file) else None
+    areas, response = propose_candidate_areas()
+    df, circles = candidate_frame(areas, df_benchmark)
+    # bbox lists and the WKB copies are rebuilt from the GeoParquet geometry
+    columns = [col for col in df.columns if col not in ('bbox', 'bbox_wkb', 'circle_wkb')]
+    write_geoparquet(df[columns], circles, workfile(args, 'candidates.parquet'))
+    print(df[columns])
+    print_usage(response)
+
+@stage('enrich-candidates')
+def run_enrich_candidates(args):
+    enrich_file(args, workfile(args, 'candidates.parquet'), workfile(args, 'candidates_enriched.parquet'),
+                catalogs_file=workfile(args, 'candidate_catalogs.json'))
+
+@stage('earthworks')
+def run_earthworks(args):
+    import pandas as pd
+    from .auth import initialize
+    from .earthworks import fetch_chip, score_chips
+    from .scenes import catalog_for
+    from .schema import read_results_parquet
+
+    initialize()
+    df = read_results_parquet(workfile(args, 'candidates_enriched.parquet'))
+    s2_catalog = catalog_for(load_catalogs(args), 'S2', args.year)
+    chips = [fetch_chip(lat, lon, year=args.year, catalog=s2_catalog) for lat, lon in zip(df['lat'], df['lon'])]
+    scores = pd.DataFrame(score_chips(chips, workers=args.workers), index=df.index)
+    scores.insert(0, 'name', df['name'])
+    scores.to_parquet(workfile(args, 'earthworks.parquet'), index=False)
+    print(scores)
+
+@stage('sweep')
+def run_sweep(args):
+    import pandas as pd
+    from .auth import initialize
+    from .sensors import sweep_buffers
+
+    initialize()
+    for source, target in (('benchmark.parquet', 'benchmark_sweep.parquet'),
+                           ('candidates.parquet', 'candidates_sweep.parquet')):
+        df = pd.read_parquet(workfile(args, source), columns=['name', 'lat', 'lon'])
+        sweep = sweep_buffers(df, radii_m=args.radii, ndvi_year=args.year, ndwi_year=args.year,
+                              ndbi_year=args.year, s1_year=args.year, mapbiomas_year=args.mapbiomas_year,
+                              delay=args.delay, tile_deg=args.tile_deg or 0.05,
+                              geohash_precision=args.geohash_precision)
+        sweep.to_parquet(workfile(args, target), index=False)
+        print(f"[INFO] Wrote {workfile(args, target)} ({len(df)} sites x {len(args.radii)} radii)")
+
+@stage('compare')
+def run_compare(args):
+    import numpy as np
+    import pandas as pd
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    from .compare import (
+        BenchmarkProfile, ZScoreDensity, comparable_sensors, iter_chunks, iter_parquet_chunks, mean_zscores,
+        plot_zscore_density, plot_zscore_profile,
+    )
+    from .schema import read_results_parquet
+
+    df_benchmark = read_results_parquet(workfile(args, 'benchmark_enriched.parquet'))
+    candidates_file = workfile(args, 'candidates_enriched.parquet')
+    # Sensor coverage comes from the Parquet footer, not from loading the columns
+    sensors = comparable_sensors(df_benchmark, candidates_file)
+    if not sensors:
+        print("[WARNING] No sensor has values in both the benchmarks and the candidates; the comparison is empty")
+
+    profile = BenchmarkProfile.from_frame(df_benchmark, sensors)
+    profile.save(workfile(args, 'benchmark_profile.json'))
+    # Candidates are scored batch by batch and written as they go; the density
+    # grids and the top-N closest candidates are accumulated on the way
+    summary = BenchmarkProfile(sensors)
+    density = ZScoreDensity(sensors, top_n=args.top_n)
+    writer = None
+    row = 0
+    for chunk in iter_parquet_chunks(candidates_file, args.chunk_size):
+        z = profile.zscores(chunk)
+        summary.update(z)
+        density.update(z, chunk['name'] if 'name' in chunk.columns else None)
+        # Row number in candidates_enriched.parquet (and the name) to join back on
+        keys = pd.DataFrame({'row': np.arange(row, row + len(z), dtype=np.int64)})
+        if 'name' in chunk.columns:
+            keys['name'] = chunk['name'].astype('string').to_numpy()
+        row += len(z)
+        table = pa.Table.from_pandas(pd.concat([keys, z.reset_index(drop=True)], axis=1), preserve_index=False)
+        writer = writer or pq.ParquetWriter(workfile(args, 'candidate_zscores.parquet'), table.schema)
+        writer.write_table(table)
+    if writer is not None:
+        writer.close()
+
+    means_bench = mean_zscores(iter_chunks(df_benchmark, args.chunk_size), profile)
+    means_cand = np.where(summary.count > 0, summary.mean, np.nan)
+    print(pd.DataFrame({'benchmark': means_bench, 'candidates': means_cand}, index=sensors).round(3))
+    top = density.top()
+    top.to_parquet(workfile(args, 'top_candidates.parquet'), index=False)
+    print(top.round(3))
+    if not args.no_plot:
+        plot_zscore_profile(sensors, means_bench, means_cand, path=workfile(args, 'zscore_profile.png'))
+        for kind in args.density_plot:
+            plot_zscore_density(density, workfile(args, f'zscore_{kind}.png'), kind=kind, means_bench=means_bench)
+
+def write_matches(path, matches):
+    with open(path, 'w') as f:
+        json.dump({'matches': [m.model_dump() for m in matches]}, f, indent=2, ensure_ascii=False)
+
+@stage('analyze')
+def run_analyze(args):
+    from .analyze import find_closest_matches, stream_closest_matches
+    from .llm import print_usage
+    from .schema import read_results_parquet
+    df_benchmark = read_results_parquet(workfile(args, 'benchmark_enriched.parquet'))
+    df_candidates = read_results_parquet(workfile(args, 'candidates_enriched.parquet'))
+    matches_file = workfile(args, 'matches.json')
+    if args.stream:
+        # Each match is imaged as soon as it is parsed; matches.json is rewritten
+        # after every match, so a broken stream keeps the matches received
+        from .auth import initialize
+        from .imagery import MatchImagery
+        initialize()
+        received = []
+
+        def on_match(m):
+            received.append(m)
+            write_matches(matches_file, received)
+            print(f"- {m.name} (lat: {m.lat}, lon: {m.lon})\n  Reason: {m.reason}\n")
+            imagery.submit(m)
+
+        with MatchImagery(workfile(args, 'images'), year=args.year, catalogs=load_catalogs(args)) as imagery:
+            matches, response = stream_closest_matches(df_benchmark, df_candidates, on_match=on_match)
+            imagery.results()
+        write_matches(matches_file, matches)
+    else:
+        matches, response = find_closest_matches(df_benchmark, df_candidates)
+        write_matches(matches_file, matches)
+        for m in matches:
+            print(f"- {m.name} (lat: {m.lat}, lon: {m.lon})\n  Reason: {m.reason}\n")
+    if response is not None:
+        print_usage(response)
+
+@stage('imagery')
+def run_imagery(args):
+    from .auth import initialize
+    from .imagery import match_image_path, plot_multiple_satellite_views
+
+    initialize()
+    with open(workfile(args, 'matches.json')) as f:
+        matches = json.load(f)['matches']
+    catalogs = load_catalogs(args)
+    images = workfile(args, 'images')
+    os.makedirs(images, exist_ok=True)
+    for m in matches:
+        path = match_image_path(images, m['name'])
+        if os.path.exists(path) and not args.force:
+            continue  # already rendered (e.g. by analyze --stream)
+        print(f"\n[INFO] Generating images for: {m['name']} (lat: {m['lat']}, lon: {m['lon']})")
+        plot_multiple_satellite_views(m['lat'], m['lon'], buffer_m=1000, year=args.year,
+                                      catalogs=catalogs, path=path)
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog='python -m nhamini', description='Tracing Nhamini-wi pipeline')
+    parser.add_argument('stage', choices=[*STAGES, 'all'])
+    parser.add_argument('--workdir', default='nhamini-output', help='directory for stage inputs/outputs')
+    parser.add_argument('--year', type=int, default=2023, help='Sentinel-1/Sentinel-2 year')
+    parser.add_argument('--mapbiomas-year', type=int, default=2020)
+    parser.add_argument('--buffer-m', type=int, default=50)
+    parser.add_argument('--tile-deg', type=float, default=None, help='share composites per grid tile')
+    parser.add_argument('--geohash-precision', type=int, default=None, help='share composites per geohash tile')
+    parser.add_argument('--delay', type=float, default=1, help='pause between Earth Engine requests (s)')
+    parser.add_argument('--force', action='store_true', help='re-enrich / re-render from scratch')
+    # Same default as nhamini.sensors.BUFFER_SWEEP_M (not imported here: it needs Earth Engine)
+    parser.add_argument('--radii', type=lambda text: [int(r) for r in text.split(',')],
+                        default=[0, 25, 50, 100, 250, 500, 1000], help='buffer radii (m) for the sweep, e.g. 0,50,250')
+    parser.add_argument('--workers', type=int, default=None, help='processes for earthwork screening')
+    parser.add_argument('--chunk-size', type=int, default=10000, help='rows per comparison batch')
+    parser.add_argument('--no-plot', action='store_true', help='skip the comparison plots')
+    parser.add_argument('--density-plot', type=lambda text: text.split(','), default=['heatmap'],
+                        help='z-score density views: heatmap, violin or both (heatmap,violin)')
+    parser.add_argument('--top-n', type=int, default=10, help='closest candidates overlaid on the density plots')
+    parser.add_argument('--stream', action='store_true', help='stream matches and image them as they arrive')
+    return parser
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    os.makedirs(args.workdir, exist_ok=True)
+    for name in (STAGES if args.stage == 'all' else [args.stage]):
+        start = time.perf_counter()
+        print(f"[INFO] Stage {name}")
+        STAGES[name](args)
+        print(f"[INFO] Stage {name} finished in {time.perf_counter() - start:.1f}s")
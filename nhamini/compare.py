@@ -0,0 +1,433 @@
+# nhamini/compare.py
+
+# Statistical comparison of candidates against the benchmark sites.
+# matplotlib is only imported when a plot is drawn.
+
+import heapq
+import itertools
+import json
+import os
+import numpy as np
+import pandas as pd
+
+from .schema import SENSOR_COLUMNS, results_from_arrow
+
+# --- Benchmark profile ---
+# Streaming per-sensor statistics of the benchmark sites: Welford/Chan running
+# count, mean and variance plus a mergeable quantile sketch per sensor. Profiles
+# can be updated one site at a time, merged across chunks or processes and
+# saved as JSON; candidate z-scores are then computed batch by batch against
+# the profile, so the comparison runs in constant memory.
+
+class QuantileSketch:
+    """
+    Mergeable quantile sketch (KLL-style compactors). Every level keeps at most
+    k values; an item on level h stands for 2**h observations.
+    """
+
+    def __init__(self, k=200):
+        self.k = k
+        self.levels = [np.empty(0)]
+        self._offset = 0
+
+    def update(self, values):
+        values = np.asarray(values, dtype=np.float64)
+        values = values[np.isfinite(values)]
+        if len(values):
+            self.levels[0] = np.concatenate([self.levels[0], values])
+            self._compress()
+        return self
+
+    def merge(self, other):
+        for h, level in enumerate(other.levels):
+            if h == len(self.levels):
+                self.levels.append(np.empty(0))
+            self.levels[h] = np.concatenate([self.levels[h], level])
+        self._compress()
+        return self
+
+    def _compress(self):
+        h = 0
+        while h < len(self.levels):
+            level = self.levels[h]
+            if len(level) > self.k:
+                level = np.sort(level)
+                keep = level[-1:] if len(level) % 2 else level[:0]
+                promoted = level[:len(level) - len(keep)][self._offset::2]
+                self._offset ^= 1
+                self.levels[h] = keep
+                if h + 1 == len(self.levels):
+                    self.levels.append(np.empty(0))
+                self.levels[h + 1] = np.concatenate([self.levels[h + 1], promoted])
+            h += 1
+
+    @property
+    def count(self):
+        return int(sum(len(level) << h for h, level in enumerate(self.levels)))
+
+    def quantile(self, q):
+        """Approximate q-quantile(s); NaN when the sketch is empty."""
+        values = np.concatenate(self.levels)
+        if not len(values):
+            return np.full(np.shape(q), np.nan) if np.ndim(q) else np.nan
+        weights = np.concatenate([np.full(len(level), 2.0 ** h) for h, level in enumerate(self.levels)])
+        order = np.argsort(values)
+        cumulative = np.cumsum(weights[order])
+        ranks = np.asarray(q, dtype=np.float64) * cumulative[-1]
+        idx = np.minimum(np.searchsorted(cumulative, ranks, side='left'), len(values) - 1)
+        return values[order][idx]
+
+    def to_dict(self):
+        return {'k': self.k, 'levels': [level.tolist() for level in self.levels]}
+
+    @classmethod
+    def from_dict(cls, data):
+        sketch = cls(data['k'])
+        sketch.levels = [np.asarray(level, dtype=np.float64) for level in data['levels']] or [np.empty(0)]
+        return sketch
+
+def sensor_matrix(df, sensors):
+    """Sensor values of a frame (or a single site dict) as a float64 matrix with NaN for missing."""
+    if isinstance(df, dict):
+        df = pd.DataFrame([df])
+    if not len(sensors):
+        return np.empty((len(df), 0))
+    return np.column_stack([
+        df[col].to_numpy(dtype=np.float64, na_value=np.nan) if col in df.columns
+        else np.full(len(df), np.nan)
+        for col in sensors
+    ]).reshape(len(df), len(sensors))
+
+class BenchmarkProfile:
+    """Running per-sensor count/mean/variance and quantile sketches of the benchmarks."""
+
+    def __init__(self, sensors, sketch_k=200):
+        self.sensors = list(sensors)
+        self.count = np.zeros(len(self.sensors), dtype=np.int64)
+        self.mean = np.zeros(len(self.sensors))
+        self.m2 = np.zeros(len(self.sensors))
+        self.sketches = [QuantileSketch(sketch_k) for _ in self.sensors]
+
+    @classmethod
+    def from_frame(cls, df, sensors, chunk_size=10000, sketch_k=200):
+        profile = cls(sensors, sketch_k)
+        for chunk in iter_chunks(df, chunk_size):
+            profile.update(chunk)
+        return profile
+
+    def update(self, df):
+        """Adds a batch of sites (DataFrame) or a single site (dict)."""
+        values = sensor_matrix(df, self.sensors)
+        valid = np.isfinite(values)
+        n_b = valid.sum(axis=0)
+        filled = np.where(valid, values, 0.0)
+        mean_b = np.divide(filled.sum(axis=0), n_b, out=np.zeros(len(self.sensors)), where=n_b > 0)
+        m2_b = (np.where(valid, values - mean_b, 0.0) ** 2).sum(axis=0)
+        self._combine(n_b, mean_b, m2_b)
+        for j, sketch in enumerate(self.sketches):
+            sketch.update(values[valid[:, j], j])
+        return self
+
+    def update_site(self, site):
+        return self.update(site)
+
+    def merge(self, other):
+        """Merges a profile computed on another chunk or process (same sensors)."""
+        if other.sensors != self.sensors:
+            raise ValueError(f"Cannot merge profiles with different sensors: {self.sensors} vs {other.sensors}")
+        self._combine(other.count, other.mean, other.m2)
+        for sketch, other_sketch in zip(self.sketches, other.sketches):
+            sketch.merge(other_sketch)
+        return self
+
+    def _combine(self, n_b, mean_b, m2_b):
+        # Chan et al. parallel update of count/mean/M2
+        n_a = self.count
+        n = n_a + n_b
+        delta = mean_b - self.mean
+        with np.errstate(invalid='ignore', divide='ignore'):
+            self.mean = np.where(n > 0, self.mean + delta * np.where(n > 0, n_b / n, 0.0), 0.0)
+            self.m2 = np.where(n > 0, self.m2 + m2_b + delta ** 2 * np.where(n > 0, n_a * n_b / n, 0.0), 0.0)
+        self.count = n
+
+    @property
+    def std(self):
+        """Sample standard deviation (ddof=1, as pandas .std())."""
+        with np.errstate(invalid='ignore', divide='ignore'):
+            return np.where(self.count > 1, np.sqrt(self.m2 / (self.count - 1)), np.nan)
+
+    def quantiles(self, q):
+        """DataFrame of approximate quantiles (rows) per sensor (columns)."""
+        q = np.atleast_1d(q)
+        return pd.DataFrame({s: sketch.quantile(q) for s, sketch in zip(self.sensors, self.sketches)}, index=q)
+
+    def zscores(self, df):
+        """Candidate z-scores against the benchmark mean/std, as float32."""
+        with np.errstate(invalid='ignore', divide='ignore'):
+            z = (sensor_matrix(df, self.sensors) - self.mean) / self.std
+        return pd.DataFrame(z.astype(np.float32), columns=self.sensors, index=getattr(df, 'index', None))
+
+    def robust_zscores(self, df):
+        """Candidate scores against the benchmark median and IQR (scaled to σ for normal data)."""
+        quartiles = self.quantiles([0.25, 0.5, 0.75]).to_numpy()
+        scale = (quartiles[2] - quartiles[0]) / 1.349
+        with np.errstate(invalid='ignore', divide='ignore'):
+            z = (sensor_matrix(df, self.sensors) - quartiles[1]) / scale
+        return pd.DataFrame(z.astype(np.float32), columns=self.sensors, index=getattr(df, 'index', None))
+
+    def to_dict(self):
+        return {
+            'sensors': self.sensors,
+            'count': self.count.tolist(),
+            'mean': self.mean.tolist(),
+            'm2': self.m2.tolist(),
+            'sketches': [sketch.to_dict() for sketch in self.sketches],
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        profile = cls(data['sensors'])
+        profile.count = np.asarray(data['count'], dtype=np.int64)
+        profile.mean = np.asarray(data['mean'], dtype=np.float64)
+        profile.m2 = np.asarray(data['m2'], dtype=np.float64)
+        profile.sketches = [QuantileSketch.from_dict(sketch) for sketch in data['sketches']]
+        return profile
+
+    def save(self, path):
+        with open(path, 'w') as f:
+            json.dump(self.to_dict(), f)
+
+    @classmethod
+    def load(cls, path):
+        with open(path) as f:
+            return cls.from_dict(json.load(f))
+
+def iter_chunks(df, chunk_size=10000):
+    """Yields consecutive row chunks of an in-memory frame."""
+    for start in range(0, len(df), chunk_size):
+        yield df.iloc[start:start + chunk_size]
+
+def iter_parquet_chunks(path, chunk_size=10000):
+    """Yields result frames batch by batch from a Parquet file (see write_results_parquet)."""
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    for batch in pq.ParquetFile(path).iter_batches(batch_size=chunk_size):
+        yield results_from_arrow(pa.Table.from_batches([batch]))
+
+def parquet_valid_counts(path, columns):
+    """
+    Non-missing values per column of a Parquet file, from the row-group null
+    counts in the footer; a column written without statistics is read alone.
+    """
+    import pyarrow.parquet as pq
+    parquet = pq.ParquetFile(path)
+    meta = parquet.metadata
+    index = {meta.schema.column(j).path: j for j in range(meta.num_columns)}
+    counts = {}
+    for col in columns:
+        if col not in index:
+            continue
+        groups = [meta.row_group(i) for i in range(meta.num_row_groups)]
+        stats = [group.column(index[col]).statistics for group in groups]
+        if all(stat is not None and stat.has_null_count for stat in stats):
+            counts[col] = sum(group.num_rows - stat.null_count for group, stat in zip(groups, stats))
+        else:
+            values = parquet.read(columns=[col]).column(0)
+            counts[col] = len(values) - values.null_count
+    return counts
+
+def stream_zscores(chunks, profile):
+    """Yields the z-scores of every candidate chunk against the benchmark profile."""
+    for chunk in chunks:
+        yield profile.zscores(chunk)
+
+def mean_zscores(chunks, profile):
+    """Per-sensor mean candidate z-score, accumulated batch by batch."""
+    summary = BenchmarkProfile(profile.sensors)
+    for z in stream_zscores(chunks, profile):
+        summary.update(z)
+    return np.where(summary.count > 0, summary.mean, np.nan)
+
+def comparable_sensors(df_benchmark, df_candidates):
+    """
+    Sensor columns of the result schema with valid values in both frames.
+    df_candidates may also be a Parquet path, checked from its footer statistics
+    (parquet_valid_counts) instead of loading the columns.
+    """
+    if isinstance(df_candidates, (str, os.PathLike)):
+        counts = parquet_valid_counts(df_candidates, SENSOR_COLUMNS)
+        has_values = lambda col: counts.get(col, 0) > 0
+    else:
+        has_values = lambda col: col in df_candidates.columns and df_candidates[col].notna().any()
+    return [
+        col for col in SENSOR_COLUMNS
+        if col in df_benchmark.columns and df_benchmark[col].notna().any() and has_values(col)
+    ]
+
+def plot_zscore_profile(sensors, means_bench, means_cand, path=None):
+    """
+    Mean z-score profile of benchmarks vs. candidates; written to path with the
+    Agg canvas (headless, no pyplot state) or shown with pyplot.
+    """
+    if path is not None:
+        from matplotlib.backends.backend_agg import FigureCanvasAgg
+        from matplotlib.figure import Figure
+        fig = Figure(figsize=(10, 5))
+        FigureCanvasAgg(fig)
+        ax = fig.add_subplot(1, 1, 1)
+    else:
+        import matplotlib.pyplot as plt
+        fig, ax = plt.subplots(figsize=(10, 5))
+
+    x = np.arange(len(sensors))
+    ax.plot(x, means_bench, marker='o', label='Benchmark (z)', linewidth=2)
+    ax.plot(x, means_cand, marker='s', label='Candidates (z)', linewidth=2)
+
+    ax.set_ylabel("Z-score (σ)")
+    ax.set_title('Sensor Parameter Means Profile: Benchmarks vs. Nhamini-wi Candidates')
+    ax.set_xticks(x)
+    ax.set_xticklabels(sensors, rotation=45, ha='right')
+    ax.axhline(0, color="gray", linestyle="--", linewidth=0.8)
+    ax.legend()
+    ax.grid(True, axis='y', linestyle='--', alpha=0.4)
+    fig.tight_layout()
+    if path is not None:
+        fig.savefig(path, dpi=100)
+    else:
+        plt.show()
+    return fig
+
+# --- Z-score density ---
+# For large candidate sets (e.g. grid scans) the comparison is drawn from
+# pre-aggregated grids instead of one line per candidate: z-scores are binned
+# per sensor batch by batch, and only the top-N candidates closest to the
+# benchmark profile are kept (bounded heap). Memory and rendering time depend
+# on the number of sensors and bins, not on the number of candidates.
+
+ZSCORE_BINS = np.linspace(-5, 5, 81)
+
+class ZScoreDensity:
+    """Per-sensor histograms of candidate z-scores plus the top-N closest candidates."""
+
+    def __init__(self, sensors, bins=ZSCORE_BINS, top_n=10, min_coverage=0.5):
+        self.sensors = list(sensors)
+        self.bins = np.asarray(bins, dtype=float)
+        self.top_n = top_n
+        self.min_coverage = min_coverage
+        # Values outside the bins are counted in the first/last bin
+        self.counts = np.zeros((len(self.bins) - 1, len(self.sensors)), dtype=np.int64)
+        self.total = 0
+        self._top = []  # max-heap on distance: (-distance, seq, name, z-scores)
+        self._seq = itertools.count()
+
+    def update(self, z, names=None):
+        """Adds a batch of z-scores (DataFrame from BenchmarkProfile.zscores) and their names."""
+        values = sensor_matrix(z, self.sensors)
+        n_bins = len(self.bins) - 1
+        valid = np.isfinite(values)
+        idx = np.clip(np.searchsorted(self.bins, values, side='right') - 1, 0, n_bins - 1)
+        flat = (idx * len(self.sensors) + np.arange(len(self.sensors)))[valid]
+        self.counts += np.bincount(flat, minlength=self.counts.size).reshape(self.counts.shape)
+        self.total += len(values)
+
+        # Distance to the benchmark profile: mean |z| over the sensors with a value
+        coverage = valid.mean(axis=1) if len(self.sensors) else np.zeros(len(values))
+        with np.errstate(invalid='ignore'):
+            distance = np.where(valid, np.abs(values), 0.0).sum(axis=1) / valid.sum(axis=1)
+        distance = np.where(coverage >= self.min_coverage, distance, np.inf)
+        if self.top_n and len(values):
+            k = min(self.top_n, len(values))
+            names = np.asarray(names if names is not None else getattr(z, 'index', np.arange(len(values))))
+            for i in np.argpartition(distance, k - 1)[:k]:
+                if np.isfinite(distance[i]):
+                    self._push(distance[i], names[i], values[i])
+        return self
+
+    def _push(self, distance, name, values):
+        item = (-float(distance), next(self._seq), name, values.astype(float).tolist())
+        if len(self._top) < self.top_n:
+            heapq.heappush(self._top, item)
+        elif item[0] > self._top[0][0]:
+            heapq.heapreplace(self._top, item)
+
+    def merge(self, other):
+        """Merges a density accumulated on another chunk or process (same sensors and bins)."""
+        if other.sensors != self.sensors or not np.array_equal(other.bins, self.bins):
+            raise ValueError("Cannot merge densities with different sensors or bins")
+        self.counts += other.counts
+        self.total += other.total
+        for neg_distance, _, name, values in other._top:
+            self._push(-neg_distance, name, np.asarray(values))
+        return self
+
+    def top(self):
+        """Top-N candidates, closest first: DataFrame with name, distance and the sensor z-scores."""
+        rows = sorted(self._top, key=lambda item: -item[0])
+        df = pd.DataFrame([values for _, _, _, values in rows], columns=self.sensors)
+        df.insert(0, 'distance', [-item[0] for item in rows])
+        df.insert(0, 'name', [item[2] for item in rows])
+        return df
+
+    def quantiles(self, q):
+        """Approximate per-sensor quantiles from the histograms (bin centers)."""
+        centers = (self.bins[:-1] + self.bins[1:]) / 2
+        cumulative = np.cumsum(self.counts, axis=0)
+        result = {}
+        for j, sensor in enumerate(self.sensors):
+            n = cumulative[-1, j]
+            result[sensor] = (centers[np.minimum(np.searchsorted(cumulative[:, j], np.atleast_1d(q) * n), len(centers) - 1)]
+                              if n else np.full(len(np.atleast_1d(q)), np.nan))
+        return pd.DataFrame(result, index=np.atleast_1d(q))
+
+def plot_zscore_density(density, path, kind='heatmap', means_bench=None, dpi=100):
+    """
+    Draws a ZScoreDensity as a heatmap (sensor x z-score bin, per-sensor share of
+    candidates) or as violin-style profiles, with the top-N candidates overlaid,
+    and writes the PNG with the Agg canvas (headless, no pyplot state).
+    """
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+    from matplotlib.figure import Figure
+
+    sensors = density.sensors
+    x = np.arange(len(sensors))
+    lo, hi = density.bins[0], density.bins[-1]
+    centers = (density.bins[:-1] + density.bins[1:]) / 2
+    totals = density.counts.sum(axis=0)
+    share = np.divide(density.counts, totals, out=np.zeros(density.counts.shape), where=totals > 0)
+
+    fig = Figure(figsize=(max(8, 1.1 * len(sensors) + 3), 6))
+    FigureCanvasAgg(fig)
+    ax = fig.add_subplot(1, 1, 1)
+    if kind == 'heatmap':
+        mesh = ax.imshow(share, origin='lower', aspect='auto', cmap='magma', interpolation='nearest',
+                         extent=(-0.5, len(sensors) - 0.5, lo, hi))
+        fig.colorbar(mesh, ax=ax, label='Share of candidates')
+        top_color = 'cyan'
+    elif kind == 'violin':
+        width = share / np.maximum(share.max(axis=0), 1e-12) * 0.4
+        for j in x:
+            ax.fill_betweenx(centers, j - width[:, j], j + width[:, j], color='tab:blue', alpha=0.5, linewidth=0)
+        median = density.quantiles(0.5).to_numpy()[0]
+        ax.scatter(x, median, marker='_', s=300, color='black', label='Candidate median')
+        ax.set_xlim(-0.5, len(sensors) - 0.5)
+        top_color = 'tab:red'
+    else:
+        raise ValueError(f"Unknown density plot kind: {kind}")
+
+    top = density.top()
+    for k, row in top.iterrows():
+        ax.plot(x, np.clip(row[sensors].to_numpy(dtype=float), lo, hi), color=top_color, marker='o', markersize=3,
+                linewidth=1, alpha=max(0.3, 1 - k / max(len(top), 1)), label=f'Top {len(top)} closest' if k == 0 else None)
+    if means_bench is not None:
+        ax.plot(x, means_bench, color='white' if kind == 'heatmap' else 'black', marker='s', linewidth=2,
+                label='Benchmark (z)')
+    ax.axhline(0, color='gray', linestyle='--', linewidth=0.8)
+    ax.set_ylim(lo, hi)
+    ax.set_ylabel("Z-score (σ)")
+    ax.set_title(f'Candidate z-score density ({density.total:,} candidates) vs. benchmarks')
+    ax.set_xticks(x)
+    ax.set_xticklabels(sensors, rotation=45, ha='right')
+    ax.legend(loc='upper right', fontsize='small')
+    fig.tight_layout()
+    fig.savefig(path, dpi=dpi)
+    return path
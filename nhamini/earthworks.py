@@ -0,0 +1,256 @@
+# nhamini/earthworks.py
+
+# Local screening of raster chips around candidates for geoglyph/earthwork shapes
+# before anything is sent to o3. Every chip (NDVI, SRTM elevation and slope,
+# Sentinel-1 VV) goes through vectorized NumPy detectors:
+#   - ring and square enclosures: gradient-directed Hough voting over a range of radii
+#   - local contrast: centre vs surroundings box filter (integral images)
+#   - terrain curvature: Laplacian of the elevation (banks and ditches)
+# Chips are scored in a process pool; synthetic_chip builds test chips with known shapes.
+# Earth Engine is only imported by fetch_chip, so pool workers start with NumPy alone.
+
+import math
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+
+CHIP_BANDS = ['NDVI', 'elevation', 'slope', 'VV']
+NODATA = -9999
+
+# --- Fetch chips from Earth Engine ---
+
+def fetch_chip(lat, lon, size_px=128, scale_m=10, year=2023, catalog=None):
+    """
+    Returns {band: (size_px, size_px) float32 array} centred on the point, with
+    NaN where there is no data. catalog is an optional Sentinel-2 SceneCatalog
+    (nhamini.scenes) so the chip uses the same scene as the enrichment. If Earth
+    Engine fails (e.g. no Sentinel-2 scene under the cloud limit), the chip is
+    all NaN, which score_chip scores as 0.
+    """
+    try:
+        return _fetch_chip(lat, lon, size_px, scale_m, year, catalog)
+    except Exception as e:
+        print(f"[WARNING] Could not fetch chip at ({lat}, {lon}): {e}")
+        return empty_chip(size_px, scale_m)
+
+def empty_chip(size_px=128, scale_m=10):
+    """All-NaN chip (no data in any band)."""
+    chip = {band: np.full((size_px, size_px), np.nan, dtype=np.float32) for band in CHIP_BANDS}
+    chip['scale_m'] = scale_m
+    return chip
+
+def _fetch_chip(lat, lon, size_px, scale_m, year, catalog):
+    import ee
+    from .scenes import s1_collection, s2_collection
+    point = ee.Geometry.Point([lon, lat])
+    scene = catalog.select(lat, lon) if catalog is not None else None
+    if scene is not None:
+        s2 = catalog.image(scene)
+    else:
+        s2 = ee.Image(s2_collection(year).filterBounds(point).sort('CLOUDY_PIXEL_PERCENTAGE').first())
+    srtm = ee.Image("USGS/SRTMGL1_003")
+    s1 = s1_collection(year, 'VV').filterBounds(point).select('VV')
+    vv = ee.Image(ee.Algorithms.If(s1.size().gt(0), s1.median(),
+                                   ee.Image.constant(NODATA).rename('VV').selfMask()))
+    image = ee.Image.cat([
+        s2.normalizedDifference(['B8', 'B4']).rename('NDVI'),
+        srtm.select('elevation').rename('elevation'),
+        ee.Terrain.slope(srtm).rename('slope'),
+        vv.rename('VV'),
+    ]).toFloat().unmask(NODATA)
+
+    dlat = scale_m / 111320
+    dlon = scale_m / (40075000 * math.cos(math.radians(lat)) / 360)
+    pixels = ee.data.computePixels({
+        'expression': image,
+        'fileFormat': 'NUMPY_NDARRAY',
+        'grid': {
+            'dimensions': {'width': size_px, 'height': size_px},
+            'affineTransform': {
+                'scaleX': dlon, 'shearX': 0, 'translateX': lon - dlon * size_px / 2,
+                'shearY': 0, 'scaleY': -dlat, 'translateY': lat + dlat * size_px / 2,
+            },
+            'crsCode': 'EPSG:4326',
+        },
+    })
+    chip = {}
+    for band in CHIP_BANDS:
+        values = np.asarray(pixels[band], dtype=np.float32)
+        chip[band] = np.where(values == NODATA, np.nan, values)
+    chip['scale_m'] = scale_m
+    return chip
+
+# --- Synthetic chips ---
+
+def synthetic_chip(size_px=128, shape='ring', radius_px=20, width_px=3, noise=0.05, scale_m=10, seed=0):
+    """
+    Chip with a known enclosure: a ditch (low NDVI, low VV) with an outer bank
+    (raised elevation) shaped as a 'ring', a 'square' or nothing (shape=None).
+    """
+    rng = np.random.default_rng(seed)
+    yy, xx = np.mgrid[:size_px, :size_px] - (size_px - 1) / 2
+    if shape == 'ring':
+        distance = np.hypot(xx, yy)
+    elif shape == 'square':
+        distance = np.maximum(np.abs(xx), np.abs(yy))
+    else:
+        distance = np.full((size_px, size_px), np.inf)
+    ditch = np.abs(distance - radius_px) <= width_px / 2
+    bank = np.abs(distance - radius_px - width_px) <= width_px / 2
+
+    ndvi = 0.8 - 0.3 * ditch + rng.normal(0, noise, (size_px, size_px))
+    elevation = 200 + 0.01 * xx - 1.5 * ditch + 1.0 * bank + rng.normal(0, noise * 5, (size_px, size_px))
+    gy, gx = np.gradient(elevation, scale_m)
+    slope = np.degrees(np.arctan(np.hypot(gx, gy)))
+    vv = -8 - 3 * ditch + rng.normal(0, noise * 20, (size_px, size_px))
+    return {
+        'NDVI': ndvi.astype(np.float32),
+        'elevation': elevation.astype(np.float32),
+        'slope': slope.astype(np.float32),
+        'VV': vv.astype(np.float32),
+        'scale_m': scale_m,
+    }
+
+# --- Detectors ---
+
+def normalize(band):
+    """Robust z-score (median/MAD) with missing pixels set to the median."""
+    band = np.asarray(band, dtype=np.float64)
+    valid = np.isfinite(band)
+    if not valid.any():
+        return np.zeros_like(band)
+    median = np.median(band[valid])
+    mad = np.median(np.abs(band[valid] - median)) * 1.4826
+    scale = mad if mad > 0 else (band[valid].std() or 1.0)
+    return np.where(valid, (band - median) / scale, 0.0)
+
+def box_sum(img, r, mode='edge'):
+    """Sum over a (2r+1) x (2r+1) window at every pixel (integral image, padded with np.pad mode)."""
+    padded = np.pad(img, r + 1, mode=mode)
+    integral = padded.cumsum(axis=0).cumsum(axis=1)
+    size = 2 * r + 1
+    return (integral[size:, size:] - integral[:-size, size:] -
+            integral[size:, :-size] + integral[:-size, :-size])[:img.shape[0], :img.shape[1]]
+
+def box_mean(img, r):
+    return box_sum(img, r) / (2 * r + 1) ** 2
+
+def gradients(img):
+    """Sobel gradients (gy, gx)."""
+    p = np.pad(img, 1, mode='edge')
+    gx = (p[:-2, 2:] + 2 * p[1:-1, 2:] + p[2:, 2:]) - (p[:-2, :-2] + 2 * p[1:-1, :-2] + p[2:, :-2])
+    gy = (p[2:, :-2] + 2 * p[2:, 1:-1] + p[2:, 2:]) - (p[:-2, :-2] + 2 * p[:-2, 1:-1] + p[:-2, 2:])
+    return gy, gx
+
+def laplacian(img):
+    p = np.pad(img, 1, mode='edge')
+    return p[:-2, 1:-1] + p[2:, 1:-1] + p[1:-1, :-2] + p[1:-1, 2:] - 4 * p[1:-1, 1:-1]
+
+def hough_enclosures(img, radii, edge_quantile=0.9):
+    """
+    Gradient-directed Hough voting. Every strong edge pixel votes for centres at
+    distance r on both sides of its gradient. A ring concentrates its votes in
+    one cell around the centre, from every direction (the 1-, 2- and 4-fold
+    coherent part of the cell is removed, so corners, squares and parallel
+    lines do not score as rings). A square (any rotation) spreads its votes over a
+    cross of half-width r, but its edges share one orientation modulo 90 degrees,
+    so the square accumulator sums exp(4i*theta) votes over a box of half-size
+    r/2 and keeps the coherent magnitude (close to zero for rings and noise).
+    Scores are the votes above the chip background per unit of perimeter.
+    """
+    gy, gx = gradients(img)
+    magnitude = np.hypot(gx, gy)
+    threshold = np.quantile(magnitude, edge_quantile)
+    ys, xs = np.nonzero(magnitude > max(threshold, 1e-9))
+    h, w = img.shape
+    best = {'ring_score': 0.0, 'ring_radius_px': 0, 'ring_center': (h // 2, w // 2),
+            'square_score': 0.0, 'square_radius_px': 0, 'square_center': (h // 2, w // 2)}
+    if not len(ys):
+        return best
+    ny = gy[ys, xs] / magnitude[ys, xs]
+    nx = gx[ys, xs] / magnitude[ys, xs]
+    theta = np.arctan2(ny, nx)
+    harmonics = {k: (np.tile(np.cos(k * theta), 2), np.tile(np.sin(k * theta), 2)) for k in (2, 4)}
+    # Direction each vote travels (+n, then -n): its first harmonic cancels
+    # only when the votes reach a cell from all sides
+    harmonics[1] = (np.concatenate([nx, -nx]), np.concatenate([ny, -ny]))
+    for r in radii:
+        cy = np.rint(np.concatenate([ys + r * ny, ys - r * ny])).astype(np.int64)
+        cx = np.rint(np.concatenate([xs + r * nx, xs - r * nx])).astype(np.int64)
+        inside = (cy >= 0) & (cy < h) & (cx >= 0) & (cx < w)
+        cells = cy[inside] * w + cx[inside]
+
+        def accumulate(weights=None):
+            return np.bincount(cells, weights=weights, minlength=h * w).reshape(h, w).astype(np.float64)
+
+        def coherent(k, half):
+            cos_k, sin_k = harmonics[k]
+            return np.hypot(box_sum(accumulate(cos_k[inside]), half, 'constant'),
+                            box_sum(accumulate(sin_k[inside]), half, 'constant'))
+
+        # Ring: votes in a cell of half-size max(2, r/8) (vote scatter grows with r; the two edges of a ditch or bank land
+        # either side of the centre) over the circumference. Only the part
+        # spread over all orientations counts: the side midpoints of a square
+        # (4-fold) or parallel linear edges (2-fold) also meet in one cell,
+        # but from a few directions only, as do the corners of a square (1-fold).
+        cell = max(2, int(round(r / 8)))
+        core = box_sum(accumulate(), cell, 'constant')
+        core = core - np.maximum.reduce([coherent(1, cell), coherent(2, cell), coherent(4, cell)])
+        ring = (core - core.mean()) / (2 * math.pi * r)
+        # Square: orientation-coherent votes along the arms of the cross
+        square = coherent(4, max(2, r // 2))
+        square = (square - square.mean()) / (8 * r)
+        for name, score in (('ring', ring), ('square', square)):
+            peak = int(np.argmax(score))
+            if score.flat[peak] > best[f'{name}_score']:
+                best[f'{name}_score'] = float(score.flat[peak])
+                best[f'{name}_radius_px'] = int(r)
+                best[f'{name}_center'] = divmod(peak, w)
+    return best
+
+def local_contrast(img, inner_px, outer_px):
+    """Largest |centre box mean - surrounding box mean| over the chip."""
+    return float(np.abs(box_mean(img, inner_px) - box_mean(img, outer_px)).max())
+
+# Enclosure radii searched (geoglyphs in Acre/Rondônia are roughly 80-500 m across)
+RADII_M = (40, 45, 50, 56, 63, 70, 80, 90, 100, 112, 125, 140, 160, 180, 200, 225, 250)
+
+def score_chip(chip, radii_m=RADII_M, edge_quantile=0.9):
+    """
+    Per-candidate shape score of one chip. Ring/square scores are the best over
+    the NDVI, slope and VV bands; curvature uses the elevation band.
+    """
+    scale_m = chip.get('scale_m', 10)
+    size = min(np.shape(chip['NDVI']))
+    radii = sorted({int(round(r / scale_m)) for r in radii_m if 2 <= r / scale_m < size / 2})
+    result = {'ring_score': 0.0, 'square_score': 0.0, 'contrast': 0.0}
+    for band in ('NDVI', 'slope', 'VV'):
+        if band not in chip or not np.isfinite(chip[band]).any():
+            continue
+        img = normalize(chip[band])
+        shapes = hough_enclosures(img, radii, edge_quantile)
+        for name in ('ring', 'square'):
+            if shapes[f'{name}_score'] > result[f'{name}_score']:
+                result[f'{name}_score'] = shapes[f'{name}_score']
+                result[f'{name}_band'] = band
+                result[f'{name}_radius_m'] = shapes[f'{name}_radius_px'] * scale_m
+                cy, cx = shapes[f'{name}_center']
+                result[f'{name}_offset_m'] = float(math.hypot(cy - (size - 1) / 2, cx - (size - 1) / 2) * scale_m)
+        result['contrast'] = max(result['contrast'], local_contrast(img, 2, 8))
+    if 'elevation' in chip and np.isfinite(chip['elevation']).any():
+        # Banks and ditches: 99th percentile of |Laplacian| of the smoothed DEM over its median
+        curvature = np.abs(laplacian(box_mean(normalize(chip['elevation']), 1)))
+        result['curvature'] = float(np.quantile(curvature, 0.99) / max(np.median(curvature), 1e-9))
+    else:
+        result['curvature'] = 0.0
+    result['shape_score'] = max(result['ring_score'], result['square_score'])
+    return result
+
+def score_chips(chips, workers=None, chunksize=8):
+    """
+    Scores chips in a process pool; returns one result dict per chip, in order.
+    """
+    chips = list(chips)
+    if workers == 1 or len(chips) < 2:
+        return [score_chip(chip) for chip in chips]
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        return list(pool.map(score_chip, chips, chunksize=chunksize))
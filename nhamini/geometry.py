@@ -0,0 +1,294 @@
+# nhamini/geometry.py
+
+# Vectorized footprints for candidate areas: bounding boxes and circle polygons
+# for whole arrays of (lat, lon, radius_m) with NumPy, encoded as WKB and
+# written as GeoParquet, plus a Sort-Tile-Recursive (STR) packed R-tree for
+# overlap, duplicate and nearest-benchmark queries.
+
+import json
+import math
+import numpy as np
+
+METERS_PER_DEGREE_LAT = 111320
+EARTH_CIRCUMFERENCE_M = 40075000
+EARTH_RADIUS_M = 6371008.8
+
+def degree_offsets(lat, radius_m):
+    """Radius in degrees of latitude and longitude (same approximation as get_bbox)."""
+    lat = np.asarray(lat, dtype=np.float64)
+    radius_m = np.asarray(radius_m, dtype=np.float64)
+    dlat = radius_m / METERS_PER_DEGREE_LAT
+    dlon = radius_m / (EARTH_CIRCUMFERENCE_M * np.cos(np.radians(lat)) / 360)
+    return dlat, dlon
+
+def candidate_bboxes(lat, lon, radius_m):
+    """(n, 4) array of [min_lon, min_lat, max_lon, max_lat]."""
+    lon = np.asarray(lon, dtype=np.float64)
+    lat = np.asarray(lat, dtype=np.float64)
+    dlat, dlon = degree_offsets(lat, radius_m)
+    return np.column_stack([lon - dlon, lat - dlat, lon + dlon, lat + dlat])
+
+def bbox_rings(bboxes):
+    """(n, 5, 2) closed lon/lat rings of the bounding boxes."""
+    min_lon, min_lat, max_lon, max_lat = np.asarray(bboxes, dtype=np.float64).T
+    xs = np.column_stack([min_lon, min_lon, max_lon, max_lon, min_lon])
+    ys = np.column_stack([min_lat, max_lat, max_lat, min_lat, min_lat])
+    return np.stack([xs, ys], axis=-1)
+
+def circle_rings(lat, lon, radius_m, n_points=36):
+    """(n, n_points + 1, 2) closed lon/lat rings approximating each circle."""
+    lat = np.asarray(lat, dtype=np.float64)
+    lon = np.asarray(lon, dtype=np.float64)
+    dlat, dlon = degree_offsets(lat, radius_m)
+    angle = 2 * np.pi * np.arange(n_points + 1) / n_points
+    xs = lon[:, None] + np.asarray(dlon)[..., None] * np.cos(angle)
+    ys = lat[:, None] + np.asarray(dlat)[..., None] * np.sin(angle)
+    return np.stack([xs, ys], axis=-1)
+
+def _wkb_polygon_buffer(rings):
+    """Packs (n, m, 2) rings into one buffer of n little-endian WKB polygons of equal size."""
+    rings = np.ascontiguousarray(rings, dtype=np.float64)
+    n, m = rings.shape[:2]
+    dtype = np.dtype([('order', 'u1'), ('type', '<u4'), ('rings', '<u4'), ('points', '<u4'),
+                      ('coords', '<f8', (m, 2))])
+    packed = np.empty(n, dtype=dtype)
+    packed['order'] = 1   # little endian
+    packed['type'] = 3    # Polygon
+    packed['rings'] = 1
+    packed['points'] = m
+    packed['coords'] = rings
+    return packed, dtype.itemsize
+
+def polygons_to_wkb(rings):
+    """Object array with one WKB polygon (bytes) per ring."""
+    packed, size = _wkb_polygon_buffer(rings)
+    raw = packed.tobytes()
+    out = np.empty(len(packed), dtype=object)
+    out[:] = [raw[i * size:(i + 1) * size] for i in range(len(packed))]
+    return out
+
+def polygons_to_wkb_arrow(rings):
+    """
+    pyarrow LargeBinaryArray of WKB polygons sharing the packed NumPy buffer (no
+    per-row copies); int64 offsets, so grid-scale sets may exceed 2 GiB.
+    """
+    import pyarrow as pa
+    packed, size = _wkb_polygon_buffer(rings)
+    offsets = np.arange(len(packed) + 1, dtype=np.int64) * size
+    return pa.LargeBinaryArray.from_buffers(
+        pa.large_binary(), len(packed), [None, pa.py_buffer(offsets), pa.py_buffer(packed)])
+
+def polygons_to_wkt(rings):
+    """WKT strings (for display only; use WKB for storage and exchange)."""
+    return [
+        "POLYGON((" + ", ".join(f"{x} {y}" for x, y in ring) + "))"
+        for ring in np.asarray(rings)
+    ]
+
+def write_geoparquet(df, rings, path, geometry_column='geometry'):
+    """
+    Writes df plus a WKB polygon column as GeoParquet (lon/lat, OGC:CRS84).
+    Columns that are not Arrow-friendly (e.g. Python lists) should be dropped first.
+    """
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    table = table.append_column(geometry_column, polygons_to_wkb_arrow(rings))
+    rings = np.asarray(rings)
+    geo = {
+        'version': '1.0.0',
+        'primary_column': geometry_column,
+        'columns': {geometry_column: {
+            'encoding': 'WKB',
+            'geometry_types': ['Polygon'],
+            'bbox': [float(rings[..., 0].min()), float(rings[..., 1].min()),
+                     float(rings[..., 0].max()), float(rings[..., 1].max())] if len(rings) else [],
+        }},
+    }
+    metadata = dict(table.schema.metadata or {})
+    metadata[b'geo'] = json.dumps(geo).encode()
+    pq.write_table(table.replace_schema_metadata(metadata), path)
+
+def haversine_m(lat1, lon1, lat2, lon2):
+    """Great-circle distance in meters (broadcasts over arrays)."""
+    lat1, lon1, lat2, lon2 = (np.radians(np.asarray(v, dtype=np.float64)) for v in (lat1, lon1, lat2, lon2))
+    a = (np.sin((lat2 - lat1) / 2) ** 2 +
+         np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2)
+    return 2 * EARTH_RADIUS_M * np.arcsin(np.sqrt(np.minimum(a, 1.0)))
+
+# --- Spatial index ---
+
+class STRTree:
+    """
+    Sort-Tile-Recursive packed R-tree over (n, 4) boxes [min_x, min_y, max_x, max_y].
+    Leaves are ordered by STR (vertical slices sorted by y) and every upper level
+    packs node_capacity consecutive children, so a query is a few vectorized
+    box tests per level.
+    """
+
+    def __init__(self, boxes, node_capacity=16):
+        boxes = np.asarray(boxes, dtype=np.float64).reshape(-1, 4)
+        self.capacity = node_capacity
+        self.items = self._str_order(boxes)
+        self.levels = [boxes[self.items]]
+        while len(self.levels[-1]) > node_capacity:
+            self.levels.append(self._pack(self.levels[-1]))
+        self.levels.reverse()  # root level first
+
+    def __len__(self):
+        return len(self.items)
+
+    def _str_order(self, boxes):
+        n = len(boxes)
+        if n == 0:
+            return np.empty(0, dtype=np.int64)
+        cx = (boxes[:, 0] + boxes[:, 2]) / 2
+        cy = (boxes[:, 1] + boxes[:, 3]) / 2
+        leaves = math.ceil(n / self.capacity)
+        slice_size = math.ceil(math.sqrt(leaves)) * self.capacity
+        by_x = np.argsort(cx, kind='stable')
+        slice_id = np.empty(n, dtype=np.int64)
+        slice_id[by_x] = np.arange(n) // slice_size
+        return np.lexsort((cy, slice_id))
+
+    def _pack(self, boxes):
+        parents = math.ceil(len(boxes) / self.capacity)
+        starts = np.arange(parents) * self.capacity
+        return np.column_stack([
+            np.minimum.reduceat(boxes[:, 0], starts), np.minimum.reduceat(boxes[:, 1], starts),
+            np.maximum.reduceat(boxes[:, 2], starts), np.maximum.reduceat(boxes[:, 3], starts),
+        ])
+
+    def query(self, box):
+        """Indices (into the original boxes) of the boxes intersecting box."""
+        if not len(self.items):
+            return np.empty(0, dtype=np.int64)
+        min_x, min_y, max_x, max_y = box
+        nodes = np.arange(len(self.levels[0]))
+        for depth, level in enumerate(self.levels):
+            if depth:
+                children = (nodes[:, None] * self.capacity + np.arange(self.capacity)).ravel()
+                nodes = children[children < len(level)]
+            b = level[nodes]
+            nodes = nodes[(b[:, 0] <= max_x) & (b[:, 2] >= min_x) & (b[:, 1] <= max_y) & (b[:, 3] >= min_y)]
+            if not len(nodes):
+                return np.empty(0, dtype=np.int64)
+        return np.sort(self.items[nodes])
+
+    def query_many(self, boxes):
+        """
+        All (query, item) pairs whose boxes intersect, for an (m, 4) array of query
+        boxes; the tree is walked level by level for all queries at once.
+        """
+        boxes = np.asarray(boxes, dtype=np.float64).reshape(-1, 4)
+        if not len(self.items) or not len(boxes):
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64)
+        queries = np.repeat(np.arange(len(boxes)), len(self.levels[0]))
+        nodes = np.tile(np.arange(len(self.levels[0])), len(boxes))
+        for depth, level in enumerate(self.levels):
+            if depth:
+                queries = np.repeat(queries, self.capacity)
+                nodes = (nodes[:, None] * self.capacity + np.arange(self.capacity)).ravel()
+                inside = nodes < len(level)
+                queries, nodes = queries[inside], nodes[inside]
+            b, q = level[nodes], boxes[queries]
+            hit = (b[:, 0] <= q[:, 2]) & (b[:, 2] >= q[:, 0]) & (b[:, 1] <= q[:, 3]) & (b[:, 3] >= q[:, 1])
+            queries, nodes = queries[hit], nodes[hit]
+        return queries, self.items[nodes]
+
+def candidate_index(lat, lon, radius_m, node_capacity=16):
+    """STR tree over the bounding boxes of the candidate circles."""
+    return STRTree(candidate_bboxes(lat, lon, radius_m), node_capacity)
+
+def overlapping_pairs(lat, lon, radius_m, tree=None):
+    """(k, 2) array of candidate pairs i < j whose circles overlap."""
+    lat = np.asarray(lat, dtype=np.float64)
+    lon = np.asarray(lon, dtype=np.float64)
+    radius_m = np.broadcast_to(np.asarray(radius_m, dtype=np.float64), lat.shape)
+    boxes = candidate_bboxes(lat, lon, radius_m)
+    tree = tree or STRTree(boxes)
+    i, j = tree.query_many(boxes)
+    keep = j > i
+    i, j = i[keep], j[keep]
+    close = haversine_m(lat[i], lon[i], lat[j], lon[j]) < radius_m[i] + radius_m[j]
+    pairs = np.column_stack([i[close], j[close]])
+    return pairs[np.lexsort((pairs[:, 1], pairs[:, 0]))]
+
+def duplicate_groups(lat, lon, tolerance_m=50):
+    """Group label per point; points within tolerance_m of each other share a label."""
+    pairs = overlapping_pairs(lat, lon, tolerance_m / 2)
+    parent = np.arange(len(np.asarray(lat)))
+
+    def find(i):
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+
+    for i, j in pairs:
+        ri, rj = find(i), find(j)
+        if ri != rj:
+            parent[max(ri, rj)] = min(ri, rj)
+    return np.array([find(i) for i in range(len(parent))], dtype=np.int64)
+
+def search_boxes(lat, lon, radius_m):
+    """
+    (n, 4) lon/lat boxes containing every point within radius_m (haversine, the
+    same sphere as haversine_m) of each centre: the bounding box of the
+    spherical cap, with the full longitude range when the cap reaches a pole.
+    """
+    lat = np.asarray(lat, dtype=np.float64)
+    lon = np.asarray(lon, dtype=np.float64)
+    angle = np.minimum(np.asarray(radius_m, dtype=np.float64) / EARTH_RADIUS_M, math.pi)
+    dlat = np.degrees(angle)
+    cos_lat = np.cos(np.radians(lat))
+    with np.errstate(divide='ignore', invalid='ignore'):
+        ratio = np.sin(angle) / cos_lat
+    polar = (np.abs(lat) + dlat >= 90) | (ratio >= 1) | (angle >= math.pi / 2)
+    dlon = np.where(polar, 180.0, np.degrees(np.arcsin(np.clip(ratio, 0, 1))))
+    return np.column_stack([np.where(polar, -180.0, lon - dlon), np.maximum(lat - dlat, -90.0),
+                            np.where(polar, 180.0, lon + dlon), np.minimum(lat + dlat, 90.0)])
+
+def nearest_benchmark(lat, lon, bench_lat, bench_lon, start_radius_m=1000):
+    """
+    Index of and distance (m) to the nearest benchmark for every candidate, using
+    an STR tree over the benchmarks and a search box that grows for the
+    candidates still unresolved.
+    """
+    lat = np.asarray(lat, dtype=np.float64)
+    lon = np.asarray(lon, dtype=np.float64)
+    bench_lat = np.asarray(bench_lat, dtype=np.float64)
+    bench_lon = np.asarray(bench_lon, dtype=np.float64)
+    nearest = np.full(len(lat), -1, dtype=np.int64)
+    distance = np.full(len(lat), np.nan)
+    if not len(bench_lat):
+        return nearest, distance
+    tree = STRTree(np.column_stack([bench_lon, bench_lat, bench_lon, bench_lat]))
+    pending = np.arange(len(lat))
+    radius = float(start_radius_m)
+    while len(pending):
+        boxes = search_boxes(lat[pending], lon[pending], radius)
+        # Boxes crossing the antimeridian also query their wrapped half
+        west, east = boxes[:, 0] < -180, boxes[:, 2] > 180
+        owner = np.concatenate([np.arange(len(pending)), np.flatnonzero(west), np.flatnonzero(east)])
+        boxes = np.vstack([boxes, boxes[west] + [360, 0, 360, 0], boxes[east] - [360, 0, 360, 0]])
+        q, hits = tree.query_many(boxes)
+        q = owner[q]
+        d = haversine_m(lat[pending[q]], lon[pending[q]], bench_lat[hits], bench_lon[hits])
+        # Nearest hit per query: sort by (query, distance) and take the first of each query
+        order = np.lexsort((d, q))
+        q, hits, d = q[order], hits[order], d[order]
+        first = np.ones(len(q), dtype=bool)
+        first[1:] = q[1:] != q[:-1]
+        q, hits, d = q[first], hits[first], d[first]
+        # Anything closer than radius lies inside the box, so those hits are exact
+        exact = (d <= radius) | (radius > math.pi * EARTH_RADIUS_M)
+        nearest[pending[q[exact]]] = hits[exact]
+        distance[pending[q[exact]]] = d[exact]
+        resolved = np.zeros(len(pending), dtype=bool)
+        resolved[q[exact]] = True
+        pending = pending[~resolved]
+        if radius > math.pi * EARTH_RADIUS_M:
+            break
+        radius *= 4
+    return nearest, distance
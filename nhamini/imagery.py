@@ -0,0 +1,367 @@
+# nhamini/imagery.py
+
+# Sentinel-2/Sentinel-1 thumbnails of candidate locations: HTML download links
+# for the candidate table and multi-panel plots of the closest matches, which
+# can be rendered concurrently as the matches arrive (MatchImagery).
+
+import os
+import re
+
+import ee
+
+from .scenes import catalog_for
+
+# Functions to generate download links for different sensors
+def s2_thumbnail_image(lat, lon, year="2023", month="05", catalog=None):
+    # With a scene catalogue, use the same least cloudy scene as the enrichment
+    # (same catalogue, same selection radius)
+    if catalog is not None:
+        scene = catalog.select(lat, lon)
+        return catalog.image(scene) if scene is not None else None
+    collection = ee.ImageCollection('COPERNICUS/S2_SR_HARMONIZED') \
+        .filterBounds(ee.Geometry.Point(lon, lat)) \
+        .filterDate(f'{year}-{month}-01', f'{year}-{month}-31')
+    return collection.first()
+
+def get_rgb_download_url_html(lat, lon, year="2023", month="05", catalog=None):
+    try:
+        image = s2_thumbnail_image(lat, lon, year, month, catalog)
+        region = ee.Geometry.Point(lon, lat).buffer(500).bounds()
+        url = image.getThumbURL({
+            'bands': ['B4', 'B3', 'B2'],
+            'min': 500, 'max': 2500,
+            'dimensions': 512,
+            'region': region
+        })
+        if url:
+            return f'<a href="{url}" target="_blank">RGB</a>'
+        else:
+            return None
+    except Exception:
+        return None
+
+def get_ndvi_download_url_html(lat, lon, year="2023", month="05", catalog=None):
+    try:
+        image = s2_thumbnail_image(lat, lon, year, month, catalog).normalizedDifference(['B8', 'B4']).rename('NDVI')
+        region = ee.Geometry.Point(lon, lat).buffer(500).bounds()
+        url = image.getThumbURL({
+            'min': 0, 'max': 1,
+            'palette': ['blue', 'white', 'green'],
+            'dimensions': 512,
+            'region': region
+        })
+        if url:
+            return f'<a href="{url}" target="_blank">NDVI</a>'
+        else:
+            return None
+    except Exception:
+        return None
+
+def get_ndwi_download_url_html(lat, lon, year="2023", month="05", catalog=None):
+    try:
+        image = s2_thumbnail_image(lat, lon, year, month, catalog).normalizedDifference(['B3', 'B8']).rename('NDWI')
+        region = ee.Geometry.Point(lon, lat).buffer(500).bounds()
+        url = image.getThumbURL({
+            'min': -1, 'max': 1,
+            'palette': ['brown', 'beige', 'blue'],
+            'dimensions': 512,
+            'region': region
+        })
+        if url:
+            return f'<a href="{url}" target="_blank">NDWI</a>'
+        else:
+            return None
+    except Exception:
+        return None
+
+def get_ndbi_download_url_html(lat, lon, year="2023", month="05", catalog=None):
+    try:
+        image = s2_thumbnail_image(lat, lon, year, month, catalog).normalizedDifference(['B11', 'B8']).rename('NDBI')
+        region = ee.Geometry.Point(lon, lat).buffer(500).bounds()
+        url = image.getThumbURL({
+            'min': -1, 'max': 1,
+            'palette': ['white', 'gray', 'black'],
+            'dimensions': 512,
+            'region': region
+        })
+        if url:
+            return f'<a href="{url}" target="_blank">NDBI</a>'
+        else:
+            return None
+    except Exception:
+        return None
+
+def get_s1_vv_download_url_html(lat, lon, year="2023", catalog=None):
+    try:
+        point = ee.Geometry.Point(lon, lat).buffer(500)
+        if catalog is not None:
+            s1 = catalog.collection(catalog.scenes_at(lat, lon)).select('VV')
+        else:
+            s1 = ee.ImageCollection('COPERNICUS/S1_GRD') \
+                .filterBounds(point) \
+                .filterDate(f'{year}-01-01', f'{year}-12-31') \
+                .filter(ee.Filter.eq('instrumentMode', 'IW')) \
+                .filter(ee.Filter.listContains('transmitterReceiverPolarisation', 'VV')) \
+                .select('VV')
+        s1_img = s1.median().clip(point)
+        url = s1_img.getThumbURL({
+            'region': point, 'dimensions': 512, 'min': -25, 'max': 0,
+            'palette': ['black', 'white']})
+        if url:
+            return f'<a href="{url}" target="_blank">Sentinel-1 VV</a>'
+        else:
+            return None
+    except Exception:
+        return None
+
+# Download column with all available links (adds only the sensors that are actually available)
+def make_download_links(row, catalogs=None, year=2023):
+    s2_catalog = catalog_for(catalogs, 'S2', year) if catalogs else None
+    vv_catalog = catalog_for(catalogs, 'S1_VV', year) if catalogs else None
+    links = []
+    rgb = get_rgb_download_url_html(row['lat'], row['lon'], year, catalog=s2_catalog)
+    if rgb:
+        links.append(rgb)
+    ndvi = get_ndvi_download_url_html(row['lat'], row['lon'], year, catalog=s2_catalog)
+    if ndvi:
+        links.append(ndvi)
+    ndwi = get_ndwi_download_url_html(row['lat'], row['lon'], year, catalog=s2_catalog)
+    if ndwi:
+        links.append(ndwi)
+    ndbi = get_ndbi_download_url_html(row['lat'], row['lon'], year, catalog=s2_catalog)
+    if ndbi:
+        links.append(ndbi)
+    s1vv = get_s1_vv_download_url_html(row['lat'], row['lon'], year, catalog=vv_catalog)
+    if s1vv:
+        links.append(s1vv)
+    # Add other sensors here if needed
+    return ' | '.join(links)
+
+def satellite_view_urls(lat, lon, buffer_m=1000, year=2023, catalogs=None):
+    """Thumbnail URLs of the Sentinel-2/Sentinel-1 composites around the point: (urls, S2 ID, S1 ID)."""
+    point = ee.Geometry.Point(lon, lat).buffer(buffer_m)
+    print("[INFO] Using dataset_id: COPERNICUS/S2_SR_HARMONIZED (Sentinel-2) for RGB, Infrared (NIR), NDVI, NDWI")
+    # Scene catalogues (nhamini.scenes) keep the plotted scenes identical to the enrichment
+    s2_catalog = catalog_for(catalogs, 'S2', year) if catalogs else None
+    vv_catalog = catalog_for(catalogs, 'S1_VV', year) if catalogs else None
+    
+    scene = s2_catalog.select(lat, lon) if s2_catalog is not None else None
+    if scene is not None:
+        img = s2_catalog.image(scene).clip(point)
+        s2_scene_id = scene['product_id']
+    else:
+        # Get Sentinel-2 collection and select least cloudy image
+        s2_collection = (ee.ImageCollection('COPERNICUS/S2_SR_HARMONIZED')
+               .filterBounds(point)
+               .filterDate(f'{year}-01-01', f'{year}-12-31')
+               .filter(ee.Filter.lt('CLOUDY_PIXEL_PERCENTAGE', 10))
+               .sort('CLOUDY_PIXEL_PERCENTAGE'))
+        
+        img = s2_collection.first().clip(point)
+        
+        # Get Sentinel-2 scene ID
+        try:
+            s2_id = img.get('PRODUCT_ID')
+            if s2_id is None:
+                s2_id = img.get('system:index')
+            s2_scene_id = s2_id.getInfo() if s2_id is not None else "N/A"
+        except Exception as e:
+            print(f"[WARNING] Could not get Sentinel-2 scene ID: {e}")
+            s2_scene_id = "N/A"
+    
+    # URLs for each composite
+    urls = {}
+    urls['RGB'] = img.select(['B4', 'B3', 'B2']).getThumbURL({
+        'region': point, 'dimensions': 512, 'min': 500, 'max': 2500})
+    urls['Infrared (NIR)'] = img.select(['B8', 'B4', 'B3']).getThumbURL({
+        'region': point, 'dimensions': 512, 'min': 500, 'max': 2500})
+    ndvi = img.normalizedDifference(['B8', 'B4']).rename('NDVI')
+    urls['NDVI'] = ndvi.getThumbURL({
+        'region': point, 'dimensions': 512, 'min': 0, 'max': 1,
+        'palette': ['blue', 'white', 'green']})
+    ndwi = img.normalizedDifference(['B3', 'B8']).rename('NDWI')
+    urls['NDWI'] = ndwi.getThumbURL({
+        'region': point, 'dimensions': 512, 'min': -1, 'max': 1,
+        'palette': ['brown', 'beige', 'blue']})
+    
+    print("[INFO] Using dataset_id: COPERNICUS/S1_GRD (Sentinel-1) for Sentinel-1 VV")
+    # Sentinel-1 VV
+    if vv_catalog is not None:
+        s1_scenes = vv_catalog.scenes_at(lat, lon)
+        s1_collection = vv_catalog.collection(s1_scenes).select('VV')
+    else:
+        s1_collection = ee.ImageCollection('COPERNICUS/S1_GRD') \
+            .filterBounds(point) \
+            .filterDate(f'{year}-01-01', f'{year}-12-31') \
+            .filter(ee.Filter.eq('instrumentMode', 'IW')) \
+            .filter(ee.Filter.listContains('transmitterReceiverPolarisation', 'VV')) \
+            .select('VV')
+    
+    # Check if Sentinel-1 collection has any images
+    try:
+        s1_count = len(s1_scenes) if vv_catalog is not None else s1_collection.size().getInfo()
+        if s1_count > 0:
+            s1_img = s1_collection.median().clip(point)
+            
+            # Get Sentinel-1 scene ID (using first image from collection)
+            try:
+                if vv_catalog is not None:
+                    s1_scene_id = vv_catalog.scene(s1_scenes[0])['id']
+                else:
+                    s1_first = s1_collection.first()
+                    s1_id = s1_first.get('system:index')
+                    s1_scene_id = s1_id.getInfo() if s1_id is not None else "N/A"
+            except Exception as e:
+                print(f"[WARNING] Could not get Sentinel-1 scene ID: {e}")
+                s1_scene_id = "N/A"
+            
+            urls['Sentinel-1 VV'] = s1_img.getThumbURL({
+                'region': point, 'dimensions': 512, 'min': -25, 'max': 0,
+                'palette': ['black', 'white']})
+        else:
+            print(f"[WARNING] No Sentinel-1 images found for this location and time period")
+            s1_scene_id = "No images available"
+            # Skip adding Sentinel-1 VV to urls
+    except Exception as e:
+        print(f"[WARNING] Error processing Sentinel-1 data: {e}")
+        s1_scene_id = "Error processing"
+        # Skip adding Sentinel-1 VV to urls
+    
+    return urls, s2_scene_id, s1_scene_id
+
+def fetch_thumbnails(urls, max_workers=None):
+    """Downloads the thumbnails in parallel: {name: PIL image}, in the order of urls (failed ones skipped)."""
+    import requests
+    from PIL import Image
+    from io import BytesIO
+    from concurrent.futures import ThreadPoolExecutor
+
+    def fetch(url):
+        response = requests.get(url, timeout=30)
+        response.raise_for_status()  # Raise an exception for bad status codes
+        return Image.open(BytesIO(response.content))
+
+    images = {}
+    with ThreadPoolExecutor(max_workers=max_workers or len(urls) or 1) as pool:
+        futures = {name: pool.submit(fetch, url) for name, url in urls.items()}
+    for name, future in futures.items():
+        try:
+            images[name] = future.result()
+        except Exception as e:
+            print(f"[WARNING] Could not load image for {name}: {e}")
+            # Continue with other images
+    return images
+
+def panel_layout(num_images):
+    # Calculate subplot dimensions based on number of images
+    if num_images <= 3:
+        return 1, max(num_images, 1), (4 * max(num_images, 1), 4)
+    return 2, 3, (12, 8)
+
+def save_satellite_views(images, path, dpi=100):
+    """
+    Writes the panels to path with the Agg canvas directly (no pyplot state), so
+    several matches can be rendered at once from worker threads.
+    """
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+    from matplotlib.figure import Figure
+
+    rows, cols, figsize = panel_layout(len(images))
+    fig = Figure(figsize=figsize)
+    FigureCanvasAgg(fig)
+    for idx, (name, im) in enumerate(images.items(), start=1):
+        ax = fig.add_subplot(rows, cols, idx)
+        ax.imshow(im)
+        ax.set_title(name)
+        ax.axis('off')
+    fig.tight_layout()
+    fig.savefig(path, dpi=dpi)
+    return path
+
+def plot_multiple_satellite_views(lat, lon, buffer_m=1000, year=2023, catalogs=None, path=None):
+    """
+    Plots the Sentinel-2/Sentinel-1 composites around the point. With path, the
+    figure is written there (headless Agg canvas) instead of shown.
+    """
+    urls, s2_scene_id, s1_scene_id = satellite_view_urls(lat, lon, buffer_m, year, catalogs)
+    images = fetch_thumbnails(urls)
+    if path is not None:
+        save_satellite_views(images, path)
+    else:
+        import matplotlib.pyplot as plt
+        rows, cols, figsize = panel_layout(len(images))
+        plt.figure(figsize=figsize)
+        for idx, (name, im) in enumerate(images.items(), start=1):
+            plt.subplot(rows, cols, idx)
+            plt.imshow(im)
+            plt.title(name)
+            plt.axis('off')
+        plt.tight_layout()
+        plt.show()
+    
+    # Print scene IDs for reference
+    print(f"\n[INFO] Scene IDs used:")
+    print(f"  Sentinel-2: {s2_scene_id}")
+    print(f"  Sentinel-1: {s1_scene_id}")
+
+def match_image_path(directory, name):
+    """images/<match name>.png with a file-system safe name."""
+    return os.path.join(directory, re.sub(r'[^\w.-]+', '_', str(name)).strip('_') + '.png')
+
+# Earth Engine requests of satellite_view_urls (scene IDs, counts and thumbnail URLs)
+VIEW_REQUESTS = 8
+
+class MatchImagery:
+    """
+    Thumbnail and plot pipeline for matches as they arrive (e.g. from
+    nhamini.analyze.stream_closest_matches): submit() starts a match right away
+    in a thread pool and returns its future; results() waits for all of them.
+    """
+
+    def __init__(self, directory, buffer_m=1000, year=2023, catalogs=None, max_workers=4, rate_limiter=None):
+        from concurrent.futures import ThreadPoolExecutor
+        self.directory = directory
+        self.buffer_m = buffer_m
+        self.year = year
+        self.catalogs = catalogs
+        self.rate_limiter = rate_limiter
+        self.futures = {}
+        os.makedirs(directory, exist_ok=True)
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='nhamini-imagery')
+
+    def render(self, name, lat, lon):
+        path = match_image_path(self.directory, name)
+        print(f"[INFO] Generating images for: {name} (lat: {lat}, lon: {lon})")
+        if self.rate_limiter is not None:
+            self.rate_limiter.acquire(VIEW_REQUESTS)
+        urls, s2_scene_id, s1_scene_id = satellite_view_urls(lat, lon, self.buffer_m, self.year, self.catalogs)
+        save_satellite_views(fetch_thumbnails(urls), path)
+        print(f"[INFO] Wrote {path} (Sentinel-2: {s2_scene_id}, Sentinel-1: {s1_scene_id})")
+        return path
+
+    def submit(self, match):
+        """Queues a match (ClosestMatch or dict with name/lat/lon)."""
+        m = match.model_dump() if hasattr(match, 'model_dump') else dict(match)
+        future = self._pool.submit(self.render, m['name'], m['lat'], m['lon'])
+        self.futures[m['name']] = future
+        return future
+
+    def results(self):
+        """{match name: image path or None if it failed}, once every submitted match is done."""
+        paths = {}
+        for name, future in self.futures.items():
+            try:
+                paths[name] = future.result()
+            except Exception as e:
+                print(f"[WARNING] Could not generate images for {name}: {e}")
+                paths[name] = None
+        return paths
+
+    def close(self):
+        self._pool.shutdown(wait=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
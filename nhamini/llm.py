@@ -0,0 +1,36 @@
+# nhamini/llm.py
+
+# OpenAI client shared by the stages that call o3. The client (or its
+# base_url) can be injected, e.g. to run against a local stub server.
+
+import os
+
+MODEL = "o3"
+
+def openai_api_key():
+    """OpenAI API key from Kaggle secrets, falling back to OPENAI_API_KEY."""
+    try:
+        from kaggle_secrets import UserSecretsClient
+        return UserSecretsClient().get_secret("openai")
+    except Exception:
+        return os.environ.get("OPENAI_API_KEY")
+
+def openai_client(api_key=None, base_url=None):
+    from openai import OpenAI
+    api_key = api_key or openai_api_key()
+    kwargs = {}
+    if api_key:
+        kwargs['api_key'] = api_key
+    if base_url:
+        kwargs['base_url'] = base_url
+    return OpenAI(**kwargs)
+
+def print_usage(response):
+    """Prints token usage of a response, if available."""
+    usage = getattr(response, "usage", None)
+    try:
+        print("\nPrompt tokens:", getattr(usage, "prompt_tokens", getattr(usage, "input_tokens", None)))
+        print("Completion tokens:", getattr(usage, "completion_tokens", getattr(usage, "output_tokens", None)))
+        print("Total tokens:", getattr(usage, "total_tokens", None))
+    except Exception:
+        print("\nUsage info:", usage)
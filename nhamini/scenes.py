@@ -0,0 +1,289 @@
+# nhamini/scenes.py
+
+# Local Sentinel-2 / Sentinel-1 scene catalogue for an area of interest.
+# The scene IDs, dates, cloud percentages and footprints are fetched once per
+# region/year (a single getInfo over aggregate_array results) and kept in a local
+# grid index, so choosing the scene for a point is a local lookup and the same
+# scene is used by the enrichment, the download links and the plots.
+# Earth Engine is only imported by the functions that build EE objects.
+
+import json
+import math
+import numpy as np
+
+S2_DATASET = 'COPERNICUS/S2_SR_HARMONIZED'
+S1_DATASET = 'COPERNICUS/S1_GRD'
+
+def s2_collection(year=2023, max_cloud=10):
+    import ee
+    return (ee.ImageCollection(S2_DATASET)
+            .filterDate(f'{year}-01-01', f'{year}-12-31')
+            .filter(ee.Filter.lt('CLOUDY_PIXEL_PERCENTAGE', max_cloud)))
+
+def s1_collection(year=2023, polarisation='VV'):
+    import ee
+    return (ee.ImageCollection(S1_DATASET)
+            .filterDate(f'{year}-01-01', f'{year}-12-31')
+            .filter(ee.Filter.eq('instrumentMode', 'IW'))
+            .filter(ee.Filter.listContains('transmitterReceiverPolarisation', polarisation)))
+
+# Properties fetched for each dataset (all of them are present on every scene,
+# so the aggregate_array lists stay aligned)
+CATALOG_PROPERTIES = {
+    S2_DATASET: ['system:index', 'PRODUCT_ID', 'CLOUDY_PIXEL_PERCENTAGE', 'system:time_start', 'system:footprint'],
+    S1_DATASET: ['system:index', 'system:time_start', 'system:footprint'],
+}
+
+# Radius (m) around a site used to select its scenes, per dataset: the
+# enrichment buffers (50 m optical, 1000 m radar). Every lookup on a catalogue
+# (enrichment, download links, plots) uses the catalogue's radius, so they all
+# pick the same scenes for the same site.
+SELECTION_BUFFER_M = {S2_DATASET: 50, S1_DATASET: 1000}
+
+def _buffer_degrees(lat, buffer_m):
+    dlat = buffer_m / 111320
+    dlon = buffer_m / (40075000 * math.cos(math.radians(lat)) / 360)
+    return dlat, dlon
+
+def _ring_coordinates(footprint):
+    """Returns the outer ring of a GeoJSON footprint as a closed (n, 2) lon/lat array."""
+    coords = footprint['coordinates']
+    if footprint['type'] == 'Polygon':
+        coords = coords[0]
+    elif footprint['type'] == 'MultiPolygon':
+        coords = max((poly[0] for poly in coords), key=len)
+    ring = np.asarray(coords, dtype=np.float64)
+    if len(ring) and not np.array_equal(ring[0], ring[-1]):
+        ring = np.vstack([ring, ring[:1]])
+    return ring
+
+def _point_in_ring(ring, lon, lat):
+    x0, y0 = ring[:-1, 0], ring[:-1, 1]
+    x1, y1 = ring[1:, 0], ring[1:, 1]
+    crosses = (y0 > lat) != (y1 > lat)
+    if not crosses.any():
+        return False
+    x0, y0, x1, y1 = x0[crosses], y0[crosses], x1[crosses], y1[crosses]
+    x_at = x0 + (lat - y0) * (x1 - x0) / (y1 - y0)
+    return np.count_nonzero(lon < x_at) % 2 == 1
+
+def _ring_intersects_box(ring, box):
+    """
+    Whether a closed ring and a lon/lat box (x0, y0, x1, y1) intersect: the box
+    centre lies inside the ring (box inside the footprint), or a ring edge
+    touches the box (vertex inside it or edge crossing it).
+    """
+    bx0, by0, bx1, by1 = box
+    if _point_in_ring(ring, (bx0 + bx1) / 2, (by0 + by1) / 2):
+        return True
+    x0, y0 = ring[:-1, 0], ring[:-1, 1]
+    x1, y1 = ring[1:, 0], ring[1:, 1]
+    # Edge bounding box overlaps the box ...
+    near = ((np.minimum(x0, x1) <= bx1) & (np.maximum(x0, x1) >= bx0) &
+            (np.minimum(y0, y1) <= by1) & (np.maximum(y0, y1) >= by0))
+    if not near.any():
+        return False
+    x0, y0, x1, y1 = x0[near], y0[near], x1[near], y1[near]
+    # ... and the box corners are not all strictly on one side of the edge's line
+    corners = np.array([[bx0, by0], [bx1, by0], [bx1, by1], [bx0, by1]])
+    side = ((x1 - x0)[:, None] * (corners[:, 1] - y0[:, None]) -
+            (y1 - y0)[:, None] * (corners[:, 0] - x0[:, None]))
+    return bool((~((side > 0).all(axis=1) | (side < 0).all(axis=1))).any())
+
+class SceneCatalog:
+    """
+    Scenes of one dataset/year with their footprints in a local grid index.
+
+    Selection order matches the Earth Engine scripts: least cloudy first
+    (Sentinel-2, as in .sort('CLOUDY_PIXEL_PERCENTAGE')), otherwise the
+    collection order (Sentinel-1, as in .first()). Lookups use the catalogue's
+    selection radius (select_buffer_m, SELECTION_BUFFER_M by default) unless
+    buffer_m is given.
+    """
+
+    def __init__(self, dataset, year, ids, times, footprints, cloud=None, product_ids=None, cell_deg=0.5,
+                 select_buffer_m=None):
+        self.dataset = dataset
+        self.year = year
+        self.select_buffer_m = (SELECTION_BUFFER_M.get(dataset, 0) if select_buffer_m is None
+                                else select_buffer_m)
+        self.ids = np.asarray(ids, dtype=object)
+        self.product_ids = np.asarray(product_ids if product_ids is not None else ids, dtype=object)
+        self.times = np.asarray(times, dtype=np.int64)
+        self.cloud = (np.asarray(cloud, dtype=np.float32) if cloud is not None
+                      else np.zeros(len(self.ids), dtype=np.float32))
+        self.footprints = [_ring_coordinates(fp) for fp in footprints]
+        self.bounds = np.array(
+            [[r[:, 0].min(), r[:, 1].min(), r[:, 0].max(), r[:, 1].max()] for r in self.footprints],
+            dtype=np.float64).reshape(-1, 4)
+        self.rank = np.empty(len(self.ids), dtype=np.int64)
+        self.rank[np.argsort(self.cloud, kind='stable')] = np.arange(len(self.ids))
+        self.cell_deg = cell_deg
+        self._build_index()
+
+    def __len__(self):
+        return len(self.ids)
+
+    def _build_index(self):
+        cells = {}
+        lo = np.floor(self.bounds[:, :2] / self.cell_deg).astype(np.int64)
+        hi = np.floor(self.bounds[:, 2:] / self.cell_deg).astype(np.int64)
+        for i in range(len(self.ids)):
+            for cx in range(lo[i, 0], hi[i, 0] + 1):
+                for cy in range(lo[i, 1], hi[i, 1] + 1):
+                    cells.setdefault((cx, cy), []).append(i)
+        self._cells = {key: np.asarray(idx, dtype=np.int64) for key, idx in cells.items()}
+
+    def _bbox_hits(self, lat, lon, buffer_m):
+        """Scenes whose bounding box touches the query box, in selection order."""
+        if buffer_m is None:
+            buffer_m = self.select_buffer_m
+        dlat, dlon = _buffer_degrees(lat, buffer_m)
+        cx0, cx1 = int(math.floor((lon - dlon) / self.cell_deg)), int(math.floor((lon + dlon) / self.cell_deg))
+        cy0, cy1 = int(math.floor((lat - dlat) / self.cell_deg)), int(math.floor((lat + dlat) / self.cell_deg))
+        keys = [(cx, cy) for cx in range(cx0, cx1 + 1) for cy in range(cy0, cy1 + 1) if (cx, cy) in self._cells]
+        if not keys:
+            return np.empty(0, dtype=np.int64), []
+        idx = self._cells[keys[0]] if len(keys) == 1 else np.unique(np.concatenate([self._cells[k] for k in keys]))
+        b = self.bounds[idx]
+        hit = ((b[:, 0] <= lon + dlon) & (b[:, 2] >= lon - dlon) &
+               (b[:, 1] <= lat + dlat) & (b[:, 3] >= lat - dlat))
+        idx = idx[hit]
+        # Exact footprint test: the point, or for buffered queries the whole box
+        query = (lon - dlon, lat - dlat, lon + dlon, lat + dlat) if buffer_m else (lon, lat)
+        return idx[np.argsort(self.rank[idx])], query
+
+    def _covers(self, i, query):
+        if len(query) == 4:
+            return _ring_intersects_box(self.footprints[i], query)
+        return _point_in_ring(self.footprints[i], *query)
+
+    def scenes_at(self, lat, lon, buffer_m=None):
+        """
+        Indices of the scenes touching the bounding box of the selection buffer
+        (the point itself with buffer_m=0), in selection order.
+        """
+        idx, query = self._bbox_hits(lat, lon, buffer_m)
+        return np.array([i for i in idx if self._covers(i, query)], dtype=np.int64)
+
+    def scene(self, i):
+        return {
+            'index': int(i),
+            'id': self.ids[i],
+            'product_id': self.product_ids[i],
+            'cloud': float(self.cloud[i]),
+            'time_start': int(self.times[i]),
+        }
+
+    def select(self, lat, lon, buffer_m=None):
+        """Returns the scene the Earth Engine scripts would pick for this point, or None."""
+        idx, query = self._bbox_hits(lat, lon, buffer_m)
+        for i in idx:
+            if self._covers(i, query):
+                return self.scene(i)
+        return None
+
+    def image(self, scene):
+        import ee
+        return ee.Image(f"{self.dataset}/{scene['id']}")
+
+    def collection(self, indices):
+        import ee
+        return ee.ImageCollection([ee.Image(f"{self.dataset}/{self.ids[i]}") for i in indices])
+
+    def to_dict(self):
+        return {
+            'dataset': self.dataset,
+            'year': self.year,
+            'ids': self.ids.tolist(),
+            'product_ids': self.product_ids.tolist(),
+            'times': self.times.tolist(),
+            'cloud': self.cloud.tolist(),
+            'footprints': [{'type': 'Polygon', 'coordinates': [ring.tolist()]} for ring in self.footprints],
+            'cell_deg': self.cell_deg,
+            'select_buffer_m': self.select_buffer_m,
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(data['dataset'], data['year'], data['ids'], data['times'], data['footprints'],
+                   cloud=data['cloud'], product_ids=data['product_ids'], cell_deg=data['cell_deg'],
+                   select_buffer_m=data.get('select_buffer_m'))
+
+def aoi_for_points(lats, lons, buffer_m=1000):
+    """Area of interest covering all points, buffered by buffer_m."""
+    import ee
+    coords = [[float(lon), float(lat)] for lat, lon in zip(lats, lons)]
+    return ee.Geometry.MultiPoint(coords).buffer(buffer_m)
+
+def scene_catalog_request(aoi, collections):
+    """
+    Server-side request for the catalogues of {name: (dataset, year, ee.ImageCollection)}
+    over the area of interest; it can be combined with other requests in one getInfo.
+    """
+    import ee
+    request = {}
+    for name, (dataset, year, collection) in collections.items():
+        collection = collection.filterBounds(aoi)
+        request[name] = ee.Dictionary({
+            prop: collection.aggregate_array(prop) for prop in CATALOG_PROPERTIES[dataset]
+        })
+    return ee.Dictionary(request)
+
+def parse_scene_catalogs(info, collections):
+    """Builds {name: SceneCatalog} from the getInfo result of scene_catalog_request."""
+    catalogs = {}
+    for name, (dataset, year, _) in collections.items():
+        props = info[name]
+        lengths = {len(values) for values in props.values()}
+        if len(lengths) > 1:
+            raise ValueError(f"Scene catalogue '{name}' has misaligned properties: {lengths}")
+        catalogs[name] = SceneCatalog(
+            dataset, year,
+            ids=props['system:index'],
+            times=props['system:time_start'],
+            footprints=props['system:footprint'],
+            cloud=props.get('CLOUDY_PIXEL_PERCENTAGE'),
+            product_ids=props.get('PRODUCT_ID'),
+        )
+    return catalogs
+
+def fetch_scene_catalogs(aoi, collections):
+    """
+    Fetches {name: SceneCatalog} for {name: (dataset, year, ee.ImageCollection)}
+    over the area of interest in a single Earth Engine round trip.
+    """
+    info = scene_catalog_request(aoi, collections).getInfo()
+    return parse_scene_catalogs(info, collections)
+
+def sensor_catalog_collections(s2_year=2023, s1_year=2023):
+    """The Sentinel-2 and Sentinel-1 (VV/VH) collections used by the enrichment."""
+    return {
+        'S2': (S2_DATASET, s2_year, s2_collection(s2_year)),
+        'S1_VV': (S1_DATASET, s1_year, s1_collection(s1_year, 'VV')),
+        'S1_VH': (S1_DATASET, s1_year, s1_collection(s1_year, 'VH')),
+    }
+
+def build_scene_catalogs(df, s2_year=2023, s1_year=2023, buffer_m=1000):
+    """Sentinel-2 and Sentinel-1 (VV/VH) catalogues around the points of df."""
+    aoi = aoi_for_points(df['lat'], df['lon'], buffer_m)
+    catalogs = fetch_scene_catalogs(aoi, sensor_catalog_collections(s2_year, s1_year))
+    for name, catalog in catalogs.items():
+        print(f"[INFO] Scene catalogue {name}: {len(catalog)} scenes ({catalog.dataset}, {catalog.year})")
+    return catalogs
+
+def catalog_for(catalogs, name, year):
+    """Returns the named catalogue if it was built for this year, else None."""
+    catalog = (catalogs or {}).get(name)
+    if catalog is not None and str(catalog.year) == str(year):
+        return catalog
+    return None
+
+def save_scene_catalogs(catalogs, path):
+    """Writes {name: SceneCatalog} as JSON, so later stages reuse the same scenes."""
+    with open(path, 'w') as f:
+        json.dump({name: catalog.to_dict() for name, catalog in catalogs.items()}, f)
+
+def load_scene_catalogs(path):
+    with open(path) as f:
+        return {name: SceneCatalog.from_dict(data) for name, data in json.load(f).items()}
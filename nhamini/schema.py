@@ -0,0 +1,164 @@
+# nhamini/schema.py
+
+# Typed result frames and their provenance. Only NumPy and pandas are needed
+# here (pyarrow for Parquet), so stages that read and score results never
+# import Earth Engine.
+
+import numpy as np
+import pandas as pd
+
+# --- Result schema ---
+# Sensor values are stored as nullable float32 (values + validity mask), the
+# MapBiomas class as a categorical and the scene IDs dictionary-encoded.
+# These map one-to-one onto Arrow types, so a result frame goes to and from
+# Arrow/Parquet without re-encoding its value buffers.
+
+SENSOR_COLUMNS = [
+    'NDVI', 'NDWI', 'NDBI', 'Elevation', 'Slope',
+    'Sentinel1_VV', 'Sentinel1_VH', 'CanopyHeight'
+]
+CLASS_COLUMNS = ['MapBiomas_Class']
+SCENE_ID_COLUMNS = ['Sentinel2_ID', 'Sentinel1_ID']
+RESULT_COLUMNS = ['NDVI', 'Sentinel2_ID', 'NDWI', 'NDBI', 'Elevation', 'Slope', 'Sentinel1_VV',
+                  'Sentinel1_ID', 'Sentinel1_VH', 'MapBiomas_Class', 'CanopyHeight']
+
+def to_sensor_array(values):
+    """Converts sensor values (None/NaN/inf allowed) to a nullable float32 array."""
+    if isinstance(values, pd.Series):
+        values = values.to_numpy(dtype=np.float64, na_value=np.nan)
+    else:
+        values = np.array([np.nan if v is None else v for v in values], dtype=np.float64)
+    valid = np.isfinite(values)
+    data = np.where(valid, values, 0).astype(np.float32)
+    return pd.arrays.FloatingArray(data, ~valid)
+
+def to_class_array(values):
+    """Converts land cover class codes to a categorical with integer categories."""
+    if isinstance(values, pd.Series) and isinstance(values.dtype, pd.CategoricalDtype):
+        return values.array
+    codes = to_sensor_array(values)
+    return pd.array(codes, dtype='Int16').astype('category')
+
+def to_scene_id_array(values):
+    """Dictionary-encodes scene IDs (one string per distinct scene)."""
+    return pd.Categorical([v if isinstance(v, str) else None for v in values])
+
+def apply_result_schema(df):
+    """
+    Casts the sensor, class and scene ID columns present in df to the result
+    schema; columns that already have their schema dtype are left as they are.
+    """
+    for col in SENSOR_COLUMNS:
+        if col in df.columns and df[col].dtype != pd.Float32Dtype():
+            df[col] = to_sensor_array(df[col])
+    for col in CLASS_COLUMNS:
+        if col in df.columns:
+            df[col] = to_class_array(df[col])
+    for col in SCENE_ID_COLUMNS:
+        if col in df.columns and not isinstance(df[col].dtype, pd.CategoricalDtype):
+            df[col] = to_scene_id_array(df[col])
+    return df
+
+def results_to_arrow(df):
+    """
+    Returns the result frame as a pyarrow Table (float32 + validity, dictionary
+    columns); the provenance in df.attrs is kept in the schema metadata.
+    """
+    import pyarrow as pa
+    # Cast a shallow copy, so the caller's frame keeps its dtypes
+    typed = apply_result_schema(df.copy(deep=False))
+    typed.attrs = {}
+    table = pa.Table.from_pandas(typed, preserve_index=False)
+    if 'provenance' in df.attrs:
+        metadata = dict(table.schema.metadata or {})
+        metadata[b'provenance'] = provenance_to_json(df.attrs['provenance'])
+        table = table.replace_schema_metadata(metadata)
+    return table
+
+def results_from_arrow(table):
+    """Rebuilds a result frame from a pyarrow Table written by results_to_arrow."""
+    import pyarrow as pa
+    # float32 + validity maps straight onto Float32 (no float64/NaN round trip)
+    df = apply_result_schema(table.to_pandas(types_mapper={pa.float32(): pd.Float32Dtype()}.get))
+    metadata = table.schema.metadata or {}
+    if b'provenance' in metadata:
+        provenance = provenance_from_json(metadata[b'provenance'])
+        # Files written before the enriched coordinates became columns
+        rows = provenance.pop('rows', None)
+        if rows and not set(ENRICHED_COORDINATE_COLUMNS) & set(df.columns):
+            recorded = pd.DataFrame({'lat': rows['lat'], 'lon': rows['lon']}, index=rows['index'])
+            recorded = recorded[~recorded.index.duplicated(keep='last')].reindex(df.index)
+            df['_enriched_lat'] = recorded['lat'].to_numpy(dtype=float)
+            df['_enriched_lon'] = recorded['lon'].to_numpy(dtype=float)
+        df.attrs['provenance'] = provenance
+    return df
+
+def write_results_parquet(df, path):
+    import pyarrow.parquet as pq
+    pq.write_table(results_to_arrow(df), path)
+
+def read_results_parquet(path):
+    import pyarrow.parquet as pq
+    return results_from_arrow(pq.read_table(path))
+
+# --- Provenance ---
+# Every result column records the enrichment parameters it depends on in
+# df.attrs['provenance'] (a small dict, also kept in the Parquet metadata).
+# The coordinates each row was enriched at are ordinary columns
+# (ENRICHED_COORDINATE_COLUMNS), so they follow the rows through slicing,
+# concatenation and chunked reads. reenrich_with_all_sensors uses both to
+# recompute only what changed.
+
+ENRICHED_COORDINATE_COLUMNS = ['_enriched_lat', '_enriched_lon']
+
+COLUMN_PARAMETERS = {
+    'NDVI': ('ndvi_year', 'buffer_m'),
+    'Sentinel2_ID': ('ndvi_year', 'buffer_m'),
+    'NDWI': ('ndwi_year', 'buffer_m'),
+    'NDBI': ('ndbi_year', 'buffer_m'),
+    'Elevation': ('buffer_m',),
+    'Slope': ('buffer_m',),
+    'Sentinel1_VV': ('s1_year',),
+    'Sentinel1_ID': ('s1_year',),
+    'Sentinel1_VH': ('s1_year',),
+    'MapBiomas_Class': ('mapbiomas_year',),
+    'CanopyHeight': (),
+}
+
+def column_parameters(col, params):
+    return {name: params[name] for name in COLUMN_PARAMETERS[col]}
+
+def record_provenance(df, columns, params, rows=None, failed=None):
+    """
+    Stores the parameters of the given columns in df.attrs['provenance'] and
+    the current coordinates of the given rows (index labels; all rows if None)
+    in the enriched coordinate columns. Rows whose enrichment failed (index
+    labels) get NaN coordinates, so the next re-enrichment retries them.
+    """
+    provenance = dict(df.attrs.get('provenance') or {})
+    provenance['columns'] = dict(provenance.get('columns') or {})
+    for col in columns:
+        provenance['columns'][col] = column_parameters(col, params)
+    recorded = enriched_coordinates(df)
+    current = df['lat'].astype(float).to_numpy(), df['lon'].astype(float).to_numpy()
+    update = np.ones(len(df), dtype=bool) if rows is None else df.index.isin(rows)
+    lost = np.zeros(len(df), dtype=bool) if failed is None else df.index.isin(failed)
+    for col, coords, values in zip(ENRICHED_COORDINATE_COLUMNS, ('lat', 'lon'), current):
+        df[col] = np.where(lost, np.nan, np.where(update, values, recorded[coords].to_numpy()))
+    df.attrs['provenance'] = provenance
+    return df
+
+def enriched_coordinates(df):
+    """Recorded lat/lon per row (NaN for rows that were never enriched)."""
+    if not set(ENRICHED_COORDINATE_COLUMNS) <= set(df.columns):
+        return pd.DataFrame({'lat': np.nan, 'lon': np.nan}, index=df.index)
+    return pd.DataFrame({'lat': df['_enriched_lat'].astype(float), 'lon': df['_enriched_lon'].astype(float)},
+                        index=df.index)
+
+def provenance_to_json(provenance):
+    import json
+    return json.dumps({'columns': provenance.get('columns', {})})
+
+def provenance_from_json(text):
+    import json
+    return json.loads(text)
@@ -0,0 +1,784 @@
+# nhamini/sensors.py
+
+# Earth Engine sensor enrichment of point sets: per-point helpers, tiled
+# composites shared by nearby points, buffer-radius sweeps and incremental
+# re-enrichment.
+# Call nhamini.auth.initialize() before using these functions; Earth Engine is
+# imported by the functions that build requests, so the frame bookkeeping
+# (tiles, provenance, result columns) works without it.
+
+import math
+import numpy as np
+import pandas as pd
+import time
+
+from .scenes import catalog_for, parse_scene_catalogs, scene_catalog_request, sensor_catalog_collections
+from .schema import (
+    CLASS_COLUMNS, RESULT_COLUMNS, SCENE_ID_COLUMNS, column_parameters, enriched_coordinates,
+    record_provenance, to_class_array, to_scene_id_array, to_sensor_array,
+)
+
+DATASET_IDS = [
+    'COPERNICUS/S2_SR_HARMONIZED',
+    'COPERNICUS/S1_GRD',
+    'USGS/SRTMGL1_003',
+    'projects/mapbiomas-raisg/public/collection3/mapbiomas_raisg_panamazonia_collection3_integration_v2',
+    'LARSE/GEDI/GEDI02_A_002_MONTHLY',
+    'NASA/JPL/global_forest_canopy_height_2005'
+]
+
+# --- Earth Engine functions ---
+
+def get_ndvi(lat, lon, year=2023, buffer_m=50, catalog=None):
+    import ee
+    point = ee.Geometry.Point([lon, lat]).buffer(buffer_m)
+    if catalog is not None:
+        # Least cloudy scene from the local scene catalogue (nhamini.scenes), at
+        # the catalogue's selection radius like the download links and plots
+        scene = catalog.select(lat, lon)
+        if scene is None:
+            return {'ndvi': None, 'sentinel2_id': None}
+        img = catalog.image(scene)
+        ndvi = img.normalizedDifference(['B8', 'B4']).rename('NDVI').reduceRegion(
+            reducer=ee.Reducer.mean(), geometry=point, scale=10).get('NDVI')
+        return {'ndvi': ndvi.getInfo(), 'sentinel2_id': scene['product_id']}
+    s2 = (ee.ImageCollection('COPERNICUS/S2_SR_HARMONIZED')
+          .filterBounds(point)
+          .filterDate(f'{year}-01-01', f'{year}-12-31')
+          .filter(ee.Filter.lt('CLOUDY_PIXEL_PERCENTAGE', 10)))
+    # Get the least cloudy image
+    s2_sorted = s2.sort('CLOUDY_PIXEL_PERCENTAGE')
+    img = ee.Image(s2_sorted.first())
+    ndvi_img = img.normalizedDifference(['B8', 'B4']).rename('NDVI')
+    ndvi = ndvi_img.select('NDVI').reduceRegion(
+        reducer=ee.Reducer.mean(), geometry=point, scale=10).get('NDVI')
+    # Get the image ID
+    img_id = img.get('PRODUCT_ID')
+    if img_id is None:
+        img_id = img.get('system:index')
+    return {
+        'ndvi': ndvi.getInfo() if ndvi is not None else None,
+        'sentinel2_id': img_id.getInfo() if img_id is not None else None
+    }
+
+def get_ndwi(lat, lon, year=2023, buffer_m=50):
+    import ee
+    point = ee.Geometry.Point([lon, lat]).buffer(buffer_m)
+    s2 = (ee.ImageCollection('COPERNICUS/S2_SR_HARMONIZED')
+          .filterBounds(point)
+          .filterDate(f'{year}-01-01', f'{year}-12-31')
+          .filter(ee.Filter.lt('CLOUDY_PIXEL_PERCENTAGE', 10))
+          .map(lambda img: img.normalizedDifference(['B3', 'B8']).rename('NDWI')))
+    ndwi = s2.median().select('NDWI').reduceRegion(
+        reducer=ee.Reducer.mean(), geometry=point, scale=10).get('NDWI')
+    return ndwi.getInfo() if ndwi is not None else None
+
+def get_ndbi(lat, lon, year=2023, buffer_m=50):
+    import ee
+    point = ee.Geometry.Point([lon, lat]).buffer(buffer_m)
+    s2 = (ee.ImageCollection('COPERNICUS/S2_SR_HARMONIZED')
+          .filterBounds(point)
+          .filterDate(f'{year}-01-01', f'{year}-12-31')
+          .filter(ee.Filter.lt('CLOUDY_PIXEL_PERCENTAGE', 10))
+          .map(lambda img: img.normalizedDifference(['B11', 'B8']).rename('NDBI')))
+    ndbi = s2.median().select('NDBI').reduceRegion(
+        reducer=ee.Reducer.mean(), geometry=point, scale=10).get('NDBI')
+    return ndbi.getInfo() if ndbi is not None else None
+
+def get_srtm_elevation(lat, lon, buffer_m=50):
+    import ee
+    point = ee.Geometry.Point([lon, lat]).buffer(buffer_m)
+    srtm = ee.Image("USGS/SRTMGL1_003")
+    elev = srtm.reduceRegion(
+        reducer=ee.Reducer.mean(), geometry=point, scale=30).get('elevation')
+    return elev.getInfo() if elev is not None else None
+
+def get_srtm_slope(lat, lon, buffer_m=50):
+    import ee
+    point = ee.Geometry.Point([lon, lat]).buffer(buffer_m)
+    elev = ee.Image("USGS/SRTMGL1_003")
+    slope = ee.Terrain.slope(elev)
+    slope_val = slope.reduceRegion(
+        reducer=ee.Reducer.mean(), geometry=point, scale=30).get('slope')
+    return slope_val.getInfo() if slope_val is not None else None
+
+def get_sentinel1_vv(lat, lon, year=2023, buffer_m=1000, catalog=None, raise_errors=False):
+    """
+    Returns the average VV backscatter of Sentinel-1.
+    
+    buffer_m = 1000 by default (>> 50 m from other sensors)
+    ──────────────────────────────────────────────────────────
+    Using a larger buffer reduces the speckle noise characteristic
+    of radar images when spatially averaging. 
+
+    With a scene catalogue (nhamini.scenes) the scene count and ID are
+    looked up locally instead of being requested from Earth Engine.
+    Errors return None unless raise_errors (enrich_points records the failure).
+    """
+    import ee
+    try:
+        point = ee.Geometry.Point(lon, lat)
+        if catalog is not None:
+            scenes = catalog.scenes_at(lat, lon)
+            if len(scenes) == 0:
+                return {'vv': None, 'sentinel1_id': None}
+            s1 = catalog.collection(scenes).select('VV')
+            vv_value = s1.median().reduceRegion(ee.Reducer.mean(), point, 30).get('VV')
+            return {'vv': vv_value.getInfo(), 'sentinel1_id': catalog.scene(scenes[0])['id']}
+        roi = point.buffer(buffer_m).bounds()
+        s1 = ee.ImageCollection('COPERNICUS/S1_GRD') \
+            .filterBounds(roi) \
+            .filterDate(f'{year}-01-01', f'{year}-12-31') \
+            .filter(ee.Filter.eq('instrumentMode', 'IW')) \
+            .filter(ee.Filter.listContains('transmitterReceiverPolarisation', 'VV')) \
+            .select('VV')
+        count = s1.size().getInfo()
+        if count == 0:
+            return {'vv': None, 'sentinel1_id': None}
+        s1_img = s1.median()
+        vv_value = s1_img.reduceRegion(ee.Reducer.mean(), point, 30).get('VV')
+        # Get scene ID from first image
+        first_img = ee.Image(s1.first())
+        img_id = first_img.get('system:index')
+        return {
+            'vv': vv_value.getInfo() if vv_value is not None else None,
+            'sentinel1_id': img_id.getInfo() if img_id is not None else None
+        }
+    except Exception as e:
+        if raise_errors:
+            raise
+        print(f"Sentinel-1 VV error at ({lat}, {lon}): {e}")
+        return {'vv': None, 'sentinel1_id': None}
+
+def get_sentinel1_vh(lat, lon, year=2023, buffer_m=1000, catalog=None, raise_errors=False):
+    """
+    Returns the average VH backscatter from Sentinel-1.
+    
+    The 1000m buffer helps to smooth out radar speckle.
+    Errors return None unless raise_errors.
+    """
+    import ee
+    try:
+        point = ee.Geometry.Point(lon, lat)
+        if catalog is not None:
+            scenes = catalog.scenes_at(lat, lon)
+            if len(scenes) == 0:
+                return None
+            s1 = catalog.collection(scenes).select('VH')
+            return s1.median().reduceRegion(ee.Reducer.mean(), point, 30).get('VH').getInfo()
+        roi = point.buffer(buffer_m).bounds()
+        s1 = ee.ImageCollection('COPERNICUS/S1_GRD') \
+            .filterBounds(roi) \
+            .filterDate(f'{year}-01-01', f'{year}-12-31') \
+            .filter(ee.Filter.eq('instrumentMode', 'IW')) \
+            .filter(ee.Filter.listContains('transmitterReceiverPolarisation', 'VH')) \
+            .select('VH')
+        count = s1.size().getInfo()
+        if count == 0:
+            return None
+        s1_img = s1.median()
+        vh_value = s1_img.reduceRegion(ee.Reducer.mean(), point, 30).get('VH')
+        return vh_value.getInfo() if vh_value is not None else None
+    except Exception as e:
+        if raise_errors:
+            raise
+        print(f"Sentinel-1 VH error at ({lat}, {lon}): {e}")
+        return None
+
+def get_mapbiomas_class(lat, lon, year=2020, raise_errors=False):
+    import ee
+    try:
+        point = ee.Geometry.Point(lon, lat)
+        img = ee.Image('projects/mapbiomas-raisg/public/collection3/mapbiomas_raisg_panamazonia_collection3_integration_v2') \
+            .select(f'classification_{year}')
+        value = img.reduceRegion(ee.Reducer.mode(), point, 30).get(f'classification_{year}')
+        return value.getInfo() if value is not None else None
+    except Exception as e:
+        if raise_errors:
+            raise
+        print(f"MapBiomas error at ({lat}, {lon}): {e}")
+        return None
+
+
+def get_gedi_canopy_height(lat, lon, raise_errors=False):
+    """
+    Returns mean GEDI canopy height (rh98) for a point.
+    If GEDI is not available, fallback to NASA/JPL/global_forest_canopy_height_2005.
+    Errors of the fallback return None unless raise_errors.
+    """
+    import ee
+    try:
+        point = ee.Geometry.Point([lon, lat])
+        gedi = (ee.ImageCollection('LARSE/GEDI/GEDI02_A_002_MONTHLY')
+                .filterBounds(point))
+        if gedi.size().getInfo() == 0:
+            raise ValueError("No GEDI pulses")
+        gedi_img = gedi.select('rh98').median()
+        value = gedi_img.reduceRegion(
+            ee.Reducer.mean(), point, 25).get('rh98')
+        val = value.getInfo() if value is not None else None
+        if val is not None and val != 0:
+            return val
+        # If value is None or 0, fallback
+        raise ValueError("GEDI returned None or 0")
+    except Exception as e:
+        print(f"GEDI error at ({lat}, {lon}): {e}. Trying NASA/JPL/global_forest_canopy_height_2005...")
+        try:
+            # NASA/JPL/global_forest_canopy_height_2005: altura média do dossel em metros (2005)
+            point = ee.Geometry.Point([lon, lat])
+            canopy_img = ee.Image('NASA/JPL/global_forest_canopy_height_2005')
+            value = canopy_img.reduceRegion(
+                ee.Reducer.mean(), point, 1000).get('1')
+            val = value.getInfo() if value is not None else None
+            return val
+        except Exception as e2:
+            if raise_errors:
+                raise
+            print(f"Fallback canopy height error at ({lat}, {lon}): {e2}")
+            return None
+
+# --- Tiled enrichment ---
+# Spatially clustered points share one composite per sensor: points are grouped
+# into tiles (a lat/lon grid or a geohash prefix), each composite is built once
+# per tile, clipped to the tile, and all the tile's points are reduced against
+# it with reduceRegions in a single request per tile.
+
+GEOHASH_BASE32 = '0123456789bcdefghjkmnpqrstuvwxyz'
+
+def geohash(lat, lon, precision=5):
+    lat_range, lon_range = [-90.0, 90.0], [-180.0, 180.0]
+    chars, bits, ch, even = [], 0, 0, True
+    while len(chars) < precision:
+        rng, value = (lon_range, lon) if even else (lat_range, lat)
+        mid = (rng[0] + rng[1]) / 2
+        if value >= mid:
+            ch = ch * 2 + 1
+            rng[0] = mid
+        else:
+            ch = ch * 2
+            rng[1] = mid
+        even = not even
+        bits += 1
+        if bits == 5:
+            chars.append(GEOHASH_BASE32[ch])
+            bits, ch = 0, 0
+    return ''.join(chars)
+
+def assign_tiles(df, tile_deg=0.05, geohash_precision=None):
+    """Tile key for every row: a geohash prefix, or the cell of a tile_deg lat/lon grid."""
+    if geohash_precision:
+        keys = [geohash(lat, lon, geohash_precision) for lat, lon in zip(df['lat'], df['lon'])]
+    else:
+        ix = np.floor(df['lon'].to_numpy(dtype=float) / tile_deg).astype(np.int64)
+        iy = np.floor(df['lat'].to_numpy(dtype=float) / tile_deg).astype(np.int64)
+        keys = [f'{x}_{y}' for x, y in zip(ix, iy)]
+    return pd.Series(keys, index=df.index)
+
+def tile_geometry(lats, lons, margin_m=1000):
+    """Bounding rectangle of a tile's points, expanded by margin_m."""
+    import ee
+    lats, lons = np.asarray(lats, dtype=float), np.asarray(lons, dtype=float)
+    dlat = margin_m / 111320
+    dlon = margin_m / (40075000 * math.cos(math.radians(np.abs(lats).max())) / 360)
+    return ee.Geometry.Rectangle([
+        lons.min() - dlon, lats.min() - dlat, lons.max() + dlon, lats.max() + dlat])
+
+def point_features(lats, lons, buffer_m=0):
+    """One feature per point (optionally buffered), tagged with its row in the tile."""
+    import ee
+    features = []
+    for i, (lat, lon) in enumerate(zip(lats, lons)):
+        geom = ee.Geometry.Point([float(lon), float(lat)])
+        features.append(ee.Feature(geom.buffer(buffer_m) if buffer_m else geom, {'row': i}))
+    return ee.FeatureCollection(features)
+
+def reduce_points(image, features, reducer, scale, bands):
+    # Single-band reductions are named after the reducer output unless renamed
+    if len(bands) == 1:
+        reducer = reducer.setOutputs(bands)
+    return (image.reduceRegions(collection=features, reducer=reducer, scale=scale)
+            .select(['.*'], None, False))
+
+def tile_composites(tile, ndvi_year=2023, ndwi_year=2023, ndbi_year=2023, s1_year=2023, mapbiomas_year=2020):
+    """Every sensor composite of one tile, clipped to it: {group: image}."""
+    import ee
+    def s2(year):
+        return (ee.ImageCollection('COPERNICUS/S2_SR_HARMONIZED')
+                .filterBounds(tile)
+                .filterDate(f'{year}-01-01', f'{year}-12-31')
+                .filter(ee.Filter.lt('CLOUDY_PIXEL_PERCENTAGE', 10)))
+
+    def s1(polarisation):
+        return (ee.ImageCollection('COPERNICUS/S1_GRD')
+                .filterBounds(tile)
+                .filterDate(f'{s1_year}-01-01', f'{s1_year}-12-31')
+                .filter(ee.Filter.eq('instrumentMode', 'IW'))
+                .filter(ee.Filter.listContains('transmitterReceiverPolarisation', polarisation))
+                .select(polarisation))
+
+    # Least cloudy scene on top at every pixel, as the per-point get_ndvi selection
+    ndvi = (s2(ndvi_year).sort('CLOUDY_PIXEL_PERCENTAGE', False).mosaic()
+            .normalizedDifference(['B8', 'B4']).rename('NDVI'))
+    ndwi = s2(ndwi_year).map(lambda img: img.normalizedDifference(['B3', 'B8']).rename('NDWI')).median()
+    ndbi = s2(ndbi_year).map(lambda img: img.normalizedDifference(['B11', 'B8']).rename('NDBI')).median()
+    srtm = ee.Image("USGS/SRTMGL1_003")
+    return {
+        'optical': ee.Image.cat([ndvi, ndwi, ndbi]).clip(tile),
+        'terrain': ee.Image.cat([srtm.select('elevation'), ee.Terrain.slope(srtm)]).clip(tile),
+        'radar': ee.Image.cat([s1('VV').median(), s1('VH').median()]).clip(tile),
+        'landcover': ee.Image('projects/mapbiomas-raisg/public/collection3/mapbiomas_raisg_panamazonia_collection3_integration_v2')
+            .select(f'classification_{mapbiomas_year}').clip(tile),
+        'gedi': (ee.ImageCollection('LARSE/GEDI/GEDI02_A_002_MONTHLY')
+                 .filterBounds(tile).select('rh98').median().clip(tile)),
+        'canopy_2005': ee.Image('NASA/JPL/global_forest_canopy_height_2005').select('1'),
+    }
+
+# Reducer, scale (m) and bands of each tile composite
+TILE_REDUCTIONS = {
+    'optical': ('mean', 10, ['NDVI', 'NDWI', 'NDBI']),
+    'terrain': ('mean', 30, ['elevation', 'slope']),
+    'radar': ('mean', 30, ['VV', 'VH']),
+    'landcover': ('mode', 30, None),  # classification_<mapbiomas_year>
+    'gedi': ('mean', 25, ['rh98']),
+    'canopy_2005': ('mean', 1000, ['1']),
+}
+
+# Composites reduced over the buffered points by enrich_tiles; the others are
+# sampled at the point itself
+BUFFERED_GROUPS = ('optical', 'terrain')
+
+def reduce_group(image, group, features, mapbiomas_year=2020):
+    import ee
+    name, scale, bands = TILE_REDUCTIONS[group]
+    reducer = ee.Reducer.mode() if name == 'mode' else ee.Reducer.mean()
+    return reduce_points(image, features, reducer, scale, bands or [f'classification_{mapbiomas_year}'])
+
+def tile_sensor_request(tile, lats, lons, ndvi_year=2023, ndwi_year=2023, ndbi_year=2023,
+                        s1_year=2023, mapbiomas_year=2020, buffer_m=50):
+    """Server-side reductions of every sensor composite over the points of one tile."""
+    composites = tile_composites(tile, ndvi_year, ndwi_year, ndbi_year, s1_year, mapbiomas_year)
+    buffered = point_features(lats, lons, buffer_m)
+    points = point_features(lats, lons)
+    return {group: reduce_group(image, group, buffered if group in BUFFERED_GROUPS else points, mapbiomas_year)
+            for group, image in composites.items()}
+
+# Result columns filled by each reduction of tile_sensor_request
+TILE_GROUP_COLUMNS = {
+    'optical': ['NDVI', 'NDWI', 'NDBI'],
+    'terrain': ['Elevation', 'Slope'],
+    'radar': ['Sentinel1_VV', 'Sentinel1_VH'],
+    'landcover': ['MapBiomas_Class'],
+    'gedi': ['CanopyHeight'],
+    'canopy_2005': ['CanopyHeight'],
+}
+
+# getInfo refuses collections of more than 5000 elements, so every request
+# sends at most this many features per reduction
+MAX_REQUEST_FEATURES = 5000
+
+def batches(rows, size):
+    """Splits an array of row positions into consecutive batches of at most size rows."""
+    size = max(int(size), 1)
+    return [rows[start:start + size] for start in range(0, len(rows), size)]
+
+def enrich_tiles(df, ndvi_year=2023, ndwi_year=2023, ndbi_year=2023, s1_year=2023,
+                 mapbiomas_year=2020, buffer_m=50, delay=1, catalogs=None,
+                 tile_deg=0.05, geohash_precision=None, columns=None, rate_limiter=None,
+                 max_features=MAX_REQUEST_FEATURES):
+    """
+    Per-tile counterpart of enrich_points. Returns ({column: list of values} in
+    the row order of df, for the requested columns only; index labels of the
+    rows whose request failed, left None). A tile's points are sent in batches
+    of at most max_features, one request per batch, all reduced against the
+    tile's composites. Scene IDs come from the scene catalogues; tiles without
+    a matching catalogue fetch their own with their first request. rate_limiter
+    (e.g. nhamini.agent.EE_RATE_LIMITER) is acquired once per request.
+    """
+    import ee
+    lats = df['lat'].to_numpy(dtype=float)
+    lons = df['lon'].to_numpy(dtype=float)
+    tiles = assign_tiles(df, tile_deg, geohash_precision).to_numpy()
+    s2_catalog = catalog_for(catalogs, 'S2', ndvi_year) if catalogs else None
+    vv_catalog = catalog_for(catalogs, 'S1_VV', s1_year) if catalogs else None
+
+    columns = [col for col in RESULT_COLUMNS if columns is None or col in columns]
+    results = {col: [None] * len(df) for col in columns}
+    failed = []
+    groups = [group for group, cols in TILE_GROUP_COLUMNS.items() if set(cols) & set(columns)]
+    catalog_names = [name for name, col in (('S2', 'Sentinel2_ID'), ('S1_VV', 'Sentinel1_ID')) if col in columns]
+    given = {'S2': s2_catalog, 'S1_VV': vv_catalog}
+    missing_names = [name for name in catalog_names if given[name] is None]
+    missing_catalogs = {name: spec for name, spec in sensor_catalog_collections(ndvi_year, s1_year).items()
+                        if name in missing_names} if missing_names else {}
+
+    for key in pd.unique(tiles):
+        tile_rows = np.flatnonzero(tiles == key)
+        tile = tile_geometry(lats[tile_rows], lons[tile_rows], margin_m=max(buffer_m, 1000))
+        tile_catalogs = None
+        for rows in batches(tile_rows, max_features):
+            print(f"Processing tile {key} ({len(rows)} of {len(tile_rows)} points)...")
+            if rate_limiter is not None:
+                rate_limiter.acquire()
+            request = tile_sensor_request(tile, lats[rows], lons[rows], ndvi_year, ndwi_year, ndbi_year,
+                                          s1_year, mapbiomas_year, buffer_m)
+            # Unused reductions are dropped before the request, so they are never computed
+            request = {group: request[group] for group in groups}
+            if missing_catalogs and tile_catalogs is None:
+                request['catalogs'] = scene_catalog_request(tile, missing_catalogs)
+            try:
+                info = ee.Dictionary(request).getInfo()
+            except Exception as e:
+                print(f"[WARNING] Tile {key} request failed for {len(rows)} points: {e}")
+                failed.extend(rows)
+                time.sleep(delay)
+                continue
+
+            if 'catalogs' in info:
+                tile_catalogs = parse_scene_catalogs(info['catalogs'], missing_catalogs)
+            tile_s2 = s2_catalog or (tile_catalogs or {}).get('S2')
+            tile_vv = vv_catalog or (tile_catalogs or {}).get('S1_VV')
+
+            def values(group):
+                if group not in info:
+                    return {}
+                return {f['properties']['row']: f['properties'] for f in info[group]['features']}
+
+            optical, terrain, radar = values('optical'), values('terrain'), values('radar')
+            landcover, gedi, canopy_2005 = values('landcover'), values('gedi'), values('canopy_2005')
+            for i, row in enumerate(rows):
+                tile_values = {
+                    'NDVI': optical.get(i, {}).get('NDVI'),
+                    'NDWI': optical.get(i, {}).get('NDWI'),
+                    'NDBI': optical.get(i, {}).get('NDBI'),
+                    'Elevation': terrain.get(i, {}).get('elevation'),
+                    'Slope': terrain.get(i, {}).get('slope'),
+                    'Sentinel1_VV': radar.get(i, {}).get('VV'),
+                    'Sentinel1_VH': radar.get(i, {}).get('VH'),
+                    'MapBiomas_Class': landcover.get(i, {}).get(f'classification_{mapbiomas_year}'),
+                    # GEDI first, NASA/JPL 2005 canopy height when GEDI is missing or 0
+                    'CanopyHeight': gedi.get(i, {}).get('rh98') or canopy_2005.get(i, {}).get('1'),
+                }
+                if 'Sentinel2_ID' in columns:
+                    scene = tile_s2.select(lats[row], lons[row]) if tile_s2 is not None else None
+                    tile_values['Sentinel2_ID'] = scene['product_id'] if scene else None
+                if 'Sentinel1_ID' in columns:
+                    s1_scenes = tile_vv.scenes_at(lats[row], lons[row]) if tile_vv is not None else []
+                    tile_values['Sentinel1_ID'] = tile_vv.scene(s1_scenes[0])['id'] if len(s1_scenes) else None
+                for col in columns:
+                    results[col][row] = tile_values[col]
+            time.sleep(delay)  # To avoid quota limits
+    if failed:
+        print(f"[WARNING] {len(failed)} of {len(df)} points failed; they are left empty")
+    return results, df.index[np.sort(np.asarray(failed, dtype=np.int64))]
+
+# --- Buffer sweep ---
+# Scale profiles: every sensor reduced over nested buffers of each point. The
+# (point, radius) pairs of a tile form FeatureCollections of at most
+# MAX_REQUEST_FEATURES, reduced against the tile composites like enrich_tiles.
+
+BUFFER_SWEEP_M = [0, 25, 50, 100, 250, 500, 1000]
+
+# Sweep sensor -> (tile composite, band)
+SWEEP_SENSORS = {
+    'NDVI': ('optical', 'NDVI'),
+    'NDWI': ('optical', 'NDWI'),
+    'NDBI': ('optical', 'NDBI'),
+    'Elevation': ('terrain', 'elevation'),
+    'Slope': ('terrain', 'slope'),
+    'Sentinel1_VV': ('radar', 'VV'),
+    'Sentinel1_VH': ('radar', 'VH'),
+    'MapBiomas_Class': ('landcover', None),
+    'CanopyHeight': ('gedi', 'rh98'),
+}
+
+def radius_features(lats, lons, radii_m):
+    """One feature per (point, radius), tagged with its row and radius_m (0 = the point itself)."""
+    import ee
+    features = []
+    for i, (lat, lon) in enumerate(zip(lats, lons)):
+        geom = ee.Geometry.Point([float(lon), float(lat)])
+        for radius in radii_m:
+            features.append(ee.Feature(geom.buffer(radius) if radius else geom, {'row': i, 'radius_m': radius}))
+    return ee.FeatureCollection(features)
+
+def sweep_buffers(df, radii_m=BUFFER_SWEEP_M, ndvi_year=2023, ndwi_year=2023, ndbi_year=2023,
+                  s1_year=2023, mapbiomas_year=2020, sensors=None, delay=1,
+                  tile_deg=0.05, geohash_precision=None, rate_limiter=None,
+                  max_features=MAX_REQUEST_FEATURES):
+    """
+    Evaluates every sensor at every buffer radius, reduced against the tile
+    composites. Returns a tidy DataFrame with one row per (site, sensor,
+    radius_m): site is the index label of df (plus name when df has one), value
+    the mean over the buffer (the mode for MapBiomas_Class; CanopyHeight is GEDI
+    rh98, with the NASA/JPL 2005 canopy height where GEDI is missing or 0).
+    A tile's points are sent in batches of at most max_features (point, radius)
+    features, one request per batch; sites whose request failed keep their
+    records with NaN values. rate_limiter is acquired once per request.
+    """
+    import ee
+    radii_m = sorted({int(r) for r in radii_m})
+    sensors = [s for s in SWEEP_SENSORS if sensors is None or s in sensors]
+    groups = list(dict.fromkeys(SWEEP_SENSORS[s][0] for s in sensors))
+    if 'gedi' in groups:
+        groups.append('canopy_2005')
+    lats = df['lat'].to_numpy(dtype=float)
+    lons = df['lon'].to_numpy(dtype=float)
+    tiles = assign_tiles(df, tile_deg, geohash_precision).to_numpy()
+    names = df['name'].to_numpy() if 'name' in df.columns else None
+    records = []
+    failed = 0
+
+    for key in pd.unique(tiles):
+        tile_rows = np.flatnonzero(tiles == key)
+        tile = tile_geometry(lats[tile_rows], lons[tile_rows], margin_m=max(max(radii_m), 1000))
+        composites = tile_composites(tile, ndvi_year, ndwi_year, ndbi_year, s1_year, mapbiomas_year)
+        for rows in batches(tile_rows, max_features // len(radii_m)):
+            print(f"Sweeping tile {key} ({len(rows)} of {len(tile_rows)} points x {len(radii_m)} radii)...")
+            if rate_limiter is not None:
+                rate_limiter.acquire()
+            features = radius_features(lats[rows], lons[rows], radii_m)
+            request = {group: reduce_group(composites[group], group, features, mapbiomas_year) for group in groups}
+            try:
+                info = ee.Dictionary(request).getInfo()
+            except Exception as e:
+                print(f"[WARNING] Tile {key} sweep failed for {len(rows)} points: {e}")
+                failed += len(rows)
+                info = {}
+
+            values = {group: {(f['properties']['row'], f['properties']['radius_m']): f['properties']
+                              for f in info[group]['features']} if group in info else {} for group in groups}
+            for i, row in enumerate(rows):
+                for radius in radii_m:
+                    for sensor in sensors:
+                        group, band = SWEEP_SENSORS[sensor]
+                        props = values[group].get((i, radius), {})
+                        value = props.get(band or f'classification_{mapbiomas_year}')
+                        if sensor == 'CanopyHeight' and not value:
+                            value = values['canopy_2005'].get((i, radius), {}).get('1')
+                        record = {'site': df.index[row], 'sensor': sensor, 'radius_m': radius,
+                                  'value': np.nan if value is None else float(value)}
+                        if names is not None:
+                            record['name'] = names[row]
+                        records.append(record)
+            time.sleep(delay)  # To avoid quota limits
+    if failed:
+        print(f"[WARNING] {failed} of {len(df)} points failed; their sweep values are NaN")
+
+    columns = ['site'] + (['name'] if names is not None else []) + ['sensor', 'radius_m', 'value']
+    sweep = pd.DataFrame.from_records(records, columns=columns)
+    sweep['sensor'] = pd.Categorical(sweep['sensor'], categories=sensors)
+    sweep['radius_m'] = sweep['radius_m'].astype(np.int32)
+    sweep['value'] = sweep['value'].astype(float)
+    sweep.attrs['buffer_sweep'] = dict(radii_m=radii_m, ndvi_year=ndvi_year, ndwi_year=ndwi_year, ndbi_year=ndbi_year,
+                                       s1_year=s1_year, mapbiomas_year=mapbiomas_year)
+    return sweep
+
+def scale_profiles(sweep):
+    """Wide view of a sweep: one row per site, (sensor, radius_m) columns."""
+    index = ['site', 'name'] if 'name' in sweep.columns else ['site']
+    # pivot (not pivot_table) keeps NaN values without crossing site and name
+    profiles = sweep.pivot(index=index, columns=['sensor', 'radius_m'], values='value')
+    return profiles.sort_index(axis=1)
+
+def assign_sensor_columns(df, results):
+    """Writes {column: list of values} into df using the result schema."""
+    for col, values in results.items():
+        if col in SCENE_ID_COLUMNS:
+            df[col] = to_scene_id_array(values)
+        elif col in CLASS_COLUMNS:
+            df[col] = to_class_array(values)
+        else:
+            df[col] = to_sensor_array(values)
+    return df
+
+# --- Enrich DataFrame with all sensors ---
+
+# Columns fetched by each per-point Earth Engine request of enrich_points
+POINT_REQUEST_COLUMNS = [
+    ('NDVI', 'Sentinel2_ID'), ('NDWI',), ('NDBI',), ('Elevation',), ('Slope',),
+    ('Sentinel1_VV', 'Sentinel1_ID'), ('Sentinel1_VH',), ('MapBiomas_Class',), ('CanopyHeight',),
+]
+
+def enrich_points(df, ndvi_year=2023, ndwi_year=2023, ndbi_year=2023, s1_year=2023,
+                  mapbiomas_year=2020, buffer_m=50, delay=1, catalogs=None, columns=None,
+                  rate_limiter=None):
+    """
+    Queries every point of df separately. Returns ({column: list of values} in
+    the row order of df, for the requested columns only (all of them if None);
+    index labels of the points whose requests raised, left None). rate_limiter (e.g. nhamini.agent.EE_RATE_LIMITER) is acquired for every
+    point, one token per Earth Engine request it sends.
+    """
+    wanted = [col for col in RESULT_COLUMNS if columns is None or col in columns]
+    s2_catalog = catalog_for(catalogs, 'S2', ndvi_year) if catalogs else None
+    vv_catalog = catalog_for(catalogs, 'S1_VV', s1_year) if catalogs else None
+    vh_catalog = catalog_for(catalogs, 'S1_VH', s1_year) if catalogs else None
+    results = {col: [] for col in wanted}
+
+    def needs(*cols):
+        return any(col in results for col in cols)
+
+    requests_per_point = sum(needs(*cols) for cols in POINT_REQUEST_COLUMNS)
+    failed = []
+    for pos, (_, row) in enumerate(df.iterrows()):
+        if rate_limiter is not None:
+            rate_limiter.acquire(requests_per_point)
+        lat, lon = row['lat'], row['lon']
+        print(f"Processing {row.get('name', 'site')} ({lat}, {lon})...")
+        values = {}
+        try:
+            # Get NDVI and Sentinel-2 ID
+            if needs('NDVI', 'Sentinel2_ID'):
+                ndvi_result = get_ndvi(lat, lon, ndvi_year, buffer_m, catalog=s2_catalog)
+                if isinstance(ndvi_result, dict):
+                    values['NDVI'] = ndvi_result['ndvi']
+                    values['Sentinel2_ID'] = ndvi_result['sentinel2_id']
+                else:
+                    values['NDVI'] = ndvi_result
+
+            if needs('NDWI'):
+                values['NDWI'] = get_ndwi(lat, lon, ndwi_year, buffer_m)
+            if needs('NDBI'):
+                values['NDBI'] = get_ndbi(lat, lon, ndbi_year, buffer_m)
+            if needs('Elevation'):
+                values['Elevation'] = get_srtm_elevation(lat, lon, buffer_m)
+            if needs('Slope'):
+                values['Slope'] = get_srtm_slope(lat, lon, buffer_m)
+
+            # Get Sentinel-1 VV and ID
+            if needs('Sentinel1_VV', 'Sentinel1_ID'):
+                s1_vv_result = get_sentinel1_vv(lat, lon, s1_year, buffer_m=1000, catalog=vv_catalog,
+                                                raise_errors=True)
+                if isinstance(s1_vv_result, dict):
+                    values['Sentinel1_VV'] = s1_vv_result['vv']
+                    values['Sentinel1_ID'] = s1_vv_result['sentinel1_id']
+                else:
+                    values['Sentinel1_VV'] = s1_vv_result
+
+            if needs('Sentinel1_VH'):
+                values['Sentinel1_VH'] = get_sentinel1_vh(lat, lon, s1_year, buffer_m=1000, catalog=vh_catalog,
+                                                          raise_errors=True)
+            if needs('MapBiomas_Class'):
+                values['MapBiomas_Class'] = get_mapbiomas_class(lat, lon, mapbiomas_year, raise_errors=True)
+            if needs('CanopyHeight'):
+                values['CanopyHeight'] = get_gedi_canopy_height(lat, lon, raise_errors=True)
+        except Exception as e:
+            print(f"[WARNING] {row.get('name', 'site')} ({lat}, {lon}) failed: {e}")
+            failed.append(pos)
+            values = {}
+        for col in results:
+            results[col].append(values.get(col))
+        time.sleep(delay)  # To avoid quota limits
+    return results, df.index[failed]
+
+def compute_sensor_columns(df, params, delay=1, catalogs=None, tile_deg=None,
+                           geohash_precision=None, columns=None, rate_limiter=None):
+    """
+    Dispatches to enrich_tiles or enrich_points with the enrichment params dict.
+    Returns (results, index labels of the failed rows).
+    """
+    if tile_deg is not None or geohash_precision is not None:
+        return enrich_tiles(df, **params, delay=delay, catalogs=catalogs, tile_deg=tile_deg or 0.05,
+                            geohash_precision=geohash_precision, columns=columns, rate_limiter=rate_limiter)
+    return enrich_points(df, **params, delay=delay, catalogs=catalogs, columns=columns,
+                         rate_limiter=rate_limiter)
+
+def enrich_benchmarks_with_all_sensors(
+    df,
+    ndvi_year=2023,
+    ndwi_year=2023,
+    ndbi_year=2023,
+    s1_year=2023,
+    mapbiomas_year=2020,
+    buffer_m=50,
+    delay=1,
+    catalogs=None,
+    tile_deg=None,
+    geohash_precision=None
+):
+    """
+    Adds all sensor columns to df. catalogs is the optional dict returned by
+    build_scene_catalogs (nhamini.scenes); a catalogue is only used for the
+    year it was built for.
+
+    Setting tile_deg (grid cell size in degrees) or geohash_precision groups
+    nearby points into tiles that share one composite per sensor (enrich_tiles).
+    The parameters behind each column are recorded in df.attrs['provenance'].
+    """
+    params = dict(ndvi_year=ndvi_year, ndwi_year=ndwi_year, ndbi_year=ndbi_year, s1_year=s1_year,
+                  mapbiomas_year=mapbiomas_year, buffer_m=buffer_m)
+    results, failed = compute_sensor_columns(df, params, delay, catalogs, tile_deg, geohash_precision)
+    assign_sensor_columns(df, results)
+    return record_provenance(df, results.keys(), params, failed=failed)
+
+def merge_sensor_column(df, col, rows, values):
+    """Replaces the values of col at the given index labels, keeping the result schema."""
+    if col in df.columns:
+        current = df[col].astype(object).where(df[col].notna(), None)
+    else:
+        current = pd.Series(None, index=df.index, dtype=object)
+    current.loc[rows] = pd.Series(values, index=rows, dtype=object)
+    assign_sensor_columns(df, {col: current.tolist()})
+
+def append_sites(df, sites):
+    """Appends new sites (DataFrame or list of dicts) to an enriched frame, keeping its provenance."""
+    sites = sites if isinstance(sites, pd.DataFrame) else pd.DataFrame(sites)
+    attrs = df.attrs
+    combined = pd.concat([df, sites], ignore_index=isinstance(df.index, pd.RangeIndex))
+    combined.attrs = attrs
+    return combined
+
+def reenrich_with_all_sensors(
+    df,
+    ndvi_year=2023,
+    ndwi_year=2023,
+    ndbi_year=2023,
+    s1_year=2023,
+    mapbiomas_year=2020,
+    buffer_m=50,
+    delay=1,
+    catalogs=None,
+    tile_deg=None,
+    geohash_precision=None
+):
+    """
+    Incremental enrich_benchmarks_with_all_sensors: using df.attrs['provenance'],
+    recomputes only the columns whose parameters changed (for every row) and
+    all columns of the rows that were added or moved. Frames without provenance
+    are enriched from scratch.
+    """
+    provenance = df.attrs.get('provenance')
+    if not provenance:
+        return enrich_benchmarks_with_all_sensors(
+            df, ndvi_year, ndwi_year, ndbi_year, s1_year, mapbiomas_year, buffer_m, delay,
+            catalogs, tile_deg, geohash_precision)
+
+    params = dict(ndvi_year=ndvi_year, ndwi_year=ndwi_year, ndbi_year=ndbi_year, s1_year=s1_year,
+                  mapbiomas_year=mapbiomas_year, buffer_m=buffer_m)
+    stale_columns = [
+        col for col in RESULT_COLUMNS
+        if col not in df.columns or provenance['columns'].get(col) != column_parameters(col, params)
+    ]
+    fresh_columns = [col for col in RESULT_COLUMNS if col not in stale_columns]
+    recorded = enriched_coordinates(df)
+    moved = ~(np.isclose(recorded['lat'], df['lat'].astype(float)) &
+              np.isclose(recorded['lon'], df['lon'].astype(float)))
+    stale_rows = df.index[np.asarray(moved)]
+    print(f"[INFO] Re-enriching {len(stale_columns)} column(s) for all {len(df)} rows "
+          f"and {len(fresh_columns)} column(s) for {len(stale_rows)} added/moved rows")
+
+    failed = df.index[:0]
+    if stale_columns:
+        results, failed_columns = compute_sensor_columns(df, params, delay, catalogs, tile_deg, geohash_precision,
+                                                         columns=stale_columns)
+        assign_sensor_columns(df, results)
+        failed = failed.union(failed_columns)
+    if fresh_columns and len(stale_rows):
+        subset = df.loc[stale_rows]
+        results, failed_rows = compute_sensor_columns(subset, params, delay, catalogs, tile_deg, geohash_precision,
+                                                      columns=fresh_columns)
+        for col, values in results.items():
+            merge_sensor_column(df, col, stale_rows, values)
+        failed = failed.union(failed_rows)
+    # Every row now matches its current coordinates and the current parameters,
+    # except the failed ones, which keep no coordinates and are retried next time
+    return record_provenance(df, stale_columns, params, failed=failed)
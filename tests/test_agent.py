@@ -0,0 +1,147 @@
+# tests/test_agent.py
+
+# AgentRuntime against a local stub model server: scripted Responses API
+# turns with parallel, duplicate and invalid function calls.
+
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from nhamini.agent import AgentRuntime, RateLimiter
+
+def function_call(call_id, name, arguments):
+    return {'type': 'function_call', 'id': f'fc_{call_id}', 'call_id': call_id, 'name': name,
+            'arguments': arguments if isinstance(arguments, str) else json.dumps(arguments)}
+
+def scripted_responses():
+    """First turn: 4 parallel calls (c1/c2 identical, c3 invalid JSON, c4 unknown tool), then a message."""
+    return [
+        {'id': 'resp_1', 'output': [
+            function_call('c1', 'slow', {'site': 'A'}),
+            function_call('c2', 'slow', {'site': 'A'}),
+            function_call('c3', 'slow', '{"site": '),
+            function_call('c4', 'missing', {}),
+            function_call('c5', 'slow', {'site': 'B'}),
+        ]},
+        {'id': 'resp_2', 'output': [{'type': 'message', 'id': 'msg_1', 'role': 'assistant', 'status': 'completed',
+                                     'content': [{'type': 'output_text', 'text': 'done', 'annotations': []}]}],
+         'usage': {'input_tokens': 10, 'output_tokens': 2, 'total_tokens': 12}},
+    ]
+
+class StubModelServer(ThreadingHTTPServer):
+    """Serves the scripted responses in order on POST /v1/responses and records the request bodies."""
+
+    def __init__(self, responses):
+        super().__init__(('127.0.0.1', 0), StubHandler)
+        self.responses = list(responses)
+        self.requests = []
+
+    @property
+    def base_url(self):
+        return f'http://127.0.0.1:{self.server_address[1]}/v1'
+
+class StubHandler(BaseHTTPRequestHandler):
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers['Content-Length'])))
+        self.server.requests.append(body)
+        response = dict(self.server.responses.pop(0), object='response', created_at=0, model=body['model'],
+                        status='completed', parallel_tool_calls=True, tool_choice='auto', tools=[])
+        data = json.dumps(response).encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, *args):
+        pass
+
+@pytest.fixture
+def stub_server():
+    server = StubModelServer(scripted_responses())
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+def slow_handlers(calls):
+    # The two distinct sites only get past the barrier if they run concurrently
+    barrier = threading.Barrier(2, timeout=5)
+
+    def slow(runtime, site):
+        calls.append(site)
+        barrier.wait()
+        time.sleep(0.1)
+        return {'site': site, 'NDVI': 0.8}
+    return {'slow': slow}
+
+def check_outputs(outputs, calls):
+    by_id = {item['call_id']: json.loads(item['output']) for item in outputs}
+    # Every call_id gets exactly one output, duplicates included
+    assert sorted(by_id) == ['c1', 'c2', 'c3', 'c4', 'c5']
+    assert len(outputs) == 5
+    assert by_id['c1'] == by_id['c2'] == {'site': 'A', 'NDVI': 0.8}
+    assert by_id['c5'] == {'site': 'B', 'NDVI': 0.8}
+    assert 'Invalid arguments' in by_id['c3']['error']
+    assert 'Unknown tool' in by_id['c4']['error']
+    # The identical calls ran once (a third call would break the barrier)
+    assert sorted(calls) == ['A', 'B']
+
+def test_stub_server_parallel_calls(stub_server):
+    openai = pytest.importorskip('openai')
+    client = openai.OpenAI(api_key='stub', base_url=stub_server.base_url, max_retries=0)
+    calls = []
+    with AgentRuntime(client, model='stub', handlers=slow_handlers(calls), tools=[]) as runtime:
+        response = runtime.run('Analyze sites A and B')
+    assert response.output_text == 'done'
+    first, second = stub_server.requests
+    assert first['parallel_tool_calls'] is True
+    assert second['previous_response_id'] == 'resp_1'
+    check_outputs(second['input'], calls)
+
+def test_scripted_client_without_openai():
+    # Same script through an injected client object (no HTTP, no openai package)
+    class Responses:
+        def __init__(self):
+            self.script = scripted_responses()
+            self.requests = []
+
+        def create(self, **request):
+            self.requests.append(request)
+            return self.script.pop(0)
+
+    class Client:
+        responses = Responses()
+
+    calls = []
+    with AgentRuntime(Client(), model='stub', handlers=slow_handlers(calls), tools=[]) as runtime:
+        runtime.run('Analyze sites A and B')
+    check_outputs(Client.responses.requests[1]['input'], calls)
+
+def test_failed_calls_are_retried():
+    attempts = []
+
+    def flaky(runtime):
+        attempts.append(1)
+        if len(attempts) == 1:
+            raise RuntimeError('quota exceeded')
+        return {'ok': True}
+
+    with AgentRuntime(object(), handlers={'flaky': flaky}, tools=[]) as runtime:
+        call = function_call('c1', 'flaky', {})
+        [(_, first)] = runtime.dispatch([call])
+        [(_, second)] = runtime.dispatch([call])
+        [(_, third)] = runtime.dispatch([call])
+    assert json.loads(first['output']) == {'error': 'quota exceeded'}
+    assert json.loads(second['output']) == json.loads(third['output']) == {'ok': True}
+    assert len(attempts) == 2
+
+def test_rate_limiter_spreads_large_requests():
+    limiter = RateLimiter(rate=100, capacity=10)
+    start = time.perf_counter()
+    limiter.acquire(30)  # 10 in the bucket, then 20 more at 100/s
+    assert time.perf_counter() - start >= 0.15
@@ -0,0 +1,86 @@
+# tests/test_analyze.py
+
+# Streamed closest matches: the incremental parser on split text, partial
+# results when the stream breaks, and callback errors reaching the caller.
+
+import json
+import types
+
+import pandas as pd
+import pytest
+
+from nhamini.analyze import ClosestMatch, MatchStreamParser, stream_closest_matches
+
+MATCHES = {'matches': [
+    {'name': 'Site {A}', 'lat': -9.5, 'lon': -67.1, 'reason': 'ring "ditch" [12 m], see {"matches": []}'},
+    {'name': 'B\\\\', 'lat': -10.0, 'lon': -66.9, 'reason': 'escaped \\" quote and } brace'},
+    {'name': 'C', 'lat': -10.2, 'lon': -66.0, 'reason': ''},
+]}
+TEXT = json.dumps({'summary': {'matches': [{'name': 'not a match'}]}, **MATCHES})
+
+@pytest.mark.parametrize('size', [1, 2, 7, 50, len(TEXT)])
+def test_parser_on_split_text(size):
+    parser = MatchStreamParser()
+    completed = []
+    for start in range(0, len(TEXT), size):
+        for item in parser.feed(TEXT[start:start + size]):
+            # Each match is emitted by the delta holding its closing brace
+            assert TEXT.index(json.dumps(item)) + len(json.dumps(item)) <= start + size
+            completed.append(item)
+    assert completed == MATCHES['matches']
+
+class FakeStream:
+    """Context manager yielding output_text deltas, optionally raising after some of them."""
+
+    def __init__(self, deltas, fail_after=None):
+        self.deltas = deltas
+        self.fail_after = fail_after
+        self.closed = False
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.closed = True
+
+    def __iter__(self):
+        for i, delta in enumerate(self.deltas):
+            if i == self.fail_after:
+                raise ConnectionError('stream reset')
+            yield types.SimpleNamespace(type='response.output_text.delta', delta=delta)
+
+    def get_final_response(self):
+        return 'final'
+
+def fake_client(stream):
+    return types.SimpleNamespace(responses=types.SimpleNamespace(stream=lambda **request: stream))
+
+def deltas():
+    return [TEXT[start:start + 40] for start in range(0, len(TEXT), 40)]
+
+FRAME = pd.DataFrame({'name': ['x'], 'NDVI': [0.5]})
+
+def test_stream_keeps_matches_received_before_a_break():
+    chunks = deltas()
+    # Break right after the delta completing the second match
+    second = TEXT.index(json.dumps(MATCHES['matches'][1])) + len(json.dumps(MATCHES['matches'][1]))
+    stream = FakeStream(chunks, fail_after=second // 40 + 1)
+    received = []
+    matches, response = stream_closest_matches(FRAME, FRAME, client=fake_client(stream), on_match=received.append)
+    assert response is None
+    assert [m.name for m in matches] == [m.name for m in received] == ['Site {A}', 'B\\\\']
+    assert stream.closed
+
+    matches, response = stream_closest_matches(FRAME, FRAME, client=fake_client(FakeStream(chunks)))
+    assert response == 'final'
+    assert matches == [ClosestMatch(**m) for m in MATCHES['matches']]
+
+def test_callback_errors_propagate():
+    stream = FakeStream(deltas())
+
+    def on_match(match):
+        raise OSError('disk full')
+
+    with pytest.raises(OSError, match='disk full'):
+        stream_closest_matches(FRAME, FRAME, client=fake_client(stream), on_match=on_match)
+    assert stream.closed
@@ -0,0 +1,150 @@
+# tests/test_compare.py
+
+# The compare stage on small result files (sensor coverage from the Parquet
+# footer, z-scores that join back to the candidates), the accuracy of the
+# streaming benchmark statistics against NumPy, and the binned z-score density
+# with its top-N closest candidates.
+
+import warnings
+
+import numpy as np
+import pandas as pd
+import pyarrow.parquet as pq
+
+from nhamini.cli import main
+from nhamini.compare import (
+    BenchmarkProfile, QuantileSketch, ZScoreDensity, comparable_sensors, iter_chunks, mean_zscores,
+    parquet_valid_counts, plot_zscore_profile,
+)
+from nhamini.schema import write_results_parquet
+
+def result_frame(n, seed, names):
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame({
+        'name': [f'{names}-{i}' for i in range(n)],
+        'lat': rng.uniform(-11, -9, n), 'lon': rng.uniform(-68, -66, n),
+        'NDVI': rng.normal(0.7, 0.1, n), 'Elevation': rng.normal(200, 20, n),
+        'Slope': np.where(np.arange(n) % 3 == 0, np.nan, rng.normal(3, 1, n)),
+        'CanopyHeight': np.full(n, np.nan),
+    })
+
+def test_parquet_coverage_matches_the_frame(tmp_path):
+    df = result_frame(250, 0, 'cand')
+    path = str(tmp_path / 'candidates.parquet')
+    write_results_parquet(df, path)
+    # Several row groups, so the null counts are summed across them
+    pq.write_table(pq.read_table(path), path, row_group_size=100)
+    assert pq.ParquetFile(path).metadata.num_row_groups == 3
+    counts = parquet_valid_counts(path, ['NDVI', 'Slope', 'CanopyHeight', 'NDWI'])
+    assert counts == {'NDVI': 250, 'Slope': int(df['Slope'].notna().sum()), 'CanopyHeight': 0}
+    bench = result_frame(20, 1, 'bench')
+    assert comparable_sensors(bench, path) == comparable_sensors(bench, df) == ['NDVI', 'Elevation', 'Slope']
+
+def test_compare_zscores_join_back(tmp_path):
+    df = result_frame(250, 0, 'cand')
+    write_results_parquet(result_frame(20, 1, 'bench'), str(tmp_path / 'benchmark_enriched.parquet'))
+    write_results_parquet(df, str(tmp_path / 'candidates_enriched.parquet'))
+    main(['compare', '--workdir', str(tmp_path), '--chunk-size', '64', '--no-plot'])
+    z = pd.read_parquet(tmp_path / 'candidate_zscores.parquet')
+    assert list(z.columns) == ['row', 'name', 'NDVI', 'Elevation', 'Slope']
+    assert z['row'].tolist() == list(range(250))
+    assert (z['name'] == df['name']).all()
+
+def test_quantile_sketch_accuracy_and_merge():
+    rng = np.random.default_rng(2)
+    values = rng.lognormal(0, 1, 100_000)
+    q = np.array([0.01, 0.1, 0.25, 0.5, 0.75, 0.9, 0.99])
+    whole = QuantileSketch(k=200).update(values)
+    # Sketches of separate chunks merge into one of the same accuracy
+    merged = QuantileSketch(k=200)
+    for chunk in np.array_split(values, 7):
+        merged.merge(QuantileSketch(k=200).update(chunk))
+    ordered = np.sort(values)
+    for sketch in (whole, merged):
+        assert sketch.count == len(values)
+        ranks = np.searchsorted(ordered, sketch.quantile(q)) / len(values)
+        np.testing.assert_allclose(ranks, q, atol=0.02)
+        assert sum(len(level) for level in sketch.levels) < 2000
+    restored = QuantileSketch.from_dict(whole.to_dict())
+    np.testing.assert_array_equal(restored.quantile(q), whole.quantile(q))
+
+def test_benchmark_profile_matches_numpy():
+    df = result_frame(1000, 3, 'bench')
+    sensors = ['NDVI', 'Elevation', 'Slope', 'CanopyHeight']
+    profile = BenchmarkProfile.from_frame(df, sensors, chunk_size=97)
+    values = df[sensors].to_numpy(dtype=float)
+    with np.errstate(invalid='ignore', divide='ignore'), warnings.catch_warnings():
+        warnings.simplefilter('ignore', RuntimeWarning)
+        np.testing.assert_allclose(profile.mean[:3], np.nanmean(values[:, :3], axis=0))
+        np.testing.assert_allclose(profile.std, np.nanstd(values, axis=0, ddof=1))
+    assert profile.count.tolist() == np.isfinite(values).sum(axis=0).tolist()
+    assert np.isnan(profile.std[3])
+
+    # Site by site, and merged from two halves, gives the same statistics
+    halves = [BenchmarkProfile.from_frame(part, sensors) for part in (df.iloc[:400], df.iloc[400:])]
+    merged = halves[0].merge(halves[1])
+    single = BenchmarkProfile(sensors)
+    for site in df[sensors].to_dict('records'):
+        single.update_site(site)
+    for other in (merged, single, BenchmarkProfile.from_dict(profile.to_dict())):
+        np.testing.assert_allclose(other.mean, profile.mean)
+        np.testing.assert_allclose(other.m2, profile.m2)
+        np.testing.assert_array_equal(other.count, profile.count)
+
+    quartiles = profile.quantiles([0.25, 0.5, 0.75])
+    np.testing.assert_allclose(quartiles['Elevation'], np.nanquantile(values[:, 1], [0.25, 0.5, 0.75]), rtol=0.02)
+    z = profile.zscores(df)
+    np.testing.assert_allclose(z['NDVI'], (values[:, 0] - profile.mean[0]) / profile.std[0], rtol=1e-5)
+
+def test_no_comparable_sensors():
+    df = result_frame(10, 4, 'bench')
+    profile = BenchmarkProfile.from_frame(df, [])
+    assert profile.zscores(df).shape == (10, 0)
+    assert len(mean_zscores(iter_chunks(df), profile)) == 0
+
+def test_zscore_density_counts_and_top_candidates():
+    z = pd.DataFrame({'NDVI': [0.1, -0.3, 2.2, 9.0, np.nan, -0.05],
+                      'Slope': [0.2, np.nan, np.nan, -7.0, 0.0, 0.05]})
+    names = ['a', 'b', 'c', 'd', 'e', 'f']
+    density = ZScoreDensity(['NDVI', 'Slope'], bins=[-2, -1, 0, 1, 2], top_n=3, min_coverage=1.0)
+    density.update(z.iloc[:3], names=names[:3]).update(z.iloc[3:], names=names[3:])
+
+    # Values outside the bins land in the edge bins, NaN is not counted
+    np.testing.assert_array_equal(density.counts, [[0, 1], [2, 0], [1, 3], [2, 0]])
+    assert density.total == 6
+    # b, c and e lack a sensor (coverage below 1.0); f is the closest, then a, then d
+    top = density.top()
+    assert top['name'].tolist() == ['f', 'a', 'd']
+    np.testing.assert_allclose(top['distance'], [0.05, 0.15, 8.0])
+    np.testing.assert_allclose(top[['NDVI', 'Slope']].to_numpy(), z.loc[[5, 0, 3]].to_numpy())
+
+    # Half coverage admits b, c and e (e at 0 on its one sensor); only the top 3 are kept
+    density = ZScoreDensity(['NDVI', 'Slope'], bins=[-2, -1, 0, 1, 2], top_n=3, min_coverage=0.5)
+    density.update(z)
+    assert density.top()['name'].tolist() == [4, 5, 0]  # index labels without names
+
+def test_zscore_density_merge_matches_one_pass():
+    rng = np.random.default_rng(4)
+    z = pd.DataFrame(rng.normal(0, 2, (500, 3)), columns=['NDVI', 'Elevation', 'Slope'])
+    z.iloc[::7, 1] = np.nan
+    names = [f'c{i}' for i in range(len(z))]
+    whole = ZScoreDensity(z.columns, top_n=5).update(z, names=names)
+    parts = [ZScoreDensity(z.columns, top_n=5).update(z.iloc[i:i + 100], names=names[i:i + 100])
+             for i in range(0, len(z), 100)]
+    merged = parts[0]
+    for part in parts[1:]:
+        merged.merge(part)
+    np.testing.assert_array_equal(merged.counts, whole.counts)
+    assert merged.total == whole.total == 500
+    pd.testing.assert_frame_equal(merged.top(), whole.top())
+
+    distance = np.nanmean(np.abs(z.to_numpy()), axis=1)
+    assert whole.top()['name'].tolist() == [names[i] for i in np.argsort(distance)[:5]]
+
+def test_profile_plot_keeps_the_pyplot_backend(tmp_path):
+    import matplotlib
+    backend = matplotlib.get_backend()
+    path = tmp_path / 'zscore_profile.png'
+    plot_zscore_profile(['NDVI', 'Slope'], [0.1, -0.2], [0.5, 1.5], path=str(path))
+    assert path.read_bytes()[:8] == b'\x89PNG\r\n\x1a\n'
+    assert matplotlib.get_backend() == backend
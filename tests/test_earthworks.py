@@ -0,0 +1,41 @@
+# tests/test_earthworks.py
+
+# Shape scores of the earthwork detector on synthetic chips with known shapes.
+
+import numpy as np
+import pytest
+
+from nhamini.earthworks import empty_chip, score_chip, score_chips, synthetic_chip
+
+RADII_PX = (10, 15, 20)
+SEEDS = (0, 1)
+
+@pytest.fixture(scope='module')
+def scores():
+    chips = {(shape, r, seed): synthetic_chip(shape=shape, radius_px=r, seed=seed)
+             for shape in ('ring', 'square', None) for r in RADII_PX for seed in SEEDS}
+    return dict(zip(chips, score_chips(chips.values(), workers=1)))
+
+def select(scores, shape, key, r=None):
+    return np.array([s[key] for (sh, radius, _), s in scores.items() if sh == shape and r in (None, radius)])
+
+def test_shapes_score_above_plain_chips(scores):
+    assert select(scores, 'ring', 'ring_score').min() > select(scores, None, 'ring_score').max()
+    assert select(scores, 'square', 'square_score').min() > select(scores, None, 'square_score').max()
+
+@pytest.mark.parametrize('r', RADII_PX)
+def test_scores_discriminate_rings_from_squares(scores, r):
+    assert select(scores, 'ring', 'ring_score', r).min() > select(scores, 'square', 'ring_score', r).max()
+    assert select(scores, 'square', 'square_score', r).min() > select(scores, 'ring', 'square_score', r).max()
+
+def test_shape_and_radius_are_recovered(scores):
+    for (shape, r, _), s in scores.items():
+        if shape == 'ring':
+            assert s['ring_score'] > s['square_score']
+            assert abs(s['ring_radius_m'] - r * 10) <= 0.25 * r * 10
+        elif shape == 'square':
+            assert s['square_score'] > s['ring_score']
+
+def test_empty_chip_scores_zero():
+    s = score_chip(empty_chip())
+    assert s['shape_score'] == 0.0 and s['curvature'] == 0.0
@@ -0,0 +1,57 @@
+# tests/test_geometry.py
+
+# Nearest-benchmark search boxes against haversine distances, and the Arrow
+# WKB column type.
+
+import math
+
+import numpy as np
+
+from nhamini.geometry import (
+    EARTH_RADIUS_M, circle_rings, haversine_m, nearest_benchmark, polygons_to_wkb,
+    polygons_to_wkb_arrow, search_boxes,
+)
+
+METERS_PER_DEGREE = EARTH_RADIUS_M * math.pi / 180
+
+def test_nearest_benchmark_box_matches_haversine():
+    # A is 999.0 m due north, just outside a 111320 m/° box; B is 999.8 m away diagonally
+    step = 999.8 / math.sqrt(2) / METERS_PER_DEGREE
+    bench_lat = np.array([999.0 / METERS_PER_DEGREE, step])
+    bench_lon = np.array([0.0, step])
+    nearest, distance = nearest_benchmark([0.0], [0.0], bench_lat, bench_lon, start_radius_m=1000)
+    assert nearest[0] == 0
+    assert abs(distance[0] - 999.0) < 0.01
+
+def test_nearest_benchmark_matches_brute_force():
+    rng = np.random.default_rng(0)
+    lat, lon = rng.uniform(-80, 80, 300), rng.uniform(-170, 170, 300)
+    bench_lat, bench_lon = rng.uniform(-85, 85, 200), rng.uniform(-180, 180, 200)
+    nearest, distance = nearest_benchmark(lat, lon, bench_lat, bench_lon)
+    brute = haversine_m(lat[:, None], lon[:, None], bench_lat[None, :], bench_lon[None, :])
+    np.testing.assert_allclose(distance, brute.min(axis=1))
+    np.testing.assert_array_equal(nearest, brute.argmin(axis=1))
+
+def test_search_boxes_contain_the_cap():
+    lat = np.array([0.0, 45.0, -70.0, 89.99])
+    lon = np.zeros(4)
+    boxes = search_boxes(lat, lon, 50_000)
+    bearings = np.radians(np.arange(0, 360, 1.0))
+    for (lon0, lat0, lon1, lat1), centre in zip(boxes, lat):
+        # Points on the 50 km circle (destination formula on the same sphere)
+        angle = 50_000 / EARTH_RADIUS_M
+        phi = math.radians(centre)
+        plat = np.arcsin(math.sin(phi) * math.cos(angle) + math.cos(phi) * math.sin(angle) * np.cos(bearings))
+        plon = np.arctan2(np.sin(bearings) * math.sin(angle) * math.cos(phi),
+                          math.cos(angle) - math.sin(phi) * np.sin(plat))
+        assert (np.degrees(plat) >= lat0 - 1e-9).all() and (np.degrees(plat) <= lat1 + 1e-9).all()
+        assert (np.degrees(plon) >= lon0 - 1e-9).all() and (np.degrees(plon) <= lon1 + 1e-9).all()
+    # The box reaching the pole spans every longitude
+    assert tuple(boxes[-1][[0, 2]]) == (-180.0, 180.0)
+
+def test_wkb_arrow_uses_large_binary():
+    import pyarrow as pa
+    rings = circle_rings(np.array([-3.0, -10.0]), np.array([-60.0, -55.0]), np.array([500, 800]))
+    array = polygons_to_wkb_arrow(rings)
+    assert array.type == pa.large_binary()
+    assert array.to_pylist() == list(polygons_to_wkb(rings))
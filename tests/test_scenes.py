@@ -0,0 +1,43 @@
+# tests/test_scenes.py
+
+# Buffered scene lookups against footprints that touch the query box without
+# covering its centre or corners, and the per-catalogue selection radius.
+
+from nhamini.scenes import S1_DATASET, S2_DATASET, SceneCatalog
+
+LAT, LON = -10.0, -67.0
+
+def square(x0, y0, x1, y1):
+    return {'type': 'Polygon', 'coordinates': [[[x0, y0], [x1, y0], [x1, y1], [x0, y1]]]}
+
+def test_buffered_lookup_uses_box_intersection():
+    footprints = [
+        # Thin strip crossing the box: no vertex in the box, no box corner in the strip
+        square(LON - 1, LAT - 0.002, LON + 1, LAT + 0.002),
+        # Small footprint entirely inside the 1 km box
+        square(LON + 0.001, LAT + 0.001, LON + 0.002, LAT + 0.002),
+        # Footprint containing the box
+        square(LON - 1, LAT - 1, LON + 1, LAT + 1),
+        # Bounding box overlaps the query box, the triangle itself does not
+        {'type': 'Polygon', 'coordinates': [[[LON + 0.004, LAT + 0.02], [LON + 0.02, LAT + 0.004],
+                                             [LON + 0.03, LAT + 0.03]]]},
+        # Far away
+        square(LON + 0.05, LAT + 0.05, LON + 0.06, LAT + 0.06),
+    ]
+    catalog = SceneCatalog('TEST', 2023, list('abcde'), [0] * 5, footprints)
+    assert sorted(catalog.scenes_at(LAT, LON, buffer_m=1000).tolist()) == [0, 1, 2]
+    assert sorted(catalog.scenes_at(LAT, LON).tolist()) == [0, 2]
+
+def test_catalogue_selection_radius():
+    # Clear scene 300 m east of the site, cloudy scene covering it
+    footprints = [square(LON + 0.003, LAT - 0.1, LON + 0.1, LAT + 0.1),
+                  square(LON - 0.1, LAT - 0.1, LON + 0.1, LAT + 0.1)]
+    s2 = SceneCatalog(S2_DATASET, 2023, ['clear', 'cloudy'], [0, 0], footprints, cloud=[1, 9])
+    s1 = SceneCatalog(S1_DATASET, 2023, ['a', 'b'], [0, 0], footprints)
+    assert s2.select_buffer_m == 50 and s1.select_buffer_m == 1000
+    # Every caller gets the catalogue radius unless it asks for another one
+    assert s2.select(LAT, LON)['id'] == 'cloudy'
+    assert s2.select(LAT, LON, buffer_m=1000)['id'] == 'clear'
+    assert s1.scenes_at(LAT, LON).tolist() == [0, 1]
+    restored = SceneCatalog.from_dict(s2.to_dict())
+    assert restored.select_buffer_m == 50 and restored.select(LAT, LON)['id'] == 'cloudy'
@@ -0,0 +1,41 @@
+# tests/test_schema.py
+
+# Result schema round trip through Arrow/Parquet.
+
+import numpy as np
+import pandas as pd
+
+from nhamini.schema import read_results_parquet, results_to_arrow, write_results_parquet
+
+def test_results_to_arrow_leaves_the_frame_untouched():
+    df = pd.DataFrame({'name': ['a', 'b'], 'NDVI': [0.5, np.inf], 'Sentinel2_ID': ['s1', 's1'],
+                       'MapBiomas_Class': [3, None]})
+    before = df.dtypes.copy()
+    table = results_to_arrow(df)
+    pd.testing.assert_series_equal(df.dtypes, before)
+    assert df['NDVI'].iloc[1] == np.inf
+    assert str(table.schema.field('NDVI').type) == 'float'
+
+def test_parquet_round_trip(tmp_path):
+    df = pd.DataFrame({'name': ['a', 'b'], 'NDVI': [0.5, np.inf], 'Elevation': [120.0, None]})
+    write_results_parquet(df, str(tmp_path / 'results.parquet'))
+    back = read_results_parquet(str(tmp_path / 'results.parquet'))
+    assert back['NDVI'].isna().tolist() == [False, True]
+    assert back['Elevation'].dtype == 'Float32'
+
+def test_results_from_arrow_keeps_float32(tmp_path, monkeypatch):
+    import nhamini.schema as schema
+    df = pd.DataFrame({'name': ['a', 'b', 'c'], 'NDVI': [0.5, None, 0.25], 'Slope': [1.0, 2.0, np.nan],
+                       'MapBiomas_Class': [3, 15, None], 'Sentinel1_ID': ['s1', None, 's1']})
+    table = results_to_arrow(df)
+
+    def fail(values):
+        raise AssertionError('sensor column re-encoded')
+
+    monkeypatch.setattr(schema, 'to_sensor_array', fail)
+    back = schema.results_from_arrow(table)
+    assert back['NDVI'].dtype == back['Slope'].dtype == 'Float32'
+    assert back['NDVI'].isna().tolist() == [False, True, False]
+    assert back['NDVI'].iloc[2] == np.float32(0.25)
+    assert isinstance(back['MapBiomas_Class'].dtype, pd.CategoricalDtype)
+    assert back['Sentinel1_ID'].tolist()[0] == 's1'
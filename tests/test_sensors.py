@@ -0,0 +1,169 @@
+# tests/test_sensors.py
+
+# Enrichment bookkeeping without Earth Engine: incremental re-enrichment with
+# compute_sensor_columns replaced by a fake, and tile batching against a fake
+# ee module.
+
+import sys
+import types
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import nhamini.sensors as sensors
+from nhamini.schema import RESULT_COLUMNS, enriched_coordinates
+
+class FakeCompute:
+    """Records every (rows, columns) request; sites whose name is in fail come back failed."""
+
+    def __init__(self):
+        self.calls = []
+        self.fail = set()
+
+    def __call__(self, df, params, delay=1, catalogs=None, tile_deg=None, geohash_precision=None,
+                 columns=None, rate_limiter=None):
+        columns = [col for col in RESULT_COLUMNS if columns is None or col in columns]
+        self.calls.append((list(df['name']), columns))
+        failed = df['name'].isin(self.fail).to_numpy()
+        results = {}
+        for col in columns:
+            if col in ('Sentinel2_ID', 'Sentinel1_ID'):
+                values = [f'{col}-{params["ndvi_year"]}'] * len(df)
+            elif col == 'MapBiomas_Class':
+                values = [params['mapbiomas_year'] % 100] * len(df)
+            else:
+                values = list(df['lat'].astype(float))
+            results[col] = [None if bad else value for value, bad in zip(values, failed)]
+        return results, df.index[failed]
+
+@pytest.fixture
+def fake_compute(monkeypatch):
+    fake = FakeCompute()
+    monkeypatch.setattr(sensors, 'compute_sensor_columns', fake)
+    return fake
+
+def sites(n=3):
+    return pd.DataFrame({'name': [f's{i}' for i in range(n)], 'lat': -10.0 - np.arange(n), 'lon': -67.0 + np.arange(n)})
+
+def test_reenrich_selects_stale_columns_and_moved_rows(fake_compute):
+    df = sensors.enrich_benchmarks_with_all_sensors(sites(), delay=0)
+    assert fake_compute.calls == [(['s0', 's1', 's2'], RESULT_COLUMNS)]
+
+    # Nothing changed: nothing is recomputed
+    fake_compute.calls.clear()
+    df = sensors.reenrich_with_all_sensors(df, delay=0)
+    assert fake_compute.calls == []
+
+    # A changed parameter recomputes its column for every row only
+    df = sensors.reenrich_with_all_sensors(df, mapbiomas_year=2019, delay=0)
+    assert fake_compute.calls == [(['s0', 's1', 's2'], ['MapBiomas_Class'])]
+    assert df['MapBiomas_Class'].tolist() == [19, 19, 19]
+
+    # A moved row and an appended one get every other column
+    fake_compute.calls.clear()
+    df.loc[1, 'lat'] = -20.0
+    df = sensors.append_sites(df, [{'name': 's3', 'lat': -13.0, 'lon': -64.0}])
+    df = sensors.reenrich_with_all_sensors(df, mapbiomas_year=2019, delay=0)
+    assert fake_compute.calls == [(['s1', 's3'], RESULT_COLUMNS)]
+    assert df['NDVI'].tolist() == [-10.0, -20.0, -12.0, -13.0]
+    np.testing.assert_array_equal(enriched_coordinates(df)['lat'], df['lat'])
+
+def test_failed_rows_are_retried(fake_compute):
+    fake_compute.fail = {'s1'}
+    df = sensors.enrich_benchmarks_with_all_sensors(sites(), delay=0)
+    assert enriched_coordinates(df)['lat'].isna().tolist() == [False, True, False]
+    assert df['NDVI'].isna().tolist() == [False, True, False]
+
+    # A failure in a parameter change leaves the row for the next run as well
+    fake_compute.calls.clear()
+    fake_compute.fail = {'s1', 's2'}
+    df = sensors.reenrich_with_all_sensors(df, ndvi_year=2024, delay=0)
+    assert fake_compute.calls == [(['s0', 's1', 's2'], ['NDVI', 'Sentinel2_ID']),
+                                  (['s1'], [col for col in RESULT_COLUMNS if col not in ('NDVI', 'Sentinel2_ID')])]
+    assert enriched_coordinates(df)['lat'].isna().tolist() == [False, True, True]
+
+    fake_compute.calls.clear()
+    fake_compute.fail = set()
+    df = sensors.reenrich_with_all_sensors(df, ndvi_year=2024, delay=0)
+    assert fake_compute.calls == [(['s1', 's2'], RESULT_COLUMNS)]
+    assert df['NDVI'].notna().all() and enriched_coordinates(df)['lat'].notna().all()
+
+def fake_ee(requests, fail_on):
+    """ee stand-in: Dictionary(request).getInfo() answers every optical feature, failing the listed calls."""
+    class Dictionary:
+        def __init__(self, request):
+            self.request = request
+
+        def getInfo(self):
+            requests.append(self.request)
+            if len(requests) in fail_on:
+                raise RuntimeError('Collection query aborted after accumulating over 5000 elements.')
+            lats = self.request['optical']
+            return {'optical': {'features': [{'properties': {'row': i, 'NDVI': lat}} for i, lat in enumerate(lats)]}}
+
+    return types.SimpleNamespace(Dictionary=Dictionary)
+
+def test_enrich_tiles_batches_and_reports_failures(monkeypatch):
+    requests = []
+    monkeypatch.setitem(sys.modules, 'ee', fake_ee(requests, fail_on={2}))
+    monkeypatch.setattr(sensors, 'tile_geometry', lambda lats, lons, margin_m: None)
+    monkeypatch.setattr(sensors, 'tile_sensor_request',
+                        lambda tile, lats, lons, *args: {'optical': list(lats), 'terrain': None})
+    # 25 points in one tile and 3 in another, at most 10 features per request
+    df = pd.DataFrame({'lat': np.r_[np.linspace(-10.01, -10.02, 25), [-12.0] * 3],
+                       'lon': np.r_[[-67.0] * 25, [-65.0] * 3]}, index=np.arange(100, 128))
+    results, failed = sensors.enrich_tiles(df, delay=0, columns=['NDVI'], max_features=10)
+    assert [len(request['optical']) for request in requests] == [10, 10, 5, 3]
+    assert list(requests[0]) == ['optical']  # unused reductions are not sent
+    assert failed.tolist() == list(range(110, 120))
+    ndvi = np.array(results['NDVI'], dtype=float)
+    assert np.isnan(ndvi[10:20]).all()
+    np.testing.assert_allclose(np.delete(ndvi, np.s_[10:20]), np.delete(df['lat'].to_numpy(), np.s_[10:20]))
+
+def fake_sweep_ee(requests, fail_on):
+    """ee stand-in for sweeps: every (row, radius) feature of a request gets lat + radius as its value."""
+    class Dictionary:
+        def __init__(self, request):
+            self.request = request
+
+        def getInfo(self):
+            requests.append(self.request)
+            if len(requests) in fail_on:
+                raise RuntimeError('Collection query aborted after accumulating over 5000 elements.')
+            return {group: {'features': [{'properties': {'row': i, 'radius_m': radius, 'NDVI': lat + radius,
+                                                         'elevation': radius}}
+                                         for i, lat, radius in features]}
+                    for group, features in self.request.items()}
+
+    return types.SimpleNamespace(Dictionary=Dictionary)
+
+def test_sweep_batches_and_keeps_failed_sites(monkeypatch):
+    requests = []
+    monkeypatch.setitem(sys.modules, 'ee', fake_sweep_ee(requests, fail_on={2}))
+    monkeypatch.setattr(sensors, 'tile_geometry', lambda lats, lons, margin_m: None)
+    monkeypatch.setattr(sensors, 'tile_composites', lambda tile, *years: {'optical': None, 'terrain': None})
+    monkeypatch.setattr(sensors, 'radius_features',
+                        lambda lats, lons, radii_m: [(i, lat, r) for i, lat in enumerate(lats) for r in radii_m])
+    monkeypatch.setattr(sensors, 'reduce_group', lambda image, group, features, mapbiomas_year: features)
+    # 7 points in one tile, 3 radii, at most 6 features (2 points) per request
+    df = pd.DataFrame({'name': [f's{i}' for i in range(7)], 'lat': np.linspace(-10.01, -10.02, 7), 'lon': -67.0},
+                      index=np.arange(10, 17))
+    sweep = sensors.sweep_buffers(df, radii_m=[50, 0, 250], sensors=['NDVI', 'Elevation'], delay=0, max_features=6)
+    assert [len(request['optical']) for request in requests] == [6, 6, 6, 3]
+
+    # Tidy shape: one record per site x radius x sensor, failed sites (the second batch) included as NaN
+    assert len(sweep) == 7 * 3 * 2
+    assert list(sweep.columns) == ['site', 'name', 'sensor', 'radius_m', 'value']
+    assert list(sweep['sensor'].cat.categories) == ['NDVI', 'Elevation']
+    assert sweep['radius_m'].dtype == np.int32 and sweep['value'].dtype == float
+    assert sweep.attrs['buffer_sweep']['radii_m'] == [0, 50, 250]
+    lost = sweep['site'].isin([12, 13])
+    assert sweep.loc[lost, 'value'].isna().all() and sweep.loc[~lost, 'value'].notna().all()
+
+    profiles = sensors.scale_profiles(sweep)
+    assert profiles.index.tolist() == list(zip(df.index, df['name']))
+    assert profiles.columns.tolist() == [(s, r) for s in ('NDVI', 'Elevation') for r in (0, 50, 250)]
+    np.testing.assert_allclose(profiles.loc[(10, 's0'), ('NDVI', 250)], df.loc[10, 'lat'] + 250)
+    np.testing.assert_array_equal(profiles.loc[(16, 's6'), 'Elevation'], [0, 50, 250])
+    assert profiles.loc[(12, 's2')].isna().all()